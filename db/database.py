@@ -1,5 +1,7 @@
 import os
-from typing import Any, Dict, List, Optional, Union
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from bson import ObjectId
@@ -96,6 +98,13 @@ async def init_db() -> AsyncIOMotorDatabase:
     # Библиотека фонов: уникальная комбинация (scope, file)
     await _ensure_index_safe(db().backgrounds, [("scope", 1), ("file", 1)], unique=True)
 
+    # Пул исторических тем: уникальная тема на язык + выборка готовых по возрасту
+    await _ensure_index_safe(db().historical_topics, [("language", 1), ("norm", 1)], unique=True)
+    await _ensure_index_safe(db().historical_topics, [("language", 1), ("status", 1), ("created_at", 1)])
+
+    # Промпты держим в памяти — генерация не ходит за ними в Mongo
+    await prompts_cache_load()
+
     return db()
 
 
@@ -205,8 +214,40 @@ async def prompts_get_by_id(pid: Union[str, ObjectId]) -> Optional[Dict[str, Any
     _id = ObjectId(pid) if not isinstance(pid, ObjectId) else pid
     return await db().prompts.find_one({"_id": _id})
 
+# Кэш промптов в памяти процесса: (scope, preset, lang) -> doc.
+# Заполняется при init_db, обновляется в prompts_upsert/prompts_delete_by_id;
+# раз в PROMPT_CACHE_TTL секунд перечитывается целиком (правки мимо бота).
+PROMPT_CACHE_TTL = int(os.getenv("PROMPT_CACHE_TTL", "300"))
+
+_prompt_cache: Optional[Dict[Tuple[str, str, str], Dict[str, Any]]] = None
+_prompt_cache_loaded_at = 0.0
+
+
+async def prompts_cache_load() -> int:
+    """(Пере)загружает все промпты в кэш, возвращает их число."""
+    global _prompt_cache, _prompt_cache_loaded_at
+    cache = {}
+    async for doc in db().prompts.find({}):
+        cache[(doc.get("scope"), doc.get("preset"), doc.get("lang"))] = doc
+    _prompt_cache = cache
+    _prompt_cache_loaded_at = time.monotonic()
+    return len(cache)
+
+
+async def _prompts_cache() -> Dict[Tuple[str, str, str], Dict[str, Any]]:
+    if _prompt_cache is None or time.monotonic() - _prompt_cache_loaded_at > PROMPT_CACHE_TTL:
+        await prompts_cache_load()
+    return _prompt_cache
+
+
 async def prompts_get(scope: str, preset: str, lang: str) -> Optional[Dict[str, Any]]:
-    return await db().prompts.find_one({"scope": scope, "preset": preset, "lang": lang})
+    return (await _prompts_cache()).get((scope, preset, lang))
+
+
+async def prompt_text(scope: str, preset: str, lang: str) -> Optional[str]:
+    """Текст промпта из кэша (None, если промпта нет или он пустой)."""
+    doc = await prompts_get(scope, preset, lang)
+    return (doc or {}).get("text") or None
 
 async def prompts_upsert(
     scope: str,
@@ -228,17 +269,32 @@ async def prompts_upsert(
                 "updated_by": updated_by
             }}
         )
+        await _prompts_cache_refresh(scope, preset, lang)
         return str(doc["_id"])
     res = await db().prompts.insert_one({
         "scope": scope, "preset": preset, "lang": lang,
         "name": name or preset, "text": text,
         "created_at": now, "updated_at": now, "updated_by": updated_by
     })
+    await _prompts_cache_refresh(scope, preset, lang)
     return str(res.inserted_id)
 
+async def _prompts_cache_refresh(scope: str, preset: str, lang: str) -> None:
+    if _prompt_cache is None:
+        return
+    doc = await db().prompts.find_one({"scope": scope, "preset": preset, "lang": lang})
+    if doc:
+        _prompt_cache[(scope, preset, lang)] = doc
+    else:
+        _prompt_cache.pop((scope, preset, lang), None)
+
 async def prompts_delete_by_id(pid: Union[str, ObjectId]) -> int:
     _id = ObjectId(pid) if not isinstance(pid, ObjectId) else pid
     r = await db().prompts.delete_one({"_id": _id})
+    if _prompt_cache is not None:
+        for key, doc in list(_prompt_cache.items()):
+            if doc.get("_id") == _id:
+                del _prompt_cache[key]
     return r.deleted_count
 
 
@@ -468,4 +524,66 @@ async def preset_voices_delete_by_id(vid: Union[str, ObjectId]) -> int:
     """Удаляет предустановленный голос по _id"""
     _id = ObjectId(vid) if not isinstance(vid, ObjectId) else vid
     r = await db().preset_voices.delete_one({"_id": _id})
-    return r.deleted_count
\ No newline at end of file
+    return r.deleted_count
+
+
+# ----------------------------- ИСТОРИЧЕСКИЕ ТЕМЫ (пул для длинных видео) -----------------------------
+# Схема: { _id, language: "russian", topic: str, norm: str, status: "ready"|"offered"|"used",
+#          created_at, offered_at, used_at }
+# norm — нормализованная тема: по ней дедупликация (уникальный индекс language+norm)
+
+def topic_norm(topic: str) -> str:
+    """Ключ дедупликации темы: нижний регистр, без пунктуации и лишних пробелов"""
+    return " ".join(re.sub(r"[^\w\s]", " ", (topic or "").lower()).split())
+
+
+async def historical_topics_add(language: str, topics: List[str], status: str = "ready") -> int:
+    """Добавляет темы; уже известные (в любом статусе) пропускаются. Возвращает число новых"""
+    now = datetime.utcnow()
+    added = 0
+    for topic in topics:
+        topic = (topic or "").strip()
+        norm = topic_norm(topic)
+        if not norm:
+            continue
+        r = await db().historical_topics.update_one(
+            {"language": language, "norm": norm},
+            {"$setOnInsert": {"topic": topic, "status": status, "created_at": now}},
+            upsert=True
+        )
+        if r.upserted_id is not None:
+            added += 1
+    return added
+
+
+async def historical_topics_take(language: str, limit: int) -> List[str]:
+    """Забирает до limit самых старых готовых тем и помечает их показанными"""
+    cur = db().historical_topics.find({"language": language, "status": "ready"}).sort("created_at", 1).limit(limit)
+    docs = [doc async for doc in cur]
+    if docs:
+        await db().historical_topics.update_many(
+            {"_id": {"$in": [d["_id"] for d in docs]}},
+            {"$set": {"status": "offered", "offered_at": datetime.utcnow()}}
+        )
+    return [d["topic"] for d in docs]
+
+
+async def historical_topics_count_ready(language: str) -> int:
+    return await db().historical_topics.count_documents({"language": language, "status": "ready"})
+
+
+async def historical_topics_recent(language: str, limit: int = 50) -> List[str]:
+    """Последние известные темы — подсказка модели, что не повторять"""
+    cur = db().historical_topics.find({"language": language}).sort("created_at", -1).limit(limit)
+    return [doc["topic"] async for doc in cur]
+
+
+async def historical_topics_mark_used(language: str, topic: str) -> None:
+    """Тема ушла в производство (в т.ч. своя тема пользователя) — больше не предлагаем"""
+    now = datetime.utcnow()
+    await db().historical_topics.update_one(
+        {"language": language, "norm": topic_norm(topic)},
+        {"$set": {"status": "used", "used_at": now},
+         "$setOnInsert": {"topic": topic.strip(), "created_at": now}},
+        upsert=True
+    )
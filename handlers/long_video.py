@@ -8,6 +8,7 @@ from aiogram.fsm.state import State, StatesGroup
 
 from utils import keyboards as kb
 from utils.historical import HistoricalVideoGenerator
+from utils.topic_pool import get_topic_pool
 import logging
 
 logger = logging.getLogger(__name__)
@@ -81,19 +82,31 @@ async def duration_selected(message: Message, state: FSMContext):
     data = await state.get_data()
     language = data['language']
 
-    # Generate topic suggestions
-    await message.answer(
-        "💡 Генерирую идеи для видео...\n\n"
-        "⏳ Пожалуйста, подождите...",
-        reply_markup=ReplyKeyboardRemove()
-    )
-
     try:
-        generator = HistoricalVideoGenerator()
-        topics = generator.generate_topic_suggestions(
-            num_suggestions=4,
-            language=language
-        )
+        # Темы берём из заранее наполненного пула; LLM — только если пул пуст
+        pool = get_topic_pool()
+        topics = await pool.take(language, 4)
+        if len(topics) < 4:
+            await message.answer(
+                "💡 Генерирую идеи для видео...\n\n"
+                "⏳ Пожалуйста, подождите...",
+                reply_markup=ReplyKeyboardRemove()
+            )
+            try:
+                await pool.refill(language)
+            except Exception as e:
+                logger.warning(f"Topic pool refill failed: {e}")
+            topics += await pool.take(language, 4 - len(topics))
+        if len(topics) < 4:
+            # Пул так и не пополнился — добираем темы прямым запросом к модели
+            try:
+                topics += await pool.suggest_live(language, 4 - len(topics), topics)
+            except Exception as e:
+                logger.warning(f"Live topic suggestions failed: {e}")
+        if not topics:
+            # Предложить нечего — сразу просим свою тему, а не пустой список
+            await enter_custom_topic(message, state)
+            return
 
         await state.update_data(suggested_topics=topics)
 
@@ -108,11 +121,9 @@ async def duration_selected(message: Message, state: FSMContext):
     except Exception as e:
         logger.error(f"Error generating topics: {e}")
         await message.answer(
-            f"❌ Ошибка при генерации идей:\n{str(e)[:200]}\n\n"
-            "Введите тему вручную:",
-            reply_markup=kb.main_kb()
+            f"❌ Ошибка при генерации идей:\n{str(e)[:200]}"
         )
-        await state.clear()
+        await enter_custom_topic(message, state)
 
 
 @router.message(LongVideoFSM.viewing_topics, F.text == "✍️ Своя тема")
@@ -215,6 +226,11 @@ async def start_generation(message: Message, state: FSMContext):
     await state.set_state(LongVideoFSM.generating)
 
     try:
+        try:
+            await get_topic_pool().mark_used(language, topic)
+        except Exception as e:
+            logger.warning(f"Failed to mark topic as used: {e}")
+
         generator = HistoricalVideoGenerator()
 
         # Update progress - Story generation
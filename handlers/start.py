@@ -133,6 +133,35 @@ async def settings_voices(callback: types.CallbackQuery):
     await callback.answer()
 
 
+@router.callback_query(F.data.startswith("voice:info:"))
+async def voice_info(callback: types.CallbackQuery):
+    """Прослушивание голоса: превью из локального каталога (скачивается один раз)"""
+    from db.database import preset_voices_get_by_voice_id
+    from utils.voice_catalog import get_voice_catalog
+
+    voice_id = callback.data.split(":", 2)[2]
+    await callback.answer("🎧 Загружаю превью...")
+
+    voice = await preset_voices_get_by_voice_id(voice_id)
+    name = (voice or {}).get("name") or voice_id
+    try:
+        path = await get_voice_catalog().preview_file(voice_id)
+    except Exception as e:
+        await callback.message.answer(f"❌ Не удалось получить превью: {str(e)[:200]}")
+        return
+    if not path:
+        await callback.message.answer("❌ Для этого голоса нет превью")
+        return
+
+    await callback.message.answer_audio(
+        types.FSInputFile(path),
+        caption=f"🎙 <b>{name}</b>\nID: <code>{voice_id}</code>",
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text="🔙 Назад к голосам", callback_data="settings:voices")]
+        ])
+    )
+
+
 @router.callback_query(F.data == "voice:add")
 async def voice_add(callback: types.CallbackQuery, state: FSMContext):
     """Добавление нового голоса по ID из GenAIPro"""
@@ -78,6 +78,10 @@ async def main():
     await init_db()
     print("DB is initialized.")
 
+    # Общий пул HTTP-соединений к внешним API (GenAIPro, Grok/OpenAI, FAL)
+    from utils.http import start_http, close_http
+    await start_http()
+
     # 2) Бот/Диспетчер
     session = AiohttpSession(timeout=65)  # число секунд, совместимо с aiogram 3.7
     bot = Bot(
@@ -102,6 +106,15 @@ async def main():
     asyncio.create_task(task_queue.start_worker(bot, process_video_task))
     print("Task queue worker started")
 
+    # Предгенерация историй, пока очередь простаивает
+    from utils.story_buffer import get_story_buffer
+    asyncio.create_task(get_story_buffer().run_idle_refill(task_queue.is_idle))
+
+    # Пул тем для длинных видео — экран выбора темы не ждёт LLM
+    if long_video_router:
+        from utils.topic_pool import get_topic_pool
+        asyncio.create_task(get_topic_pool().run_refill())
+
     print("Bot is running...")
     try:
         await dp.start_polling(bot, polling_timeout=50)
@@ -115,6 +128,10 @@ async def main():
             await bot.session.close()
         except Exception:
             pass
+        try:
+            await close_http()
+        except Exception:
+            pass
         try:
             from db.database import close_db  # если у тебя есть такая функция — вызовем
             await close_db()
@@ -0,0 +1,102 @@
+# utils/audio_post.py
+"""
+Постобработка озвучки перед финальным муксом.
+
+Громкость измеряется один раз (loudnorm, измерительный проход) и кэшируется
+по sha256 содержимого аудио в CACHE_DIR/loudness.json (последние
+LOUDNESS_CACHE_MAX файлов, LRU; запись — в потоке). Само выравнивание —
+линейное усиление volume= внутри финального mux (аудио и так перекодируется
+там в AAC 48 кГц), без отдельного полного перекодирования.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+from utils.config import CACHE_DIR
+from utils.ffmpeg import measure_loudness
+
+LOUDNESS_CACHE_PATH = os.path.join(CACHE_DIR, "loudness.json")
+
+# Целевая громкость канала (LUFS) и потолок true peak (dBTP)
+TARGET_LUFS = float(os.getenv("TARGET_LUFS", "-14"))
+TRUE_PEAK_DB = -1.5
+# Не трогаем аудио, если отклонение меньше этого, дБ
+MIN_GAIN_DB = 0.3
+# Сколько измерений храним: каждая озвучка — новое содержимое, без предела файл растёт вечно
+LOUDNESS_CACHE_MAX = 2000
+
+_cache: Optional[Dict[str, Dict[str, float]]] = None
+_save_lock: Optional[asyncio.Lock] = None
+
+
+def _load() -> Dict[str, Dict[str, float]]:
+    global _cache
+    if _cache is None:
+        try:
+            with open(LOUDNESS_CACHE_PATH, "r", encoding="utf-8") as f:
+                _cache = json.load(f)
+        except (OSError, ValueError):
+            _cache = {}
+    return _cache
+
+
+def _write(data: str) -> None:
+    os.makedirs(os.path.dirname(LOUDNESS_CACHE_PATH) or ".", exist_ok=True)
+    tmp = LOUDNESS_CACHE_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(tmp, LOUDNESS_CACHE_PATH)
+
+
+async def _save() -> None:
+    """Снимок кэша пишется в потоке, записи идут по очереди"""
+    global _save_lock
+    if _save_lock is None:
+        _save_lock = asyncio.Lock()
+    async with _save_lock:
+        await asyncio.to_thread(_write, json.dumps(_cache))
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+async def get_loudness(audio_path: str) -> Dict[str, float]:
+    """Измерения громкости файла (из кэша по содержимому, иначе один проход ffmpeg)"""
+    key = await asyncio.to_thread(_sha256, audio_path)
+    cache = _load()
+    if key in cache:
+        cache[key] = cache.pop(key)  # в конец — «недавно использован»
+        return cache[key]
+
+    measured = await measure_loudness(audio_path)
+    cache[key] = measured
+    while len(cache) > LOUDNESS_CACHE_MAX:
+        del cache[next(iter(cache))]
+    try:
+        await _save()
+    except OSError:
+        pass
+    return measured
+
+
+async def loudness_gain_db(audio_path: str, target_lufs: float = TARGET_LUFS) -> Optional[float]:
+    """
+    Усиление в дБ до целевой громкости, ограниченное так, чтобы пик
+    не превысил TRUE_PEAK_DB. None — если корректировать не нужно/нечем.
+    """
+    measured = await get_loudness(audio_path)
+    if "input_i" not in measured or measured["input_i"] <= -70:  # тишина
+        return None
+    gain = target_lufs - measured["input_i"]
+    if "input_tp" in measured:
+        gain = min(gain, TRUE_PEAK_DB - measured["input_tp"])
+    return gain if abs(gain) >= MIN_GAIN_DB else None
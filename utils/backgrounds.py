@@ -7,6 +7,7 @@ from typing import List, Optional
 
 from utils.config import FFMPEG_BIN
 from utils.ffmpeg import _run as _ffrun, probe_duration
+from utils.sampler import get_sampler
 
 
 def _list_videos(dirpath: str) -> List[str]:
@@ -61,7 +62,8 @@ async def choose_random_bg_segment(
     out_dir: str,
     pool_dir: Optional[str] = None,
     fallback: Optional[str] = None,
-    scope: str = "reddit"
+    scope: str = "reddit",
+    channel: Optional[str] = None
 ) -> str:
     """
     Выбирает рандомный файл и вырезает случайный отрезок под нужную длительность.
@@ -70,6 +72,8 @@ async def choose_random_bg_segment(
     1. Видео из БД (если есть)
     2. Видео из pool_dir
     3. fallback файл
+
+    Отрезки из пула выдаются без повторов в рамках channel (по умолчанию — scope).
     """
     candidates = []
     
@@ -81,11 +85,15 @@ async def choose_random_bg_segment(
     elif pool_dir:
         candidates = _list_videos(pool_dir)
     
+    # Пул есть — отдаём ещё не использованный каналом отрезок
+    if candidates:
+        src, start = await get_sampler().pick(channel or scope, candidates, duration + 0.5)
+        out_path = os.path.join(out_dir, "bg_clip.mp4")
+        return await _cut_segment(src, start, duration, out_path)
+
     # Выбираем источник
     src = None
-    if candidates:
-        src = random.choice(candidates)
-    elif fallback and os.path.exists(fallback):
+    if fallback and os.path.exists(fallback):
         src = fallback
     else:
         # Если ничего нет, создаем дефолтный путь
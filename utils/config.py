@@ -32,6 +32,14 @@ for part in _allowed_raw.replace(";", ",").split(","):
         except ValueError:
             pass
 
+# -------- Кэши / состояние между перезапусками --------
+# Сюда складываются служебные файлы (сэмплер футажа, кэши и т.п.)
+CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+
+# -------- Генерация историй --------
+# Потоковая генерация: предложения уходят в TTS, пока LLM ещё пишет историю
+STREAM_STORY_TTS = os.getenv("STREAM_STORY_TTS", "1").lower() in ("1", "true", "yes")
+
 # -------- FFmpeg / FFprobe --------
 def _guess_ffmpeg() -> str:
     # приоритет .env
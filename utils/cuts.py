@@ -1,11 +1,19 @@
 # utils/cuts.py
+import asyncio
+import json
 import os
 import random
 import re
+import time
+from functools import lru_cache
 from typing import List, Tuple, Optional, Dict
 
-from utils.ffmpeg import _run, probe_duration
+from PIL import Image
+
+from utils.ffmpeg import _run, probe_duration, probe_has_audio
 from utils.config import FFMPEG_BIN
+from utils.sampler import get_sampler
+from utils.shot_index import load_shot_index
 
 # --- Базовые директории библиотеки ---
 LIB_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "assets"))
@@ -15,10 +23,20 @@ BANNERS_DIR  = os.path.join(LIB_ROOT, "banners", "cuts")
 
 VIDEO_EXTS = (".mp4", ".mov", ".mkv", ".webm")
 
+LIBRARY_INDEX_PATH = os.path.join(LIB_ROOT, ".library_index.json")
+# Как часто (сек) перепроверять mtime папок; в промежутке отвечаем из памяти
+LIBRARY_RECHECK_SEC = float(os.getenv("LIBRARY_RECHECK_SEC", "5"))
+
+_dirs_ready = False
+
 def ensure_dirs():
+    global _dirs_ready
+    if _dirs_ready:
+        return
     os.makedirs(CARTOONS_DIR, exist_ok=True)
     os.makedirs(FILMS_DIR, exist_ok=True)
     os.makedirs(BANNERS_DIR, exist_ok=True)
+    _dirs_ready = True
 
 def _slug(name: str) -> str:
     return re.sub(r"[^a-z0-9]+", "_", (name or "").strip().lower()).strip("_")
@@ -30,14 +48,138 @@ def base_dir_for(kind: str) -> str:
     ensure_dirs()
     return CARTOONS_DIR if kind == "cartoons" else FILMS_DIR
 
+
+class LibraryIndex:
+    """
+    Индекс библиотеки нарезок в памяти + на диске (LIBRARY_INDEX_PATH).
+
+    Папка перечитывается (listdir) только когда изменился её mtime — а он меняется
+    при добавлении/удалении/переименовании файлов. Между проверками
+    (LIBRARY_RECHECK_SEC) ответы идут прямо из памяти, без обращений к диску.
+
+    Структура:
+    {
+      "cartoons": {
+        "mtime": <mtime папки kind>,
+        "collections": {
+          "spongebob": {"mtime": ..., "files": {"ep1.mp4": {"size": ..., "mtime": ...}}}
+        }
+      },
+      "films": {...}
+    }
+    """
+
+    def __init__(self, path: str = LIBRARY_INDEX_PATH):
+        self.path = path
+        self._data: Optional[Dict] = None
+        self._checked_at: Dict[str, float] = {}
+
+    def _load(self) -> Dict:
+        if self._data is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError):
+                self._data = {}
+            for kind in ("cartoons", "films"):
+                self._data.setdefault(kind, {"mtime": None, "collections": {}})
+        return self._data
+
+    def _save(self) -> None:
+        try:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass  # индекс — только ускорение, без него всё работает
+
+    @staticmethod
+    def _scan_collection(folder: str, old_files: Dict[str, Dict]) -> Dict[str, Dict]:
+        files: Dict[str, Dict] = {}
+        for entry in os.scandir(folder):
+            if not entry.name.lower().endswith(VIDEO_EXTS) or not entry.is_file():
+                continue
+            st = entry.stat()
+            meta = dict(old_files.get(entry.name) or {})
+            meta.update({"size": st.st_size, "mtime": st.st_mtime})
+            files[entry.name] = meta
+        return files
+
+    def _refresh(self, kind: str, force: bool = False) -> Dict:
+        data = self._load()
+        entry = data[kind]
+        now = time.monotonic()
+        if not force and now - self._checked_at.get(kind, -LIBRARY_RECHECK_SEC) < LIBRARY_RECHECK_SEC:
+            return entry
+
+        base = base_dir_for(kind)
+        changed = False
+        try:
+            base_mtime = os.stat(base).st_mtime
+        except OSError:
+            entry.update({"mtime": None, "collections": {}})
+            self._checked_at[kind] = now
+            return entry
+
+        cols = entry["collections"]
+        if force or entry.get("mtime") != base_mtime:
+            names = {d.name for d in os.scandir(base) if d.is_dir() and not d.name.startswith(".")}
+            for gone in set(cols) - names:
+                cols.pop(gone, None)
+            for name in names - set(cols):
+                cols[name] = {"mtime": None, "files": {}}
+            entry["mtime"] = base_mtime
+            changed = True
+
+        for name, col in cols.items():
+            folder = os.path.join(base, name)
+            try:
+                col_mtime = os.stat(folder).st_mtime
+            except OSError:
+                continue
+            if force or col.get("mtime") != col_mtime:
+                col["files"] = self._scan_collection(folder, col.get("files") or {})
+                col["mtime"] = col_mtime
+                changed = True
+
+        self._checked_at[kind] = now
+        if changed:
+            self._save()
+        return entry
+
+    def invalidate(self, kind: Optional[str] = None) -> None:
+        """Сбрасывает таймер проверки — следующий запрос сверит mtime"""
+        if kind:
+            self._checked_at.pop(kind, None)
+        else:
+            self._checked_at.clear()
+
+    def collections(self, kind: str) -> Dict[str, Dict]:
+        return self._refresh(kind)["collections"]
+
+    def files(self, kind: str, collection: str) -> Dict[str, Dict]:
+        col = self.collections(kind).get(collection)
+        return (col or {}).get("files") or {}
+
+
+# Глобальный экземпляр индекса
+_library_index: Optional[LibraryIndex] = None
+
+
+def get_library_index() -> LibraryIndex:
+    """Получает глобальный индекс библиотеки"""
+    global _library_index
+    if _library_index is None:
+        _library_index = LibraryIndex()
+    return _library_index
+
+
 def list_collections(kind: str) -> List[str]:
     """
     Возвращает список папок коллекций для kind.
     """
-    base = base_dir_for(kind)
-    if not os.path.isdir(base):
-        return []
-    return sorted([d for d in os.listdir(base) if os.path.isdir(os.path.join(base, d))])
+    return sorted(get_library_index().collections(kind))
 
 def create_collection(kind: str, name: str) -> str:
     """
@@ -45,6 +187,7 @@ def create_collection(kind: str, name: str) -> str:
     """
     folder = os.path.join(base_dir_for(kind), _slug(name))
     os.makedirs(folder, exist_ok=True)
+    get_library_index().invalidate(kind)
     return folder
 
 def list_videos_in(kind: str, collection: str) -> List[str]:
@@ -52,37 +195,41 @@ def list_videos_in(kind: str, collection: str) -> List[str]:
     Возвращает список видеофайлов внутри коллекции.
     """
     folder = os.path.join(base_dir_for(kind), collection)
-    if not os.path.isdir(folder):
-        return []
-    vids = []
-    for name in os.listdir(folder):
-        if name.lower().endswith(VIDEO_EXTS):
-            vids.append(os.path.join(folder, name))
-    return sorted(vids)
+    return sorted(os.path.join(folder, name) for name in get_library_index().files(kind, collection))
+
+def video_meta(kind: str, collection: str) -> Dict[str, Dict]:
+    """
+    Метаданные файлов коллекции из индекса: {"ep1.mp4": {"size": ..., "mtime": ...}, ...}
+    """
+    return {name: dict(meta) for name, meta in get_library_index().files(kind, collection).items()}
 
 def count_videos(kind: str, collection: str) -> int:
-    return len(list_videos_in(kind, collection))
+    return len(get_library_index().files(kind, collection))
 
 def list_collections_with_counts(kind: str) -> List[Tuple[str, int]]:
     """
     [('spongebob', 12), ('tom_and_jerry', 7), ...]
     """
-    cols = list_collections(kind)
-    return [(c, count_videos(kind, c)) for c in cols]
+    cols = get_library_index().collections(kind)
+    return [(c, len(cols[c].get("files") or {})) for c in sorted(cols)]
 
-def scan_library() -> Dict[str, Dict[str, int]]:
+def scan_library(force: bool = False) -> Dict[str, Dict[str, int]]:
     """
     Полный обзор библиотеки:
     {
       "cartoons": {"spongebob": 12, ...},
       "films": {"matrix": 3, ...}
     }
+    force=True — принудительно перечитать все папки.
     """
     ensure_dirs()
+    index = get_library_index()
     out: Dict[str, Dict[str, int]] = {"cartoons": {}, "films": {}}
     for kind in ("cartoons", "films"):
-        for col in list_collections(kind):
-            out[kind][col] = count_videos(kind, col)
+        if force:
+            index._refresh(kind, force=True)
+        for col, count in list_collections_with_counts(kind):
+            out[kind][col] = count
     return out
 
 def target_duration_range(min_sec: int, max_sec: int) -> Tuple[int, int]:
@@ -90,19 +237,44 @@ def target_duration_range(min_sec: int, max_sec: int) -> Tuple[int, int]:
     b = max(a, int(max_sec))
     return a, b
 
-async def pick_random_segment(src: str, out_path: str, min_sec: int, max_sec: int) -> Tuple[str, float, float]:
+def _segment_bounds(dur: float, min_sec: int, max_sec: int,
+                    start: Optional[float] = None) -> Tuple[float, float]:
     """
-    Режет случайный фрагмент [min..max] секунд из src в out_path (без перекодирования).
-    Возвращает (out_path, seg_start, seg_dur).
+    Старт и длина фрагмента [min..max] секунд внутри файла длиной dur.
+    start — желаемый старт (подрезается под длину файла); None — случайный.
     """
-    dur = await probe_duration(src)
     mn, mx = target_duration_range(min_sec, max_sec)
     seg = min(mx, int(dur) - 2) if dur > mn + 2 else mn
     seg = max(mn, min(mx, seg))
     if dur <= seg + 1:
         ss = 0.0
+    elif start is not None:
+        ss = max(0.0, min(float(start), dur - seg - 0.2))
     else:
         ss = random.uniform(0.0, max(0.0, dur - seg - 0.2))
+    return ss, float(seg)
+
+def _snap_to_shots(src: str, ss: float, seg: float, min_sec: int, max_sec: int) -> Tuple[float, float]:
+    """
+    Если для src построен индекс склеек (utils/shot_index.py) — сдвигает фрагмент
+    на границы планов и уводит старт с чёрных кадров, не выходя за [ss, ss + seg].
+    """
+    shots = load_shot_index(src)
+    if shots is None:
+        return ss, seg
+    mn, _mx = target_duration_range(min_sec, max_sec)
+    return shots.snap(ss, min(float(mn), seg), seg)
+
+async def pick_random_segment(src: str, out_path: str, min_sec: int, max_sec: int,
+                              start: Optional[float] = None) -> Tuple[str, float, float]:
+    """
+    Режет случайный фрагмент [min..max] секунд из src в out_path (без перекодирования).
+    start — заранее выбранный старт (например, сэмплером); иначе случайный.
+    Возвращает (out_path, seg_start, seg_dur).
+    """
+    dur = await probe_duration(src)
+    ss, seg = _segment_bounds(dur, min_sec, max_sec, start)
+    ss, seg = _snap_to_shots(src, ss, seg, min_sec, max_sec)
 
     await _run(
         FFMPEG_BIN, "-y",
@@ -112,104 +284,127 @@ async def pick_random_segment(src: str, out_path: str, min_sec: int, max_sec: in
         "-c", "copy",
         out_path
     )
-    return out_path, ss, float(seg)
+    return out_path, ss, seg
+
+# --- Вертикальная композиция: общие куски фильтрграфа ---
+_BG_CHAIN = (
+    # background: scale to cover, then crop 1080x1920, then blur
+    "scale=1080:1920:force_original_aspect_ratio=increase,"
+    "crop=1080:1920,"
+    "boxblur=luma_radius=40:luma_power=1:chroma_radius=40"
+)
+# foreground: fit/decrease and center
+_FG_CHAIN = "scale=1080:-2:force_original_aspect_ratio=decrease,setsar=1"
+
+_BANNER_XY = {
+    "top": "(W-w)/2:150",
+    "bottom": "(W-w)/2:H-h-50",
+    "center": "(W-w)/2:(H-h)/2",
+}
+
+# Ширина подготовленного баннера (половина ширины кадра)
+BANNER_WIDTH = 540
+
+# Профили кодирования: fps уходит в фильтрграф, args — в параметры выхода
+_PROFILES = {
+    "shorts": {
+        "fps": 30,
+        "args": (
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "22",
+            "-pix_fmt", "yuv420p", "-movflags", "+faststart",
+            "-c:a", "aac", "-b:a", "128k", "-ar", "48000",
+        ),
+    },
+}
+
+def _vertical_blur_chain(src: str, out: str, tag: str = "", banner: Optional[str] = None,
+                         position: str = "center") -> str:
+    """
+    Цепочка «блюр-фон + ролик по центру (+ баннер)» из метки src в метку out.
+    tag — суффикс для внутренних меток, чтобы несколько цепочек жили в одном графе.
+    """
+    graph = (
+        f"{src}split=2[v{tag}][vb{tag}];"
+        f"[vb{tag}]{_BG_CHAIN}[bg{tag}];"
+        f"[v{tag}]{_FG_CHAIN}[fg{tag}];"
+    )
+    if banner:
+        xy = _BANNER_XY.get(position, _BANNER_XY["center"])
+        graph += (
+            f"[bg{tag}][fg{tag}]overlay=(W-w)/2:(H-h)/2:format=auto[composed{tag}];"
+            f"[composed{tag}]{banner}overlay={xy}:format=auto{out}"
+        )
+    else:
+        graph += f"[bg{tag}][fg{tag}]overlay=(W-w)/2:(H-h)/2:format=auto{out}"
+    return graph
+
+def prepared_banner_path(banner_path: str) -> str:
+    """Путь к подготовленной копии баннера (рядом с оригиналом)"""
+    stem, _ext = os.path.splitext(banner_path)
+    return f"{stem}.{BANNER_WIDTH}w.png"
 
-async def compose_vertical_blur(src_path: str, out_path: str, banner_config: Optional[Dict] = None) -> str:
+def prepare_banner(banner_path: str) -> str:
+    """
+    Один раз масштабирует баннер до BANNER_WIDTH по ширине и переводит в RGBA,
+    сохраняя результат рядом с оригиналом. Вызывается при загрузке баннера;
+    при рендере используется готовый файл — без scale/format в фильтрграфе.
+    Повторный вызов пересобирает копию только если оригинал новее.
+    """
+    out_path = prepared_banner_path(banner_path)
+    if os.path.exists(out_path) and os.path.getmtime(out_path) >= os.path.getmtime(banner_path):
+        return out_path
+    with Image.open(banner_path) as img:
+        img = img.convert("RGBA")
+        h = max(1, round(img.height * BANNER_WIDTH / max(1, img.width)))
+        img = img.resize((BANNER_WIDTH, h), Image.LANCZOS)
+        tmp = out_path + ".tmp.png"
+        img.save(tmp, "PNG")
+    os.replace(tmp, out_path)
+    return out_path
+
+async def _resolve_banner(banner_config: Optional[Dict]) -> Tuple[Optional[str], str]:
+    """(путь к подготовленному баннеру или None, позиция)"""
+    if not banner_config or not banner_config.get("file"):
+        return None, "center"
+    banner_path = os.path.join(BANNERS_DIR, banner_config["file"])
+    if not os.path.exists(banner_path):
+        return None, "center"
+    prepared = await asyncio.to_thread(prepare_banner, banner_path)
+    return prepared, banner_config.get("position", "center")
+
+@lru_cache(maxsize=64)
+def _compose_filtergraph(banner: bool, position: str, profile: str) -> str:
+    """Собранный фильтрграф вертикальной композиции для (баннер?, позиция, профиль)"""
+    fps = _PROFILES[profile]["fps"]
+    graph = _vertical_blur_chain("[0:v]", "[vc]", banner="[1:v]" if banner else None, position=position)
+    return graph + f";[vc]fps={fps}"
+
+async def compose_vertical_blur(src_path: str, out_path: str, banner_config: Optional[Dict] = None,
+                                profile: str = "shorts") -> str:
     """
     9:16 вертикаль с блюром на фоне и опциональным баннером:
       - задник: размазанный фуллскрин (scale to cover + crop)
       - передний план: ролик по центру (fit/decrease)
-      - баннер: PNG логотип если указан
+      - баннер: заранее подготовленный PNG (см. prepare_banner), если указан и найден
     """
-    
-    # Базовый фильтр без баннера
-    base_filtergraph = (
-        "[0:v]split=2[v][vb];"
-        # background: scale to cover, then crop 1080x1920, then blur
-        "[vb]scale=1080:1920:force_original_aspect_ratio=increase,"
-        "crop=1080:1920,"
-        "boxblur=luma_radius=40:luma_power=1:chroma_radius=40[bg];"
-        # foreground: fit/decrease and center
-        "[v]scale=1080:-2:force_original_aspect_ratio=decrease,setsar=1[fg];"
-        "[bg][fg]overlay=(W-w)/2:(H-h)/2:format=auto"
-    )
-    
-    # Если есть баннер, модифицируем команду
-    if banner_config and banner_config.get("file"):
-        banner_file = banner_config.get("file")
-        banner_path = os.path.join(BANNERS_DIR, banner_file)
-        position = banner_config.get("position", "center")
-        
-        if os.path.exists(banner_path):
-            # Фильтр с баннером
-            filtergraph = (
-                "[0:v]split=2[v][vb];"
-                # background
-                "[vb]scale=1080:1920:force_original_aspect_ratio=increase,"
-                "crop=1080:1920,"
-                "boxblur=luma_radius=40:luma_power=1:chroma_radius=40[bg];"
-                # foreground
-                "[v]scale=1080:-2:force_original_aspect_ratio=decrease,setsar=1[fg];"
-                "[bg][fg]overlay=(W-w)/2:(H-h)/2:format=auto[composed];"
-                # banner overlay
-                f"[1:v]scale=540:-1,format=rgba[banner];"
-                f"[composed][banner]overlay="
-            )
-            
-            # Позиция баннера
-            if position == "top":
-                filtergraph += "(W-w)/2:150"
-            elif position == "bottom":
-                filtergraph += "(W-w)/2:H-h-50"
-            else:  # center
-                filtergraph += "(W-w)/2:(H-h)/2"
-            
-            filtergraph += ":format=auto"
-            
-            # Команда с баннером
-            await _run(
-                FFMPEG_BIN, "-y",
-                "-i", src_path,
-                "-i", banner_path,  # входной PNG баннер
-                "-filter_complex", filtergraph,
-                "-r", "30",
-                "-c:v", "libx264", "-preset", "veryfast", "-crf", "22",
-                "-pix_fmt", "yuv420p", "-movflags", "+faststart",
-                "-c:a", "aac", "-b:a", "128k", "-ar", "48000",
-                out_path
-            )
-        else:
-            # Баннер не найден, используем базовый фильтр
-            await _run(
-                FFMPEG_BIN, "-y",
-                "-i", src_path,
-                "-filter_complex", base_filtergraph,
-                "-r", "30",
-                "-c:v", "libx264", "-preset", "veryfast", "-crf", "22",
-                "-pix_fmt", "yuv420p", "-movflags", "+faststart",
-                "-c:a", "aac", "-b:a", "128k", "-ar", "48000",
-                out_path
-            )
-    else:
-        # Нет баннера, используем базовый фильтр
-        await _run(
-            FFMPEG_BIN, "-y",
-            "-i", src_path,
-            "-filter_complex", base_filtergraph,
-            "-r", "30",
-            "-c:v", "libx264", "-preset", "veryfast", "-crf", "22",
-            "-pix_fmt", "yuv420p", "-movflags", "+faststart",
-            "-c:a", "aac", "-b:a", "128k", "-ar", "48000",
-            out_path
-        )
-    
+    banner_path, position = await _resolve_banner(banner_config)
+
+    cmd = [FFMPEG_BIN, "-y", "-i", src_path]
+    if banner_path:
+        cmd += ["-i", banner_path]  # входной PNG баннер, уже нужного размера и в RGBA
+    cmd += ["-filter_complex", _compose_filtergraph(bool(banner_path), position, profile)]
+    cmd += [*_PROFILES[profile]["args"], out_path]
+
+    await _run(*cmd)
     return out_path
 
 async def make_cut_from_collection(kind: str, collection: str, out_dir: str,
                                    min_sec: int, max_sec: int,
-                                   banner_config: Optional[Dict] = None) -> Tuple[str, str, float]:
+                                   banner_config: Optional[Dict] = None,
+                                   channel: Optional[str] = None) -> Tuple[str, str, float]:
     """
-    Выбирает случайный файл из коллекции, режет фрагмент, делает вертикальную композицию с опциональным баннером.
+    Выбирает файл из коллекции, режет фрагмент, делает вертикальную композицию с опциональным баннером.
+    Файл и отрезок выдаются без повторов в рамках channel (по умолчанию — сама коллекция).
     Возвращает (final_video_path, picked_filename, seg_duration).
     
     banner_config: {"file": "banner.png", "position": "top|center|bottom"}
@@ -219,11 +414,105 @@ async def make_cut_from_collection(kind: str, collection: str, out_dir: str,
     if not videos:
         raise RuntimeError("В коллекции нет видеофайлов.")
 
-    src = random.choice(videos)
+    _mn, mx = target_duration_range(min_sec, max_sec)
+    src, start = await get_sampler().pick(channel or f"{kind}/{collection}", videos, mx + 0.2)
     tmp_seg = os.path.join(out_dir, "cut_tmp_source.mp4")
-    tmp_seg, _ss, seg_dur = await pick_random_segment(src, tmp_seg, min_sec, max_sec)
+    tmp_seg, _ss, seg_dur = await pick_random_segment(src, tmp_seg, min_sec, max_sec, start=start)
 
     final = os.path.join(out_dir, "cut_final_1080x1920.mp4")
     await compose_vertical_blur(tmp_seg, final, banner_config)
 
-    return final, os.path.basename(src), seg_dur
\ No newline at end of file
+    return final, os.path.basename(src), seg_dur
+
+async def _render_batch_from_source(src: str, segments: List[Tuple[float, float]], out_paths: List[str],
+                                    banner_path: Optional[str], position: str,
+                                    profile: str = "shorts") -> None:
+    """
+    Рендерит несколько фрагментов одного исходника за один проход ffmpeg:
+    исходник читается и декодируется один раз, кадры split/asplit-ом раздаются
+    по trim-цепочкам, у каждой — свой выход.
+    """
+    first = min(ss for ss, _ in segments)
+    fps = _PROFILES[profile]["fps"]
+    has_audio = await probe_has_audio(src)
+    k = len(segments)
+
+    cmd: List[str] = [FFMPEG_BIN, "-y", "-ss", f"{first:.3f}", "-i", src]
+    if banner_path:
+        cmd += ["-i", banner_path]
+
+    labels = "".join(f"[s{i}]" for i in range(k))
+    graph = [f"[0:v]split={k}{labels}" if k > 1 else "[0:v]null[s0]"]
+    if has_audio:
+        alabels = "".join(f"[as{i}]" for i in range(k))
+        graph.append(f"[0:a]asplit={k}{alabels}" if k > 1 else "[0:a]anull[as0]")
+    if banner_path:
+        blabels = "".join(f"[b{i}]" for i in range(k))
+        graph.append(f"[1:v]split={k}{blabels}" if k > 1 else "[1:v]null[b0]")
+
+    for i, (ss, seg) in enumerate(segments):
+        a, b = ss - first, ss - first + seg
+        graph.append(f"[s{i}]trim=start={a:.3f}:end={b:.3f},setpts=PTS-STARTPTS[t{i}]")
+        graph.append(_vertical_blur_chain(f"[t{i}]", f"[c{i}]", tag=str(i),
+                                          banner=f"[b{i}]" if banner_path else None,
+                                          position=position))
+        graph.append(f"[c{i}]fps={fps}[out{i}]")
+        if has_audio:
+            graph.append(f"[as{i}]atrim=start={a:.3f}:end={b:.3f},asetpts=PTS-STARTPTS[aout{i}]")
+
+    cmd += ["-filter_complex", ";".join(graph)]
+    for i, out_path in enumerate(out_paths):
+        cmd += ["-map", f"[out{i}]"]
+        if has_audio:
+            cmd += ["-map", f"[aout{i}]"]
+        cmd += [*_PROFILES[profile]["args"], out_path]
+
+    await _run(*cmd)
+
+async def make_cuts_batch_from_collection(kind: str, collection: str, out_dir: str, count: int,
+                                          min_sec: int, max_sec: int,
+                                          banner_config: Optional[Dict] = None,
+                                          channel: Optional[str] = None) -> List[Tuple[str, str, float]]:
+    """
+    Пакетные нарезки: планирует count непересекающихся фрагментов по файлам коллекции
+    (через сэмплер) и рендерит их по одному процессу ffmpeg на исходник.
+    Возвращает [(final_video_path, picked_filename, seg_duration), ...] в порядке планирования.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    videos = list_videos_in(kind, collection)
+    if not videos:
+        raise RuntimeError("В коллекции нет видеофайлов.")
+
+    _mn, mx = target_duration_range(min_sec, max_sec)
+    sampler = get_sampler()
+    key = channel or f"{kind}/{collection}"
+
+    # 1) План: (src, ss, seg) на каждый ролик
+    durations: Dict[str, float] = {}
+    plan: List[Tuple[str, float, float]] = []
+    for _ in range(max(1, int(count))):
+        src, start = await sampler.pick(key, videos, mx + 0.2)
+        if src not in durations:
+            durations[src] = await probe_duration(src)
+        ss, seg = _segment_bounds(durations[src], min_sec, max_sec, start)
+        ss, seg = _snap_to_shots(src, ss, seg, min_sec, max_sec)
+        plan.append((src, ss, seg))
+
+    banner_path, position = await _resolve_banner(banner_config)
+
+    # 2) Рендер: один проход на исходник
+    results: List[Tuple[str, str, float]] = [("", "", 0.0)] * len(plan)
+    by_src: Dict[str, List[int]] = {}
+    for i, (src, _ss, _seg) in enumerate(plan):
+        by_src.setdefault(src, []).append(i)
+
+    for src, idxs in by_src.items():
+        idxs.sort(key=lambda i: plan[i][1])
+        outs = [os.path.join(out_dir, f"cut_final_{i + 1:02d}_1080x1920.mp4") for i in idxs]
+        await _render_batch_from_source(
+            src, [(plan[i][1], plan[i][2]) for i in idxs], outs, banner_path, position
+        )
+        for i, out_path in zip(idxs, outs):
+            results[i] = (out_path, os.path.basename(src), plan[i][2])
+
+    return results
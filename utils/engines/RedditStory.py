@@ -7,6 +7,7 @@ from __future__ import annotations
 
 import os
 import math
+from bisect import bisect_right
 from typing import Dict, Any, List, Tuple, Optional
 from PIL import Image, ImageDraw, ImageFont
 
@@ -14,19 +15,17 @@ from utils.config import FONT_PATH, FFMPEG_BIN
 from utils.ffmpeg import _run as _ffrun
 from utils.backgrounds import choose_random_bg_segment
 from utils.story_gen import generate_story as _llm_generate
+from utils.timings import char_reveal_times
 
 # ======================== STORY GENERATION ========================
 
 async def _get_prompt_from_db(lang: str, preset: str) -> Optional[str]:
-    """Читает промпт из БД"""
+    """Читает промпт из БД (через кэш промптов)"""
     try:
-        from db.database import db
-        doc = await db().prompts.find_one({"scope": "reddit", "preset": preset, "lang": lang})
-        if doc and doc.get("text"):
-            return doc["text"]
+        from db.database import prompt_text
+        return await prompt_text("reddit", preset, lang)
     except Exception:
-        pass
-    return None
+        return None
 
 
 def _fallback_prompt(lang: str) -> str:
@@ -182,10 +181,13 @@ def _draw_reddit_card(base: Image.Image, W: int, H: int,
 
 def render_reddit_frames(out_dir: str, raw_title: str, raw_body: str,
                          fps: int, duration: float, theme_cfg: dict,
-                         canvas: Tuple[int, int] = (1080, 960)) -> Tuple[str, int]:
+                         canvas: Tuple[int, int] = (1080, 960),
+                         word_times: Optional[List[Tuple[float, float]]] = None) -> Tuple[str, int]:
     """Рендерит PNG кадры карточки Reddit с пагинацией
 
-    Canvas по умолчанию 1080x960 - нижняя половина экрана
+    Canvas по умолчанию 1080x960 - нижняя половина экрана.
+    word_times — [(start, end), ...] для слов тела из озвучки: текст появляется
+    синхронно с речью. Без них — равномерно по всей длительности.
     """
     os.makedirs(out_dir, exist_ok=True)
     total_frames = int(math.ceil(max(0.1, duration) * max(1, fps)))
@@ -198,6 +200,7 @@ def render_reddit_frames(out_dir: str, raw_title: str, raw_body: str,
 
     typing_frames = max(1, total_frames - int(0.5 * fps))
     total_chars = max(1, len(body_src))
+    char_times = char_reveal_times(body_src, word_times) if word_times else None
 
     # Предварительно разбиваем текст на страницы
     pages = _split_text_into_pages(body_src, W, H, title, theme_cfg)
@@ -212,7 +215,9 @@ def render_reddit_frames(out_dir: str, raw_title: str, raw_body: str,
     png_params = {"compress_level": 1}
 
     for i in range(total_frames):
-        if i < typing_frames:
+        if char_times is not None:
+            show_chars = min(total_chars, bisect_right(char_times, i / fps))
+        elif i < typing_frames:
             show_chars = int((i / typing_frames) * total_chars)
         else:
             show_chars = total_chars
@@ -1,7 +1,7 @@
 import asyncio
 import json
 import os
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from utils.config import FFMPEG_BIN, FFPROBE_BIN
 
@@ -36,23 +36,96 @@ async def probe_duration(path: str) -> float:
     except Exception:
         return 0.0
 
+async def probe_has_audio(path: str) -> bool:
+    out = await _run(
+        FFPROBE_BIN, "-v", "error",
+        "-select_streams", "a",
+        "-show_entries", "stream=index",
+        "-of", "json", path
+    )
+    try:
+        return bool(json.loads(out).get("streams"))
+    except Exception:
+        return False
+
 # ---------- АУДИО ----------
-async def loudness_normalize(in_audio: str, out_audio: str, target_i: float = -14.0):
+async def measure_loudness(path: str) -> Dict[str, float]:
+    """
+    Измерительный проход loudnorm (без записи результата):
+    input_i / input_tp / input_lra / input_thresh по EBU R128.
+    """
+    log = await _run(
+        FFMPEG_BIN, "-hide_banner", "-nostats",
+        "-i", path,
+        "-af", "loudnorm=print_format=json",
+        "-f", "null", "-"
+    )
+    start = log.rfind("{")
+    end = log.rfind("}")
+    data = json.loads(log[start:end + 1]) if start != -1 and end > start else {}
+    out = {}
+    for k in ("input_i", "input_tp", "input_lra", "input_thresh"):
+        try:
+            out[k] = float(data[k])
+        except (KeyError, TypeError, ValueError):
+            pass
+    return out
+
+async def loudness_normalize(in_audio: str, out_audio: str, target_i: float = -14.0,
+                             measured: Optional[Dict[str, float]] = None):
+    """
+    Нормализация громкости. С измерениями (measure_loudness) loudnorm работает
+    в линейном режиме — точно и без динамической компрессии.
+    """
+    af = f"loudnorm=I={target_i}:TP=-1.5:LRA=11"
+    if measured and {"input_i", "input_tp", "input_lra", "input_thresh"} <= set(measured):
+        af += (
+            f":measured_I={measured['input_i']}:measured_TP={measured['input_tp']}"
+            f":measured_LRA={measured['input_lra']}:measured_thresh={measured['input_thresh']}"
+            ":linear=true"
+        )
     await _run(
         FFMPEG_BIN, "-y",
         "-i", in_audio,
-        "-af", f"loudnorm=I={target_i}:TP=-1.5:LRA=11",
+        "-af", af,
         "-ar", "48000", "-ac", "2",
         out_audio
     )
 
+async def concat_audio_crossfade(parts: List[str], out_audio: str, crossfade: float = 0.04):
+    """
+    Склеивает аудиофрагменты подряд с короткими кроссфейдами на стыках
+    (без щелчков и пауз между кусками озвучки).
+    """
+    if len(parts) == 1:
+        await _run(FFMPEG_BIN, "-y", "-i", parts[0], "-c", "copy", out_audio)
+        return
+
+    cmd = [FFMPEG_BIN, "-y"]
+    for p in parts:
+        cmd += ["-i", p]
+    chain = []
+    prev = "[0:a]"
+    for i in range(1, len(parts)):
+        label = "[aout]" if i == len(parts) - 1 else f"[x{i}]"
+        chain.append(f"{prev}[{i}:a]acrossfade=d={crossfade}:c1=tri:c2=tri{label}")
+        prev = label
+    cmd += [
+        "-filter_complex", ";".join(chain),
+        "-map", "[aout]",
+        "-c:a", "libmp3lame", "-b:a", "192k",
+        out_audio
+    ]
+    await _run(*cmd)
+
 # ---------- СУБТИТРЫ/МУКС ----------
 async def mux_av_with_optional_subs(
     video_path: str,
     audio_path: str,
     srt_path: Optional[str],
     out_path: str,
-    metadata: Optional[Dict[str, str]] = None
+    metadata: Optional[Dict[str, str]] = None,
+    audio_gain_db: Optional[float] = None
 ) -> Tuple[bool, str]:
     # Оптимизация: используем stream copy для видео (без повторного кодирования)
     # Это в 10-20 раз быстрее чем перекодирование
@@ -76,6 +149,9 @@ async def mux_av_with_optional_subs(
         "-c:a", "aac", "-b:a", "128k", "-ar", "48000",
         "-movflags", "+faststart",
     ]
+    if audio_gain_db:
+        # Линейное усиление до целевой громкости — в том же проходе, что и кодирование аудио
+        cmd += ["-af", f"volume={audio_gain_db:.2f}dB"]
     if subs_included:
         cmd += ["-c:s", "mov_text"]
 
@@ -4,21 +4,43 @@
 """
 import asyncio
 from typing import Dict, List
-from utils.config import OPENAI_API_KEY, GROK_API_KEY
+from utils.llm import get_llm
 
-# Используем Grok API если есть ключ, иначе OpenAI
-USE_GROK = bool(GROK_API_KEY)
-GROK_CHAT_URL = "https://api.x.ai/v1/chat/completions"
-OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
+FALLBACK_FRENCH_METADATA = {
+    "description": "Histoire intéressante et captivante",
+    "hashtags": ["#histoire", "#viral", "#trending", "#shortsvideo"]
+}
 
-# Модели
-GROK_MODEL = "grok-3"
-OPENAI_MODEL = "gpt-4o-mini"
 
-# Выбираем API
-API_URL = GROK_CHAT_URL if USE_GROK else OPENAI_CHAT_URL
-API_KEY = GROK_API_KEY if USE_GROK else OPENAI_API_KEY
-MODEL = GROK_MODEL if USE_GROK else OPENAI_MODEL
+def normalize_french_metadata(description: str, hashtags: List[str]) -> Dict[str, any]:
+    """
+    Приводит ответ модели к формату подписи: описание до 100 символов,
+    ровно 4 хештега (недостающие добираются из дефолтных).
+    """
+    description = (description or "").strip().strip('"')
+    # Обрезаем до 100 символов если длиннее
+    if len(description) > 100:
+        description = description[:97] + "..."
+
+    # Проверяем что получили результат
+    if not description:
+        description = "Histoire captivante à découvrir"
+
+    hashtags = [t.strip() for t in (hashtags or []) if isinstance(t, str) and t.strip()]
+    hashtags = [t if t.startswith("#") else f"#{t}" for t in hashtags]
+
+    if len(hashtags) < 4:
+        # Добавляем дефолтные хештеги если не хватает
+        default_tags = ["#histoire", "#viral", "#trending", "#shortsvideo", "#pourtoi", "#fyp"]
+        for tag in default_tags:
+            if tag not in hashtags and len(hashtags) < 4:
+                hashtags.append(tag)
+
+    # Берем только первые 4 хештега
+    return {
+        "description": description,
+        "hashtags": hashtags[:4]
+    }
 
 
 async def generate_french_metadata(story_text: str, story_type: str = "default") -> Dict[str, any]:
@@ -35,12 +57,10 @@ async def generate_french_metadata(story_text: str, story_type: str = "default")
             "hashtags": ["#hashtag1", "#hashtag2", "#hashtag3", "#hashtag4"]
         }
     """
-    if not API_KEY:
+    llm = get_llm()
+    if not llm.available():
         # Fallback если нет API ключа
-        return {
-            "description": "Histoire intéressante et captivante",
-            "hashtags": ["#histoire", "#viral", "#trending", "#shortsvideo"]
-        }
+        return dict(FALLBACK_FRENCH_METADATA)
 
     # Определяем промпт в зависимости от типа истории
     if story_type == "educational":
@@ -87,11 +107,7 @@ HASHTAGS: #tag1 #tag2 #tag3 #tag4
 """
 
     try:
-        import aiohttp
-        headers = {"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"}
-
         payload = {
-            "model": MODEL,
             "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
@@ -100,57 +116,26 @@ HASHTAGS: #tag1 #tag2 #tag3 #tag4
             "max_tokens": 200,
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(API_URL, json=payload, headers=headers, timeout=60) as resp:
-                data = await resp.json()
-                if resp.status != 200:
-                    api_name = "Grok" if USE_GROK else "OpenAI"
-                    print(f"{api_name} error {resp.status}: {data}")
-                    raise RuntimeError(f"{api_name} error")
-
-                text = data["choices"][0]["message"]["content"].strip()
-
-                # Парсим ответ
-                description = ""
-                hashtags = []
-
-                for line in text.split("\n"):
-                    line = line.strip()
-                    if line.startswith("DESCRIPTION:"):
-                        description = line.replace("DESCRIPTION:", "").strip()
-                        # Обрезаем до 100 символов если длиннее
-                        if len(description) > 100:
-                            description = description[:97] + "..."
-                    elif line.startswith("HASHTAGS:"):
-                        tags_str = line.replace("HASHTAGS:", "").strip()
-                        hashtags = [tag.strip() for tag in tags_str.split() if tag.startswith("#")]
-
-                # Проверяем что получили результат
-                if not description:
-                    description = "Histoire captivante à découvrir"
-
-                if len(hashtags) < 4:
-                    # Добавляем дефолтные хештеги если не хватает
-                    default_tags = ["#histoire", "#viral", "#trending", "#shortsvideo", "#pourtoi", "#fyp"]
-                    for tag in default_tags:
-                        if tag not in hashtags and len(hashtags) < 4:
-                            hashtags.append(tag)
-
-                # Берем только первые 4 хештега
-                hashtags = hashtags[:4]
-
-                return {
-                    "description": description,
-                    "hashtags": hashtags
-                }
+        text = (await llm.chat(payload, timeout=60)).strip()
+
+        # Парсим ответ
+        description = ""
+        hashtags = []
+
+        for line in text.split("\n"):
+            line = line.strip()
+            if line.startswith("DESCRIPTION:"):
+                description = line.replace("DESCRIPTION:", "").strip()
+            elif line.startswith("HASHTAGS:"):
+                tags_str = line.replace("HASHTAGS:", "").strip()
+                hashtags = [tag.strip() for tag in tags_str.split() if tag.startswith("#")]
+
+        return normalize_french_metadata(description, hashtags)
 
     except Exception as e:
         print(f"Error generating French metadata: {e}")
         # Fallback
-        return {
-            "description": "Histoire intéressante et captivante",
-            "hashtags": ["#histoire", "#viral", "#trending", "#shortsvideo"]
-        }
+        return dict(FALLBACK_FRENCH_METADATA)
 
 
 def format_french_caption(title: str, description: str, hashtags: List[str]) -> str:
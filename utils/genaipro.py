@@ -4,9 +4,12 @@
 """
 import os
 import asyncio
-import aiohttp
 import logging
-from typing import List, Tuple, Optional, Dict, Any
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from utils.http import download_to_file, get_session
+from utils.tts_cache import get_tts_cache, tts_cache_key
+from utils.tts_eta import get_completion_predictor
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +19,11 @@ logger = logging.getLogger(__name__)
 
 BASE_URL = "https://genaipro.vn/api/v1"
 
+# Интервал плотного опроса вокруг предсказанного момента готовности, сек
+TIGHT_POLL_SECONDS = 0.5
+# Суммарный лимит запросов статуса к API (на все задачи в работе), запросов/сек
+POLL_RATE_PER_SEC = float(os.getenv("GENAIPRO_POLL_RPS", "4"))
+
 
 def _get_api_token() -> str:
     """Получает JWT токен для genaipro.vn из env"""
@@ -84,27 +92,27 @@ async def list_voices(
     url = f"{BASE_URL}/labs/voices"
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=_get_headers(), params=params, timeout=30) as resp:
-                if resp.status != 200:
-                    error_text = await resp.text()
-                    raise RuntimeError(f"GenAIPro API error ({resp.status}): {error_text}")
+        session = get_session(url)
+        async with session.get(url, headers=_get_headers(), params=params, timeout=30) as resp:
+            if resp.status != 200:
+                error_text = await resp.text()
+                raise RuntimeError(f"GenAIPro API error ({resp.status}): {error_text}")
 
-                data = await resp.json()
+            data = await resp.json()
 
-                # Проверяем, что data - это dict
-                if not isinstance(data, dict):
-                    logger.error(f"Unexpected API response type: {type(data)}, data: {data}")
-                    raise RuntimeError(f"Unexpected API response format: expected dict, got {type(data)}")
+            # Проверяем, что data - это dict
+            if not isinstance(data, dict):
+                logger.error(f"Unexpected API response type: {type(data)}, data: {data}")
+                raise RuntimeError(f"Unexpected API response format: expected dict, got {type(data)}")
 
-                voices = data.get("voices", [])
+            voices = data.get("voices", [])
 
-                # Проверяем, что voices - это list
-                if not isinstance(voices, list):
-                    logger.error(f"Unexpected voices type: {type(voices)}, voices: {voices}")
-                    raise RuntimeError(f"Unexpected voices format: expected list, got {type(voices)}")
+            # Проверяем, что voices - это list
+            if not isinstance(voices, list):
+                logger.error(f"Unexpected voices type: {type(voices)}, voices: {voices}")
+                raise RuntimeError(f"Unexpected voices format: expected list, got {type(voices)}")
 
-                return voices
+            return voices
     except Exception as e:
         logger.exception("Failed to fetch voices from GenAIPro: %s", e)
         raise
@@ -153,11 +161,12 @@ async def list_voices_simple(
         }
         gender_param = gender_map.get(gender, gender.lower())
 
-    voices = await list_voices(
-        page=0,
-        page_size=50,
+    from utils.voice_catalog import get_voice_catalog
+    voices = await get_voice_catalog().voices(
         language=language,
-        gender=gender_param
+        gender=gender_param,
+        page=0,
+        page_size=50
     )
 
     result = []
@@ -200,13 +209,13 @@ async def get_user_balance() -> Dict[str, Any]:
     """
     url = f"{BASE_URL}/me"
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=_get_headers(), timeout=30) as resp:
-            if resp.status != 200:
-                error_text = await resp.text()
-                raise RuntimeError(f"GenAIPro API error ({resp.status}): {error_text}")
+    session = get_session(url)
+    async with session.get(url, headers=_get_headers(), timeout=30) as resp:
+        if resp.status != 200:
+            error_text = await resp.text()
+            raise RuntimeError(f"GenAIPro API error ({resp.status}): {error_text}")
 
-            return await resp.json()
+        return await resp.json()
 
 
 # ============================================================
@@ -252,18 +261,18 @@ async def create_tts_task(
         "use_speaker_boost": use_speaker_boost
     }
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, headers=_get_headers(), json=payload, timeout=60) as resp:
-            if resp.status != 200:
-                error_text = await resp.text()
-                raise RuntimeError(f"GenAIPro create task error ({resp.status}): {error_text}")
+    session = get_session(url)
+    async with session.post(url, headers=_get_headers(), json=payload, timeout=60) as resp:
+        if resp.status != 200:
+            error_text = await resp.text()
+            raise RuntimeError(f"GenAIPro create task error ({resp.status}): {error_text}")
 
-            data = await resp.json()
-            task_id = data.get("task_id")
-            if not task_id:
-                raise RuntimeError(f"No task_id in response: {data}")
+        data = await resp.json()
+        task_id = data.get("task_id")
+        if not task_id:
+            raise RuntimeError(f"No task_id in response: {data}")
 
-            return task_id
+        return task_id
 
 
 async def get_task_status(task_id: str) -> Dict[str, Any]:
@@ -278,27 +287,162 @@ async def get_task_status(task_id: str) -> Dict[str, Any]:
     """
     url = f"{BASE_URL}/labs/task/{task_id}"
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=_get_headers(), timeout=30) as resp:
-            if resp.status != 200:
-                error_text = await resp.text()
-                raise RuntimeError(f"GenAIPro get task error ({resp.status}): {error_text}")
+    session = get_session(url)
+    async with session.get(url, headers=_get_headers(), timeout=30) as resp:
+        if resp.status != 200:
+            error_text = await resp.text()
+            raise RuntimeError(f"GenAIPro get task error ({resp.status}): {error_text}")
+
+        return await resp.json()
+
+
+class TaskPoller:
+    """
+    Общий опросчик статусов TTS-задач.
+
+    Все ожидающие task_id живут в одном расписании: у каждой задачи своё время
+    следующей проверки, а сами запросы get_task_status идут не чаще
+    POLL_RATE_PER_SEC суммарно (пакетного эндпоинта у API нет, поэтому запросы
+    разносятся во времени). Каждый ожидающий получает свой asyncio.Future.
+    Число запросов растёт с частотой опроса, а не с числом задач в работе.
+    """
+
+    def __init__(self, rate_per_sec: float = POLL_RATE_PER_SEC):
+        self._min_gap = 1.0 / max(rate_per_sec, 0.1)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+        self._last_request = 0.0
+
+    async def wait(
+        self,
+        task_id: str,
+        max_wait_seconds: float,
+        poll_interval: float,
+        text_chars: Optional[int] = None
+    ) -> Dict[str, Any]:
+        entry = self._entries.get(task_id)
+        if entry is None:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            expected = get_completion_predictor().predict(text_chars) if text_chars else None
+            entry = {
+                "future": loop.create_future(),
+                "started": now,
+                "deadline": now + max_wait_seconds,
+                "max_wait": max_wait_seconds,
+                "chars": text_chars,
+                "expected": expected,
+                # с предсказанием — первый запрос почти к моменту готовности, дальше плотно
+                "next_poll": now + (expected * 0.9 if expected is not None else poll_interval),
+                "interval": TIGHT_POLL_SECONDS if expected is not None else poll_interval,
+                "in_flight": False,
+            }
+            self._entries[task_id] = entry
+            if self._runner is None or self._runner.done():
+                self._runner = asyncio.create_task(self._run())
+            self._wakeup.set()
+        return await asyncio.shield(entry["future"])
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._entries:
+            idle = [(e["next_poll"], tid) for tid, e in self._entries.items() if not e["in_flight"]]
+            delay = None
+            if idle:
+                next_poll, task_id = min(idle)
+                delay = max(next_poll, self._last_request + self._min_gap) - loop.time()
+                if delay <= 0:
+                    self._last_request = loop.time()
+                    self._entries[task_id]["in_flight"] = True
+                    asyncio.create_task(self._poll(task_id))
+                    continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _finish(self, task_id: str) -> None:
+        self._entries.pop(task_id, None)
+        self._wakeup.set()
+
+    async def _poll(self, task_id: str) -> None:
+        entry = self._entries[task_id]
+        future = entry["future"]
+        try:
+            task_info = await get_task_status(task_id)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            self._finish(task_id)
+            return
+
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        status = task_info.get("status", "").lower()
+
+        if status == "completed":
+            if entry["chars"]:
+                get_completion_predictor().record(entry["chars"], now - entry["started"])
+            if not future.done():
+                future.set_result(task_info)
+            self._finish(task_id)
+            return
+
+        if status == "failed" or status == "error":
+            error_msg = task_info.get("error", "Unknown error")
+            if not future.done():
+                future.set_exception(RuntimeError(f"TTS task failed: {error_msg}"))
+            self._finish(task_id)
+            return
+
+        if now >= entry["deadline"]:
+            if not future.done():
+                future.set_exception(TimeoutError(
+                    f"Task {task_id} did not complete within {entry['max_wait']} seconds"
+                ))
+            self._finish(task_id)
+            return
+
+        # Задача затянулась — плавно увеличиваем интервал (exponential backoff)
+        expected = entry["expected"]
+        overdue_after = (expected * 1.5) if expected is not None else 30.0
+        if now - entry["started"] > overdue_after:
+            entry["interval"] = min(entry["interval"] * 1.5, 10.0)
+        entry["next_poll"] = min(now + entry["interval"], entry["deadline"])
+        entry["in_flight"] = False
+        self._wakeup.set()
+
+
+_poller: Optional[TaskPoller] = None
 
-            return await resp.json()
+
+def get_task_poller() -> TaskPoller:
+    global _poller
+    if _poller is None:
+        _poller = TaskPoller()
+    return _poller
 
 
 async def wait_for_task_completion(
     task_id: str,
     max_wait_seconds: int = 300,
-    poll_interval: float = 2.0
+    poll_interval: float = 2.0,
+    text_chars: Optional[int] = None
 ) -> Dict[str, Any]:
     """
-    Ожидает завершения задачи с polling.
+    Ожидает завершения задачи через общий TaskPoller.
+
+    Если известна длина текста и уже накоплена статистика, первый запрос
+    откладывается почти до ожидаемого момента готовности, дальше — частые
+    проверки с постепенным backoff. Дедлайн — по monotonic-часам.
 
     Args:
         task_id: ID задачи
         max_wait_seconds: Максимальное время ожидания в секундах
-        poll_interval: Интервал между проверками в секундах
+        poll_interval: Интервал между проверками в секундах (без предсказания)
+        text_chars: Длина озвучиваемого текста (для предсказания времени)
 
     Returns:
         Информация о завершенной задаче
@@ -307,28 +451,7 @@ async def wait_for_task_completion(
         TimeoutError: Если задача не завершилась вовремя
         RuntimeError: Если задача завершилась с ошибкой
     """
-    elapsed = 0.0
-
-    while elapsed < max_wait_seconds:
-        task_info = await get_task_status(task_id)
-        status = task_info.get("status", "").lower()
-
-        if status == "completed":
-            return task_info
-
-        if status == "failed" or status == "error":
-            error_msg = task_info.get("error", "Unknown error")
-            raise RuntimeError(f"TTS task failed: {error_msg}")
-
-        # Ждем перед следующей проверкой
-        await asyncio.sleep(poll_interval)
-        elapsed += poll_interval
-
-        # Увеличиваем интервал после нескольких попыток (exponential backoff)
-        if elapsed > 30:
-            poll_interval = min(poll_interval * 1.5, 10.0)
-
-    raise TimeoutError(f"Task {task_id} did not complete within {max_wait_seconds} seconds")
+    return await get_task_poller().wait(task_id, max_wait_seconds, poll_interval, text_chars)
 
 
 async def download_audio(audio_url: str, output_path: str) -> str:
@@ -342,17 +465,7 @@ async def download_audio(audio_url: str, output_path: str) -> str:
     Returns:
         Путь к сохраненному файлу
     """
-    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
-
-    async with aiohttp.ClientSession() as session:
-        async with session.get(audio_url, timeout=120) as resp:
-            if resp.status != 200:
-                raise RuntimeError(f"Failed to download audio ({resp.status})")
-
-            audio_data = await resp.read()
-            with open(output_path, "wb") as f:
-                f.write(audio_data)
-
+    await download_to_file(audio_url, output_path, timeout=120)
     return output_path
 
 
@@ -390,6 +503,13 @@ async def synthesize_speech(
     Returns:
         Путь к аудиофайлу
     """
+    # 0. Такой же запрос уже озвучивали — отдаём из кэша без кредитов
+    cache = get_tts_cache()
+    cache_key = tts_cache_key(text, voice_id, model_id, speed, stability, similarity,
+                              style, use_speaker_boost)
+    if await cache.get(cache_key, output_path):
+        return output_path
+
     # 1. Создаем задачу
     logger.info(f"Creating TTS task for {len(text)} chars with voice {voice_id}")
     task_id = await create_tts_task(
@@ -406,7 +526,7 @@ async def synthesize_speech(
 
     # 2. Ожидаем завершения
     logger.info("Waiting for task completion...")
-    task_info = await wait_for_task_completion(task_id, max_wait_seconds)
+    task_info = await wait_for_task_completion(task_id, max_wait_seconds, text_chars=len(text))
 
     # 3. Скачиваем результат
     result_url = task_info.get("result")
@@ -416,13 +536,256 @@ async def synthesize_speech(
     logger.info(f"Downloading audio from {result_url}")
     await download_audio(result_url, output_path)
 
+    # Посимвольный alignment (если API его вернул) -> тайминги слов рядом с аудио
+    alignment = task_info.get("alignment") or task_info.get("normalized_alignment")
+    if isinstance(alignment, dict) and alignment.get("characters"):
+        from utils.timings import save_timings, words_from_char_alignment
+        save_timings(output_path, words_from_char_alignment(
+            alignment["characters"],
+            alignment.get("character_start_times_seconds") or [],
+            alignment.get("character_end_times_seconds") or [],
+        ))
+    await cache.put(cache_key, output_path)
+
     logger.info(f"Audio saved to {output_path}")
     return output_path
 
 
+# Параметры чанкинга: целевой размер куска и сколько задач держим одновременно
+CHUNK_TARGET_CHARS = int(os.getenv("GENAIPRO_CHUNK_CHARS", "600"))
+MAX_PARALLEL_TASKS = int(os.getenv("GENAIPRO_MAX_PARALLEL", "3"))
+
+_task_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_task_semaphore() -> asyncio.Semaphore:
+    global _task_semaphore
+    if _task_semaphore is None:
+        _task_semaphore = asyncio.Semaphore(MAX_PARALLEL_TASKS)
+    return _task_semaphore
+
+
+async def _save_merged_timings(part_paths: List[str], output_path: str, crossfade: float) -> None:
+    """
+    Тайминги кусков -> тайминги склеенного файла. Если хоть у одного куска
+    alignment нет, не пишем ничего (сработает локальное выравнивание).
+    """
+    from utils.ffmpeg import probe_duration
+    from utils.timings import load_timings, merge_timings, save_timings
+
+    parts = []
+    for p in part_paths:
+        words = load_timings(p)
+        if not words:
+            return
+        parts.append((words, await probe_duration(p)))
+    save_timings(output_path, merge_timings(parts, crossfade))
+
+
+async def _cancel_jobs(jobs: List[asyncio.Task]) -> None:
+    """
+    Отменяет ещё идущие куски и дожидается их завершения — иначе они продолжают
+    опрашивать GenAIPro и скачивают .partN.mp3 уже после очистки
+    """
+    for job in jobs:
+        job.cancel()
+    await asyncio.gather(*jobs, return_exceptions=True)
+
+
+def _remove_parts(part_paths: List[str]) -> None:
+    from utils.timings import timings_path
+
+    for p in part_paths:
+        for path in (p, timings_path(p)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def split_text_chunks(text: str, target_chars: int = CHUNK_TARGET_CHARS) -> List[str]:
+    """
+    Делит текст на куски ~target_chars по границам предложений
+    (предложение никогда не режется пополам).
+    """
+    from utils.subtitles import split_into_sentences
+
+    chunks: List[str] = []
+    cur = ""
+    for sentence in split_into_sentences(text):
+        if cur and len(cur) + 1 + len(sentence) > target_chars:
+            chunks.append(cur)
+            cur = sentence
+        else:
+            cur = f"{cur} {sentence}" if cur else sentence
+    if cur:
+        chunks.append(cur)
+    return chunks or [text]
+
+
+async def synthesize_speech_chunked(
+    text: str,
+    voice_id: str,
+    output_path: str,
+    model_id: str = "eleven_multilingual_v2",
+    style: float = 0.0,
+    speed: float = 1.0,
+    stability: float = 0.5,
+    similarity: float = 0.75,
+    use_speaker_boost: bool = True,
+    max_wait_seconds: int = 300,
+    chunk_chars: int = CHUNK_TARGET_CHARS,
+    crossfade: float = 0.04
+) -> str:
+    """
+    Синтез длинного текста кусками: текст режется по предложениям, задачи
+    отправляются одновременно (не больше MAX_PARALLEL_TASKS), каждый кусок
+    скачивается по готовности, затем всё склеивается с коротким кроссфейдом.
+    Время ≈ самый медленный кусок, а не сумма.
+
+    Параметры как у synthesize_speech, плюс:
+        chunk_chars: Целевой размер куска в символах
+        crossfade: Длительность кроссфейда на стыках, сек
+    """
+    from utils.ffmpeg import concat_audio_crossfade
+
+    chunks = split_text_chunks(text, chunk_chars)
+    voice_params = dict(
+        voice_id=voice_id, model_id=model_id, style=style, speed=speed,
+        stability=stability, similarity=similarity, use_speaker_boost=use_speaker_boost,
+        max_wait_seconds=max_wait_seconds,
+    )
+    if len(chunks) == 1:
+        return await synthesize_speech(text=text, output_path=output_path, **voice_params)
+
+    # Весь текст уже озвучивали целиком — не собираем заново
+    cache = get_tts_cache()
+    cache_key = tts_cache_key(text, voice_id, model_id, speed, stability, similarity,
+                              style, use_speaker_boost)
+    if await cache.get(cache_key, output_path):
+        return output_path
+
+    logger.info(f"Chunked TTS: {len(text)} chars -> {len(chunks)} chunks")
+    base, _ = os.path.splitext(output_path)
+    part_paths = [f"{base}.part{i}.mp3" for i in range(len(chunks))]
+    semaphore = _get_task_semaphore()
+
+    async def _one(chunk: str, part_path: str) -> str:
+        async with semaphore:
+            return await synthesize_speech(text=chunk, output_path=part_path, **voice_params)
+
+    jobs = [asyncio.create_task(_one(c, p)) for c, p in zip(chunks, part_paths)]
+    try:
+        await asyncio.gather(*jobs)
+        await concat_audio_crossfade(part_paths, output_path, crossfade=crossfade)
+        await _save_merged_timings(part_paths, output_path, crossfade)
+    except BaseException:
+        await _cancel_jobs(jobs)
+        raise
+    finally:
+        _remove_parts(part_paths)
+
+    await cache.put(cache_key, output_path)
+    logger.info(f"Audio saved to {output_path}")
+    return output_path
+
+
+async def synthesize_speech_stream(
+    sentences: AsyncIterator[str],
+    voice_id: str,
+    output_path: str,
+    model_id: str = "eleven_multilingual_v2",
+    style: float = 0.0,
+    speed: float = 1.0,
+    stability: float = 0.5,
+    similarity: float = 0.75,
+    use_speaker_boost: bool = True,
+    max_wait_seconds: int = 300,
+    chunk_chars: int = CHUNK_TARGET_CHARS,
+    crossfade: float = 0.04
+) -> str:
+    """
+    Синтез текста, который ещё генерируется: предложения копятся в куски
+    и каждый кусок уходит в GenAIPro, как только набран — первый кусок
+    озвучивается, пока LLM дописывает концовку. Первый кусок короче
+    остальных, чтобы синтез стартовал как можно раньше.
+
+    Returns:
+        Полный озвученный текст (предложения через пробел)
+    """
+    from utils.ffmpeg import concat_audio_crossfade
+
+    voice_params = dict(
+        voice_id=voice_id, model_id=model_id, style=style, speed=speed,
+        stability=stability, similarity=similarity, use_speaker_boost=use_speaker_boost,
+        max_wait_seconds=max_wait_seconds,
+    )
+    base, _ = os.path.splitext(output_path)
+    semaphore = _get_task_semaphore()
+    jobs: List[asyncio.Task] = []
+    part_paths: List[str] = []
+    texts: List[str] = []
+
+    async def _one(chunk: str, part_path: str) -> str:
+        async with semaphore:
+            return await synthesize_speech(text=chunk, output_path=part_path, **voice_params)
+
+    def _submit(chunk: str) -> None:
+        part_path = f"{base}.part{len(part_paths)}.mp3"
+        part_paths.append(part_path)
+        jobs.append(asyncio.create_task(_one(chunk, part_path)))
+
+    try:
+        cur = ""
+        async for sentence in sentences:
+            texts.append(sentence)
+            limit = chunk_chars // 3 if not jobs else chunk_chars
+            if cur and len(cur) + 1 + len(sentence) > limit:
+                _submit(cur)
+                cur = sentence
+            else:
+                cur = f"{cur} {sentence}" if cur else sentence
+        if cur:
+            _submit(cur)
+        if not jobs:
+            raise RuntimeError("Empty text stream for TTS")
+
+        logger.info(f"Streamed TTS: {len(jobs)} chunks submitted")
+        await asyncio.gather(*jobs)
+        await concat_audio_crossfade(part_paths, output_path, crossfade=crossfade)
+        await _save_merged_timings(part_paths, output_path, crossfade)
+    except BaseException:
+        await _cancel_jobs(jobs)
+        raise
+    finally:
+        _remove_parts(part_paths)
+
+    full_text = " ".join(texts)
+    await get_tts_cache().put(
+        tts_cache_key(full_text, voice_id, model_id, speed, stability, similarity, style, use_speaker_boost),
+        output_path,
+    )
+    logger.info(f"Audio saved to {output_path}")
+    return full_text
+
+
 async def get_voice_preview_url(voice_id: str) -> Optional[str]:
     """
-    Получает URL готового превью голоса (без генерации).
+    URL готового превью голоса из каталога (кэш с фоновым обновлением).
+
+    Args:
+        voice_id: ID голоса
+
+    Returns:
+        URL превью или None если не найден
+    """
+    from utils.voice_catalog import get_voice_catalog
+    return await get_voice_catalog().preview_url(voice_id)
+
+
+async def fetch_voice_preview_url(voice_id: str) -> Optional[str]:
+    """
+    Запрашивает у API URL готового превью голоса (без генерации).
 
     Args:
         voice_id: ID голоса
@@ -433,30 +796,30 @@ async def get_voice_preview_url(voice_id: str) -> Optional[str]:
     url = f"{BASE_URL}/labs/voices/{voice_id}"
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=_get_headers(), timeout=30) as resp:
-                if resp.status != 200:
-                    logger.warning(f"Failed to get voice info for {voice_id}: {resp.status}")
-                    return None
-
-                data = await resp.json()
-
-                # Проверяем наличие preview_url или samples
-                if isinstance(data, dict):
-                    # Пробуем получить preview_url
-                    preview_url = data.get("preview_url")
-                    if preview_url:
-                        return preview_url
-
-                    # Если нет preview_url, пробуем получить первый sample
-                    samples = data.get("samples", [])
-                    if samples and len(samples) > 0:
-                        if isinstance(samples[0], dict):
-                            return samples[0].get("audio_url") or samples[0].get("url")
-                        elif isinstance(samples[0], str):
-                            return samples[0]
-
+        session = get_session(url)
+        async with session.get(url, headers=_get_headers(), timeout=30) as resp:
+            if resp.status != 200:
+                logger.warning(f"Failed to get voice info for {voice_id}: {resp.status}")
                 return None
+
+            data = await resp.json()
+
+            # Проверяем наличие preview_url или samples
+            if isinstance(data, dict):
+                # Пробуем получить preview_url
+                preview_url = data.get("preview_url")
+                if preview_url:
+                    return preview_url
+
+                # Если нет preview_url, пробуем получить первый sample
+                samples = data.get("samples", [])
+                if samples and len(samples) > 0:
+                    if isinstance(samples[0], dict):
+                        return samples[0].get("audio_url") or samples[0].get("url")
+                    elif isinstance(samples[0], str):
+                        return samples[0]
+
+            return None
     except Exception as e:
         logger.exception("Failed to get voice preview URL: %s", e)
         return None
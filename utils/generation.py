@@ -1,13 +1,20 @@
 # utils/generation.py
 from __future__ import annotations
 
+import asyncio
 import os
-from typing import Any, Dict, Union
+from typing import Any, Dict, Optional, Union
 
+from utils.audio_post import loudness_gain_db
 from utils.backgrounds import choose_random_bg_segment
+from utils.config import STREAM_STORY_TTS
 from utils.ffmpeg import mux_av_with_optional_subs, probe_duration
-from utils.subtitles import build_srt_by_text_length
-from utils.tts import synthesize_tts
+from utils.length_control import count_words, get_length_controller, trim_body
+from utils.story_buffer import get_story_buffer
+from utils.story_dedup import STORY_DEDUP_RETRIES, DuplicateStoryError, dedup_stream, fingerprint, get_story_index
+from utils.subtitles import build_srt_by_text_length, build_srt_from_timings
+from utils.timings import get_word_timings
+from utils.tts import synthesize_tts, synthesize_tts_stream
 
 # Импортируем из папки RedditStory если файл не создан
 try:
@@ -41,10 +48,8 @@ if 'reddit_generate' not in globals():
         # Получаем промпт из БД
         prompt = None
         try:
-            from db.database import db
-            doc = await db().prompts.find_one({"scope": "reddit", "preset": preset, "lang": lang})
-            if doc and doc.get("text"):
-                prompt = doc["text"]
+            from db.database import prompt_text
+            prompt = await prompt_text("reddit", preset, lang)
         except Exception:
             pass
         
@@ -116,6 +121,11 @@ def _norm_str(x: Any, default: str = "") -> str:
     return default if x is None else str(x).strip()
 
 
+def _channel_key(ch: Dict[str, Any]) -> str:
+    """Стабильный ключ канала для сэмплера футажа и прочей статистики по каналу"""
+    return _norm_str(ch.get("channel_key") or ch.get("_id") or ch.get("name") or "default")
+
+
 async def _resolve_channel(channel: Union[Dict[str, Any], str, int]) -> Dict[str, Any]:
     """Допускаем dict/имя/_id/tg_channel_id; при ошибках — отдаём вменяемый дефолт"""
     if isinstance(channel, dict):
@@ -156,8 +166,6 @@ async def _resolve_channel(channel: Union[Dict[str, Any], str, int]) -> Dict[str
 async def _generate_reddit(ch: Dict[str, Any], out_dir: str) -> Dict[str, str]:
     """Генерация Reddit истории с синхронизацией текста и аудио"""
     # 1) Генерируем только текст (БЕЗ рендеринга кадров)
-    from utils.story_gen import generate_story as _llm_generate
-
     lang = _norm_str(ch.get("tts_lang") or "en").lower()
     target_sec = int(ch.get("reddit_target_sec") or 75)
     preset = _norm_str(ch.get("prompt_preset") or "default")
@@ -165,135 +173,264 @@ async def _generate_reddit(ch: Dict[str, Any], out_dir: str) -> Dict[str, str]:
     # Получаем промпт из БД
     prompt = None
     try:
-        from db.database import db
-        doc = await db().prompts.find_one({"scope": "reddit", "preset": preset, "lang": lang})
-        if doc and doc.get("text"):
-            prompt = doc["text"]
+        from db.database import prompt_text
+        prompt = await prompt_text("reddit", preset, lang)
     except Exception:
         pass
 
-    # Генерируем текст истории
-    text = await _llm_generate(prompt, preset, lang, target_sec=target_sec)
-    parts = (text or "Untitled\n\n").split("\n", 1)
-    title = parts[0].strip() or "Untitled"
-    body = (parts[1] if len(parts) > 1 else "").strip()
-    tts_text = f"{title}. {body}"
-
-    # 2) Генерируем TTS СРАЗУ, чтобы получить реальную длительность
     tts_voice = ch.get("tts_voice")
     tts_speed = float(ch.get("tts_speed") or 1.3)
-
     audio_path = os.path.join(out_dir, "voice.mp3")
-    await synthesize_tts(
-        text=tts_text,
-        out_path=audio_path,
-        voice=tts_voice,
-        lang=lang,
-        speed=tts_speed,
-    )
+    french_meta = None
+    # Потоковый путь: французские метаданные приходят последней строкой того же
+    # ответа; drain_task дочитывает её, если поток оборван по лимиту длины
+    meta_sink: Optional[Dict[str, Any]] = None
+    drain_task: Optional[asyncio.Task] = None
+
+    # Почти-дубликаты уже выпущенных историй канала отсеиваем до TTS
+    channel_key = _channel_key(ch)
+    story_index = get_story_index()
+
+    # Длина текста под target_sec по выученной скорости речи голоса
+    length_ctl = get_length_controller()
+    target_words = length_ctl.target_words(target_sec, tts_voice, tts_speed, lang)
+    max_words = length_ctl.max_words(target_words)
+
+    def _final(story):
+        # Лишнее срезаем по границе предложения до TTS, а не после; отпечаток —
+        # по тому, что реально озвучим и опубликуем (им же проверяем и пишем в индекс)
+        title = story["title"] or "Untitled"
+        body = trim_body(f"{title}.", story["body"], max_words)
+        return title, body, fingerprint(f"{title}\n\n{body}")
+
+    # Готовая история из буфера предгенерации — LLM-этап пропускаем
+    story_type = ch.get("story_type") or "reddit"
+    story = get_story_buffer().take(preset, lang, story_type, prompt, target_sec, target_words)
+    final = _final(story) if story is not None else None
+    while final is not None and story_index.is_duplicate_fp(channel_key, final[2]):
+        print(f"[Generation] Buffered story is a near-duplicate for {channel_key}, skipping")
+        story = get_story_buffer().take(preset, lang, story_type, prompt, target_sec, target_words,
+                                        record_demand=False)
+        final = _final(story) if story is not None else None
+
+    if story is None and STREAM_STORY_TTS:
+        # Текст и озвучка одновременно: предложения уходят в TTS по мере генерации
+        from utils.story_gen import generate_story_stream
+        fragments = []
+        if ch.get("want_french_meta"):
+            meta_sink = {}
+
+        async def _drain(stream):
+            # Остаток истории в TTS не идёт — дочитываем ради строки метаданных
+            try:
+                async for _ in stream:
+                    pass
+            finally:
+                await stream.aclose()
+
+        async def _sentences():
+            nonlocal drain_task
+            stream = dedup_stream(
+                channel_key,
+                lambda: generate_story_stream(prompt, preset, lang, target_sec=target_sec,
+                                              target_words=target_words, meta_sink=meta_sink),
+            )
+            words = 0
+            try:
+                async for fragment in stream:
+                    if not fragments and not fragment.endswith((".", "!", "?", "…")):
+                        fragment += "."  # заголовок озвучиваем отдельной фразой
+                    # Лимит по длине: остаток генерации в TTS не нужен
+                    words += count_words(fragment)
+                    if len(fragments) >= 2 and words > max_words:
+                        if meta_sink is not None:
+                            drain_task = asyncio.create_task(_drain(stream))
+                            stream = None
+                        break
+                    fragments.append(fragment)
+                    yield fragment
+            finally:
+                if stream is not None:
+                    await stream.aclose()
+
+        tts_text = await synthesize_tts_stream(
+            _sentences(),
+            out_path=audio_path,
+            voice=tts_voice,
+            lang=lang,
+            speed=tts_speed,
+        )
+        title = fragments[0].rstrip(".") or "Untitled"
+        body = " ".join(fragments[1:]).strip()
+        story_fp = fingerprint(f"{title}\n\n{body}")
+    else:
+        if story is None:
+            # История + французские метаданные одним запросом (с фолбэком на старый путь)
+            from utils.story_gen import generate_story_structured
+            for attempt in range(STORY_DEDUP_RETRIES + 1):
+                story = await generate_story_structured(prompt, preset, lang, target_sec=target_sec,
+                                                        target_words=target_words)
+                final = _final(story)
+                if not story_index.is_duplicate_fp(channel_key, final[2]):
+                    break
+                if attempt == STORY_DEDUP_RETRIES:
+                    # повтор не озвучиваем и не публикуем — задача падает с понятной ошибкой
+                    raise DuplicateStoryError(
+                        f"Near-duplicate story for {channel_key} after {STORY_DEDUP_RETRIES} retries"
+                    )
+                print(f"[Generation] Near-duplicate story for {channel_key}, regenerating")
+        title, body, story_fp = final
+        french_meta = story["french_meta"]
+        tts_text = f"{title}. {body}"
+
+        # 2) Генерируем TTS СРАЗУ, чтобы получить реальную длительность
+        await synthesize_tts(
+            text=tts_text,
+            out_path=audio_path,
+            voice=tts_voice,
+            lang=lang,
+            speed=tts_speed,
+        )
 
-    # Получаем РЕАЛЬНУЮ длительность аудио
-    real_dur = await probe_duration(audio_path)
-    dur = max(1.0, real_dur)
+    try:
+        # Получаем РЕАЛЬНУЮ длительность аудио
+        real_dur = await probe_duration(audio_path)
+        dur = max(1.0, real_dur)
+        length_ctl.record(tts_voice, tts_speed, lang, count_words(tts_text), real_dur)
 
-    # 3) ТЕПЕРЬ рендерим кадры с РЕАЛЬНОЙ длительностью аудио для синхронизации
-    from utils.engines.RedditStory import render_reddit_frames
+        # Тайминги слов озвучки: от движка TTS или локальное выравнивание по паузам
+        word_timings = await get_word_timings(audio_path, tts_text)
+        title_words = len(f"{title}.".split())
+        body_word_times = [(s, e) for _, s, e in word_timings[title_words:]]
 
-    frames_dir = os.path.join(out_dir, "frames")
-    fps = int(ch.get("fps") or 30)
-    theme_cfg = {
-        "subreddit": ch.get("reddit_subreddit") or "r/AskReddit",
-        "meta": ch.get("reddit_meta") or "↑ 12.3k • 6 hours ago",
-        "pad": 24,
-    }
+        # 3) ТЕПЕРЬ рендерим кадры с РЕАЛЬНОЙ длительностью аудио для синхронизации
+        from utils.engines.RedditStory import render_reddit_frames
 
-    render_reddit_frames(
-        out_dir=frames_dir,
-        raw_title=title,
-        raw_body=body,
-        fps=fps,
-        duration=dur,  # Используем РЕАЛЬНУЮ длительность аудио!
-        theme_cfg=theme_cfg,
-        canvas=(1080, 960),  # Нижняя половина экрана - карточка не на весь экран!
-    )
+        frames_dir = os.path.join(out_dir, "frames")
+        fps = int(ch.get("fps") or 30)
+        theme_cfg = {
+            "subreddit": ch.get("reddit_subreddit") or "r/AskReddit",
+            "meta": ch.get("reddit_meta") or "↑ 12.3k • 6 hours ago",
+            "pad": 24,
+        }
 
-    # 4) Получаем параметры фона
-    background_type = _norm_str(ch.get("background_type") or "video").lower()
-    card_position = _norm_str(ch.get("reddit_card_position") or "center").lower()
-
-    # 5) Генерируем или выбираем фон
-    if background_type == "animation":
-        # Генерируем анимацию
-        from utils.animations import AnimationGenerator
-        import random
-
-        anim_gen = AnimationGenerator(output_dir=out_dir)
-        available_anims = anim_gen.get_available_animations()
-
-        # Выбираем случайную анимацию или используем заданную в конфиге
-        animation_type = ch.get("animation_type")
-        if not animation_type or animation_type not in [a["type"] for a in available_anims]:
-            # Случайный выбор если не задано или не найдено
-            animation_type = random.choice(available_anims)["type"]
-
-        bg_clip = await anim_gen.generate_animation(
-            animation_type=animation_type,
-            duration=int(dur) + 1,  # +1 секунда для запаса
-            output_path=os.path.join(out_dir, "animation_bg.mp4"),
-            resolution="1080p"
+        render_reddit_frames(
+            out_dir=frames_dir,
+            raw_title=title,
+            raw_body=body,
+            fps=fps,
+            duration=dur,  # Используем РЕАЛЬНУЮ длительность аудио!
+            theme_cfg=theme_cfg,
+            canvas=(1080, 960),  # Нижняя половина экрана - карточка не на весь экран!
+            word_times=body_word_times or None,  # текст появляется синхронно с речью
         )
-    else:
-        # Используем видео фон
-        bg_clip = await choose_random_bg_segment(
+
+        # 4) Получаем параметры фона
+        background_type = _norm_str(ch.get("background_type") or "video").lower()
+        card_position = _norm_str(ch.get("reddit_card_position") or "center").lower()
+
+        # 5) Генерируем или выбираем фон
+        if background_type == "animation":
+            # Генерируем анимацию
+            from utils.animations import AnimationGenerator
+            import random
+
+            anim_gen = AnimationGenerator(output_dir=out_dir)
+            available_anims = anim_gen.get_available_animations()
+
+            # Выбираем случайную анимацию или используем заданную в конфиге
+            animation_type = ch.get("animation_type")
+            if not animation_type or animation_type not in [a["type"] for a in available_anims]:
+                # Случайный выбор если не задано или не найдено
+                animation_type = random.choice(available_anims)["type"]
+
+            bg_clip = await anim_gen.generate_animation(
+                animation_type=animation_type,
+                duration=int(dur) + 1,  # +1 секунда для запаса
+                output_path=os.path.join(out_dir, "animation_bg.mp4"),
+                resolution="1080p"
+            )
+        else:
+            # Используем видео фон
+            bg_clip = await choose_random_bg_segment(
+                duration=dur,
+                out_dir=out_dir,
+                pool_dir=os.path.join("assets", "bg", "reddit"),  # fallback директория
+                fallback=os.path.join("assets", "bg", "default.mp4"),
+                scope="reddit",  # берет из БД в первую очередь
+                channel=channel_key,  # без повторов отрезков в рамках канала
+            )
+
+        # 6) Композиция видеоряда (без аудио)
+        composed_video = await reddit_compose(
+            frames_dir=frames_dir,
+            bg_video_path=bg_clip,
             duration=dur,
+            fps=fps,
             out_dir=out_dir,
-            pool_dir=os.path.join("assets", "bg", "reddit"),  # fallback директория
-            fallback=os.path.join("assets", "bg", "default.mp4"),
-            scope="reddit"  # берет из БД в первую очередь
+            background_type=background_type,
+            card_position=card_position,
         )
 
-    # 6) Композиция видеоряда (без аудио)
-    composed_video = await reddit_compose(
-        frames_dir=frames_dir,
-        bg_video_path=bg_clip,
-        duration=dur,
-        fps=fps,
-        out_dir=out_dir,
-        background_type=background_type,
-        card_position=card_position,
-    )
+        # 7) Субтитры (опционально) + финальный mux
+        subs_lang = _norm_str(ch.get("subs_lang") or "") or None
 
-    # 7) Субтитры (опционально) + финальный mux
-    subs_lang = _norm_str(ch.get("subs_lang") or "") or None
+        srt_path = None
+        if subs_lang:
+            srt_path = os.path.join(out_dir, "subs.srt")
+            if word_timings:
+                build_srt_from_timings(word_timings, out_path=srt_path)
+            else:
+                build_srt_by_text_length(text=tts_text, total_duration=dur, out_path=srt_path)
 
-    srt_path = None
-    if subs_lang:
-        srt_path = os.path.join(out_dir, "subs.srt")
-        build_srt_by_text_length(text=tts_text, total_duration=dur, out_path=srt_path)
+        # Одинаковая громкость роликов канала: измерение кэшируется, усиление — внутри mux
+        try:
+            audio_gain_db = await loudness_gain_db(audio_path)
+        except Exception as e:
+            print(f"[Generation] Loudness measurement failed: {e}")
+            audio_gain_db = None
+
+        final_path = os.path.join(out_dir, "final.mp4")
+        await mux_av_with_optional_subs(
+            video_path=composed_video,
+            audio_path=audio_path,
+            srt_path=srt_path,
+            out_path=final_path,
+            metadata={"title": title},
+            audio_gain_db=audio_gain_db,
+        )
 
-    final_path = os.path.join(out_dir, "final.mp4")
-    await mux_av_with_optional_subs(
-        video_path=composed_video,
-        audio_path=audio_path,
-        srt_path=srt_path,
-        out_path=final_path,
-        metadata={"title": title},
-    )
+        # Обновляем счетчик генераций
+        try:
+            from db.database import db
+            await db().channels.update_one(
+                {"_id": ch.get("_id")},
+                {"$inc": {"generated_total": 1}}
+            )
+        except Exception:
+            pass
 
-    # Обновляем счетчик генераций
-    try:
-        from db.database import db
-        await db().channels.update_one(
-            {"_id": ch.get("_id")},
-            {"$inc": {"generated_total": 1}}
-        )
-    except Exception:
-        pass
+        # История выпущена — следующие сверяются и с ней
+        story_index.add_fp(channel_key, story_fp)
+
+        if drain_task is not None:
+            try:
+                await drain_task
+            except Exception as e:
+                print(f"[Generation] Failed to read French metadata from stream: {e}")
+        if meta_sink is not None:
+            # None — вызывающий запросит метаданные отдельно
+            french_meta = meta_sink.get("french_meta")
+    finally:
+        # Ошибка рендера/фона/mux — дочитывать поток больше незачем
+        if drain_task is not None and not drain_task.done():
+            drain_task.cancel()
 
     return {
         "video_path": final_path,
         "text": f'{title}\n\n{body}',
         "is_reddit": "1",
+        "french_meta": french_meta,
     }
 
 
@@ -318,7 +455,8 @@ async def _generate_cuts(ch: Dict[str, Any], out_dir: str) -> Dict[str, str]:
         out_dir=out_dir,
         min_sec=mn,
         max_sec=mx,
-        banner_config=banner_config  # Передаем конфиг баннера
+        banner_config=banner_config,  # Передаем конфиг баннера
+        channel=_channel_key(ch),
     )
 
     # Обновляем счетчик
@@ -387,10 +525,8 @@ async def _generate_animation_only(ch: Dict[str, Any], out_dir: str) -> Dict[str
     # 2) Генерируем текст истории
     prompt = None
     try:
-        from db.database import db
-        doc = await db().prompts.find_one({"scope": "reddit", "preset": preset, "lang": lang})
-        if doc and doc.get("text"):
-            prompt = doc["text"]
+        from db.database import prompt_text
+        prompt = await prompt_text("reddit", preset, lang)
     except Exception:
         pass
 
@@ -5,9 +5,8 @@ Generates images using FAL.ai API
 import os
 import asyncio
 from typing import List, Optional
-import aiohttp
-import aiofiles
 from utils.config import FAL_API_KEY
+from utils.http import download_to_file, get_session
 
 
 class ImageGenerator:
@@ -63,32 +62,27 @@ class ImageGenerator:
         if seed is not None:
             payload["seed"] = seed
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                self.base_url,
-                headers=headers,
-                json=payload
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise Exception(f"FAL API error: {response.status} - {error_text}")
-
-                result = await response.json()
-
-                if 'images' in result and len(result['images']) > 0:
-                    image_url = result['images'][0]['url']
-
-                    # Download image
-                    async with session.get(image_url) as img_response:
-                        if img_response.status == 200:
-                            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                            async with aiofiles.open(output_path, 'wb') as f:
-                                await f.write(await img_response.read())
-                            return output_path
-                        else:
-                            raise Exception(f"Failed to download image: {img_response.status}")
-                else:
-                    raise Exception("No images generated")
+        session = get_session(self.base_url)
+        async with session.post(
+            self.base_url,
+            headers=headers,
+            json=payload
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise Exception(f"FAL API error: {response.status} - {error_text}")
+
+            result = await response.json()
+
+            if 'images' in result and len(result['images']) > 0:
+                image_url = result['images'][0]['url']
+
+            else:
+                raise Exception("No images generated")
+
+        # Download image
+        await download_to_file(image_url, output_path)
+        return output_path
 
     async def generate_images(
         self,
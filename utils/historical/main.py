@@ -4,14 +4,19 @@ Combines story generation, TTS, image generation, and video assembly
 """
 import os
 import json
+import asyncio
 from datetime import datetime
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 from .story_generator import StoryGenerator
 from .tts_generator import TTSGenerator
 from .image_generator import ImageGenerator
 from .video_assembler import VideoAssembler
 
+# How many FAL image / edge-tts requests run at once while scenes are streaming in
+IMAGE_CONCURRENCY = 2
+AUDIO_CONCURRENCY = 4
+
 
 class HistoricalVideoGenerator:
     """Main class for generating complete historical videos"""
@@ -83,40 +88,57 @@ class HistoricalVideoGenerator:
         os.makedirs(images_dir, exist_ok=True)
         os.makedirs(audio_dir, exist_ok=True)
 
-        # Step 1: Generate story
-        story_data = self.story_generator.generate_historical_story(
-            topic=topic,
-            language=language,
-            duration_seconds=duration_seconds,
-            num_scenes=num_scenes
-        )
-
-        # Save story data
-        story_path = os.path.join(project_dir, "story.json")
-        with open(story_path, 'w', encoding='utf-8') as f:
-            json.dump(story_data, f, ensure_ascii=False, indent=2)
-
-        # Step 2: Generate audio for each scene
-        scene_texts = [scene['text'] for scene in story_data['scenes']]
-
-        audio_paths = await self.tts_generator.generate_multiple_audio_async(
-            texts=scene_texts,
-            output_dir=audio_dir,
-            language=language,
-            voice_gender=voice_gender
-        )
-
-        # Step 3: Generate images for each scene
-        image_prompts = [scene['image_prompt'] for scene in story_data['scenes']]
-
-        image_paths = await self.image_generator.generate_images(
-            prompts=image_prompts,
-            output_dir=images_dir,
-            width=image_width,
-            height=image_height,
-            num_inference_steps=num_inference_steps,
-            seed_start=42
-        )
+        # Steps 1-3: the story is streamed; audio and image jobs for each
+        # scene start as soon as that scene is written
+        audio_tasks: List[asyncio.Task] = []
+        image_tasks: List[asyncio.Task] = []
+        image_limit = asyncio.Semaphore(IMAGE_CONCURRENCY)
+        audio_limit = asyncio.Semaphore(AUDIO_CONCURRENCY)
+
+        async def generate_audio(i: int, text: str) -> str:
+            async with audio_limit:
+                return await self.tts_generator.generate_audio(
+                    text,
+                    os.path.join(audio_dir, f"scene_{i+1:03d}.mp3"),
+                    language,
+                    voice_gender
+                )
+
+        async def generate_image(i: int, prompt: str) -> str:
+            async with image_limit:
+                return await self.image_generator.generate_image(
+                    prompt=prompt,
+                    output_path=os.path.join(images_dir, f"scene_{i+1:03d}.png"),
+                    width=image_width,
+                    height=image_height,
+                    num_inference_steps=num_inference_steps,
+                    seed=42 + i
+                )
+
+        def on_scene(i: int, scene: Dict) -> None:
+            audio_tasks.append(asyncio.create_task(generate_audio(i, scene['text'])))
+            image_tasks.append(asyncio.create_task(generate_image(i, scene['image_prompt'])))
+
+        try:
+            story_data = await self.story_generator.generate_historical_story(
+                topic=topic,
+                language=language,
+                duration_seconds=duration_seconds,
+                num_scenes=num_scenes,
+                on_scene=on_scene
+            )
+
+            # Save story data
+            story_path = os.path.join(project_dir, "story.json")
+            with open(story_path, 'w', encoding='utf-8') as f:
+                json.dump(story_data, f, ensure_ascii=False, indent=2)
+
+            audio_paths = await asyncio.gather(*audio_tasks)
+            image_paths = await asyncio.gather(*image_tasks)
+        except BaseException:
+            for task in audio_tasks + image_tasks:
+                task.cancel()
+            raise
 
         # Step 4: Assemble video
         scenes = []
@@ -158,13 +180,13 @@ class HistoricalVideoGenerator:
 
         return result
 
-    def generate_topic_suggestions(
+    async def generate_topic_suggestions(
         self,
         num_suggestions: int = 10,
         language: str = 'russian'
     ) -> list:
         """Get topic suggestions"""
-        return self.story_generator.generate_topic_suggestions(
+        return await self.story_generator.generate_topic_suggestions(
             num_suggestions=num_suggestions,
             language=language
         )
@@ -1,39 +1,121 @@
 """
 Story Generator Module
-Generates historical stories using OpenAI API
+Generates historical stories via the shared async LLM layer (utils.llm)
 """
+import json
 import os
-from typing import Dict, List, Optional
-from openai import OpenAI
-from utils.config import OPENAI_API_KEY
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.llm import get_llm
+
+# Model used when the request is served by OpenAI (Grok uses its default model)
+HISTORICAL_OPENAI_MODEL = os.getenv("HISTORICAL_OPENAI_MODEL", "gpt-4-turbo-preview")
+
+_SCENES_START_RE = re.compile(r'(?<!\\)"scenes"\s*:\s*\[')
+
+
+def _valid_scene(scene: Any) -> bool:
+    """A scene is usable only with both narration text and an image prompt"""
+    return isinstance(scene, dict) and bool(scene.get("text")) and bool(scene.get("image_prompt"))
+
+
+def _scene_key(scene: Dict) -> tuple:
+    return (str(scene["text"]).strip(), str(scene["image_prompt"]).strip())
+
+
+class ScenesStreamParser:
+    """
+    Incremental parser for a streamed story JSON.
+    Returns each object of the "scenes" array as soon as it is closed,
+    so scene jobs can start before the whole answer is written.
+    """
+
+    def __init__(self):
+        self.buf = ""
+        self._pos: Optional[int] = None  # scan position inside the scenes array
+        self._depth = 0
+        self._in_str = False
+        self._escape = False
+        self._obj_start: Optional[int] = None
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Add a chunk of the answer, return newly completed scenes"""
+        self.buf += chunk
+        if self.done:
+            return []
+        if self._pos is None:
+            match = _SCENES_START_RE.search(self.buf)
+            if not match:
+                return []
+            self._pos = match.end()
+
+        scenes = []
+        buf = self.buf
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_str:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_str = False
+            elif ch == '"':
+                self._in_str = True
+            elif ch in "{[":
+                if self._depth == 0 and ch == "{":
+                    self._obj_start = i
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:  # end of the scenes array
+                    self.done = True
+                    i += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._obj_start is not None:
+                    try:
+                        scene = json.loads(buf[self._obj_start:i + 1])
+                    except ValueError:
+                        scene = None
+                    if _valid_scene(scene):
+                        scenes.append(scene)
+                    self._obj_start = None
+            i += 1
+        self._pos = i
+        return scenes
 
 
 class StoryGenerator:
-    """Generates historical stories and image prompts using OpenAI"""
+    """Generates historical stories and image prompts using Grok/OpenAI"""
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self):
         """Initialize Story Generator"""
-        self.api_key = api_key or OPENAI_API_KEY
-        if not self.api_key:
-            raise ValueError("OpenAI API key not found in config")
+        if not get_llm().available():
+            raise ValueError("LLM API key not found in config (GROK_API_KEY / OPENAI_API_KEY)")
 
-        self.client = OpenAI(api_key=self.api_key)
-
-    def generate_historical_story(
+    async def generate_historical_story(
         self,
         topic: str,
         language: str = 'russian',
         duration_seconds: int = 600,
-        num_scenes: int = 30
+        num_scenes: int = 30,
+        on_scene: Optional[Callable[[int, Dict], None]] = None
     ) -> Dict:
         """
         Generate a historical story with scenes and image prompts
 
+        The answer is streamed; on_scene(index, scene) is called as soon as
+        each scene is complete, before the rest of the story is written.
+
         Args:
             topic: Historical topic
             language: Language for the story ('russian', 'english', 'ukrainian')
             duration_seconds: Target duration of the video
             num_scenes: Number of scenes/images to generate
+            on_scene: Callback for each finished scene (in order)
 
         Returns:
             Dict with story structure
@@ -65,10 +147,9 @@ Storytelling Style:
 - Show don't just tell - describe actions and scenes vividly
 - End with powerful conclusion or lasting impact
 
-Format your response as JSON with this structure:
+Format your response as JSON with this structure (no other keys):
 {{
     "title": "Captivating story title",
-    "full_text": "Complete dramatic narrative",
     "scenes": [
         {{
             "text": "Dramatic narrative for this scene with vivid details",
@@ -94,19 +175,52 @@ Image Prompts Requirements (CRITICAL):
 
         user_prompt = f"Create a historical story about: {topic}"
 
+        payload = {
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "response_format": {"type": "json_object"},
+            "temperature": 0.7,
+        }
+
+        parser = ScenesStreamParser()
+        scenes: List[Dict] = []
+        emitted = set()
+
+        def emit(new_scenes: List[Dict]) -> None:
+            for scene in new_scenes:
+                if not _valid_scene(scene) or _scene_key(scene) in emitted:
+                    continue
+                emitted.add(_scene_key(scene))
+                scene['duration'] = float(scene.get('duration') or 0) or duration_seconds / max(num_scenes, 1)
+                scenes.append(scene)
+                if on_scene is not None:
+                    on_scene(len(scenes) - 1, scene)
+
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.7,
-            )
+            async for delta in get_llm().stream(
+                payload, timeout=600, models={"openai": HISTORICAL_OPENAI_MODEL}
+            ):
+                emit(parser.feed(delta))
 
-            import json
-            story_data = json.loads(response.choices[0].message.content)
+            content = parser.buf
+            try:
+                story_data = json.loads(content[content.find("{"):content.rfind("}") + 1])
+            except ValueError:
+                story_data = {}
+            if not isinstance(story_data, dict):
+                story_data = {}
+
+            # Scenes the incremental parser could not see (unusual formatting);
+            # matched by content, so nothing is emitted twice
+            emit(story_data.get('scenes') or [])
+            if not scenes:
+                raise ValueError("model returned no scenes")
+
+            story_data['title'] = story_data.get('title') or topic
+            story_data['scenes'] = scenes
+            story_data['full_text'] = "\n\n".join(scene['text'] for scene in scenes)
 
             # Validate and normalize durations
             total_duration = sum(scene['duration'] for scene in story_data['scenes'])
@@ -120,12 +234,20 @@ Image Prompts Requirements (CRITICAL):
         except Exception as e:
             raise Exception(f"Error generating story: {str(e)}")
 
-    def generate_topic_suggestions(
+    async def generate_topic_suggestions(
         self,
         num_suggestions: int = 5,
-        language: str = 'russian'
+        language: str = 'russian',
+        avoid: Optional[List[str]] = None
     ) -> List[str]:
-        """Generate interesting historical topic suggestions"""
+        """
+        Generate interesting historical topic suggestions
+
+        Args:
+            num_suggestions: Number of topics
+            language: Language of the topics
+            avoid: Already known topics the model must not repeat
+        """
         language_names = {
             'russian': 'Russian',
             'ukrainian': 'Ukrainian',
@@ -149,19 +271,24 @@ Format as JSON object:
     "topics": ["Dramatic topic 1", "Dramatic topic 2", ...]
 }}
 """
+        if avoid:
+            prompt += "\nDo NOT repeat or rephrase any of these already used topics:\n"
+            prompt += "\n".join(f"- {t}" for t in avoid)
+
+        payload = {
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            "response_format": {"type": "json_object"},
+            "temperature": 0.9,
+        }
 
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.9,
+            # Topics are pre-generated into a pool in the background: no need to hedge
+            content = await get_llm().chat(
+                payload, timeout=120, models={"openai": HISTORICAL_OPENAI_MODEL}, hedge=False
             )
-
-            import json
-            result = json.loads(response.choices[0].message.content)
+            result = json.loads(content[content.find("{"):content.rfind("}") + 1])
             return result.get('topics', [])
 
         except Exception as e:
@@ -0,0 +1,152 @@
+# utils/http.py
+"""
+Общий HTTP-клиент для всех внешних API (GenAIPro, Grok/OpenAI, FAL.ai и т.д.).
+
+Одна долгоживущая aiohttp-сессия на хост:
+  - keep-alive — TCP/TLS рукопожатие платится один раз, а не на каждый запрос;
+  - кэш DNS;
+  - лимит одновременных соединений на хост.
+
+Жизненный цикл: start_http() в main() до старта поллинга, close_http() при остановке.
+Если get_session() вызван раньше start_http() — сессия создаётся лениво.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import aiofiles
+import aiohttp
+
+# Максимум одновременных соединений к одному хосту
+HTTP_LIMIT_PER_HOST = int(os.getenv("HTTP_LIMIT_PER_HOST", "8"))
+# Сколько секунд держим DNS-ответ и простаивающее соединение
+HTTP_DNS_TTL = int(os.getenv("HTTP_DNS_TTL", "300"))
+HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "60"))
+
+# Размер блока при потоковом скачивании
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+_sessions: Dict[str, aiohttp.ClientSession] = {}
+
+
+def _host(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc.lower()}"
+
+
+def _new_session() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=0,  # общий лимит не нужен — сессия и так на один хост
+        limit_per_host=HTTP_LIMIT_PER_HOST,
+        ttl_dns_cache=HTTP_DNS_TTL,
+        keepalive_timeout=HTTP_KEEPALIVE,
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+
+def get_session(url: str) -> aiohttp.ClientSession:
+    """
+    Пуловая сессия для хоста из url. Закрывать её не нужно —
+    этим занимается close_http() при остановке бота.
+    """
+    host = _host(url)
+    session = _sessions.get(host)
+    if session is None or session.closed:
+        session = _new_session()
+        _sessions[host] = session
+    return session
+
+
+async def start_http() -> None:
+    """Сбрасывает пул (на случай повторного запуска в том же процессе)"""
+    await close_http()
+
+
+async def close_http() -> None:
+    """Аккуратно закрывает все сессии пула"""
+    sessions = list(_sessions.values())
+    _sessions.clear()
+    for session in sessions:
+        if not session.closed:
+            await session.close()
+    if sessions:
+        # даём SSL-транспортам корректно закрыться (рекомендация aiohttp)
+        await asyncio.sleep(0.25)
+
+
+def _hash_file(path: str) -> "hashlib._Hash":
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h
+
+
+async def download_to_file(
+    url: str,
+    out_path: str,
+    timeout: float = 120,
+    expected_sha256: Optional[str] = None,
+    retries: int = 2,
+) -> str:
+    """
+    Потоковое скачивание в файл: блоки пишутся через aiofiles по мере прихода,
+    память не растёт с размером файла и event loop не блокируется.
+
+    Данные сначала пишутся в <out_path>.part (оставшийся от прошлых вызовов
+    удаляется). Если соединение оборвалось, следующая попытка докачивает с места обрыва (Range), если сервер это
+    поддерживает, иначе начинает заново. После скачивания проверяется sha256
+    (если передан expected_sha256), и .part атомарно переименовывается в out_path.
+
+    Returns:
+        sha256 скачанного файла (hex)
+    """
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    part_path = out_path + ".part"
+    session = get_session(url)
+
+    # .part от прошлого вызова может принадлежать другому URL — не доверяем ему;
+    # докачка (Range) — только между попытками этого вызова
+    if os.path.exists(part_path):
+        os.remove(part_path)
+
+    attempt = 0
+    while True:
+        offset = os.path.getsize(part_path) if attempt and os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            async with session.get(url, headers=headers, timeout=timeout) as resp:
+                if resp.status == 416:
+                    # .part уже полный (или битый) — начинаем заново
+                    os.remove(part_path)
+                    raise aiohttp.ClientPayloadError("Range not satisfiable")
+                if resp.status not in (200, 206):
+                    raise RuntimeError(f"Download failed ({resp.status}): {url}")
+
+                if resp.status == 206 and offset:
+                    digest = await asyncio.to_thread(_hash_file, part_path)
+                    mode = "ab"
+                else:
+                    digest = hashlib.sha256()
+                    mode = "wb"
+
+                async with aiofiles.open(part_path, mode) as f:
+                    async for block in resp.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        digest.update(block)
+                        await f.write(block)
+            break
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            attempt += 1
+            if attempt > retries:
+                raise
+
+    sha256 = digest.hexdigest()
+    if expected_sha256 and sha256.lower() != expected_sha256.lower():
+        os.remove(part_path)
+        raise RuntimeError(f"Checksum mismatch for {url}: {sha256} != {expected_sha256}")
+    os.replace(part_path, out_path)
+    return sha256
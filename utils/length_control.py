@@ -0,0 +1,167 @@
+# utils/length_control.py
+"""
+Контроль длины истории под целевую длительность озвучки.
+
+Скорость речи (слов в секунду) учится по факту: после TTS известны число
+слов и реальная длительность (probe_duration) — наблюдение записывается для
+ключа (voice, speed, lang) как экспоненциальное среднее. По ней:
+  - target_words — сколько слов просить у модели для reddit_target_sec;
+  - max_tokens_for — потолок токенов с запасом 30%: обрыв по max_tokens
+    оставляет недописанную фразу (trim_body её не срежет, если текст
+    короче предела), а JSON-ответ (structured/bulk) ломает целиком — там
+    поверх этого потолка берётся ещё больший запас (utils.story_gen);
+  - trim_body — срез тела истории по границе предложения (если её нет в
+    пределах бюджета — по границе фразы или слова), чтобы аудио не выходило
+    за цель больше чем на LENGTH_TOLERANCE.
+
+Наблюдения хранятся в CACHE_DIR/length_control.json.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+from typing import Dict, Optional
+
+from utils.config import CACHE_DIR
+
+LENGTH_STATE_PATH = os.path.join(CACHE_DIR, "length_control.json")
+
+# Допустимое превышение целевой длины
+LENGTH_TOLERANCE = 0.03
+# Вес нового наблюдения в экспоненциальном среднем
+LENGTH_EWMA_ALPHA = 0.3
+
+# Слов в секунду при скорости 1.0, пока нет наблюдений
+DEFAULT_WPS = {"ru": 2.2, "uk": 2.2, "en": 2.5, "fr": 2.4}
+# Токенов на слово (кириллица токенизируется заметно дороже)
+TOKENS_PER_WORD = {"ru": 2.6, "uk": 2.8, "en": 1.4, "fr": 1.6}
+
+# Граница предложения засчитывается, только если оставляет хотя бы эту долю бюджета
+TRIM_MIN_FILL = 0.5
+
+# Конец предложения (с закрывающей кавычкой/скобкой)
+_SENTENCE_END_RE = re.compile(r'[.!?…]+["»”)]?(?=\s|$)')
+# Граница фразы внутри предложения
+_CLAUSE_END_RE = re.compile(r'[,;:]|\s[—–-](?=\s)')
+_WORD_RE = re.compile(r'\S+')
+
+
+def _lang2(lang: str) -> str:
+    return (lang or "en").lower()[:2]
+
+
+def _key(voice: Optional[str], speed: float, lang: str) -> str:
+    return f"{voice or 'default'}|{round(float(speed), 2)}|{_lang2(lang)}"
+
+
+def count_words(text: str) -> int:
+    return len((text or "").split())
+
+
+def max_tokens_for(words: int, lang: str) -> int:
+    """Потолок max_tokens для истории из words слов (+ заголовок и запас 30%)"""
+    per_word = TOKENS_PER_WORD.get(_lang2(lang), 1.5)
+    return max(300, int(words * per_word * 1.3) + 40)
+
+
+def trim_body(title: str, body: str, max_words: int) -> str:
+    """
+    Обрезает тело так, чтобы заголовок + тело укладывались в max_words:
+    по последней границе предложения в пределах бюджета, а если такой нет
+    (или она оставляет меньше TRIM_MIN_FILL бюджета — одно длинное
+    предложение без точек) — по последней границе фразы или просто
+    по бюджету слов, с точкой в конце.
+    """
+    budget = max(1, max_words - count_words(title))
+    if count_words(body) <= budget:
+        return body
+    min_words = budget * TRIM_MIN_FILL
+
+    cut = None
+    for m in _SENTENCE_END_RE.finditer(body):
+        if count_words(body[:m.end()]) > budget:
+            break
+        cut = m.end()
+    if cut is not None and count_words(body[:cut]) >= min_words:
+        return body[:cut].rstrip()
+
+    # Границы предложения нет — режем по бюджету слов, по возможности на конце фразы
+    words = list(_WORD_RE.finditer(body))
+    head = body[:words[budget - 1].end()]
+    clauses = [m.start() for m in _CLAUSE_END_RE.finditer(head)]
+    if clauses and count_words(head[:clauses[-1]]) >= min_words:
+        head = head[:clauses[-1]]
+    return head.rstrip(" ,;:—–-") + "."
+
+
+class LengthController:
+    """Слов в секунду по (voice, speed, lang)"""
+
+    def __init__(self, state_path: str = LENGTH_STATE_PATH):
+        self.state_path = state_path
+        self._state: Optional[Dict[str, Dict[str, float]]] = None
+
+    def _load(self) -> Dict[str, Dict[str, float]]:
+        if self._state is None:
+            try:
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError):
+                self._state = {}
+        return self._state
+
+    def _save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+            tmp = self.state_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._state, f)
+            os.replace(tmp, self.state_path)
+        except OSError as e:
+            print(f"[LengthControl] Failed to save state: {e}")
+
+    def words_per_second(self, voice: Optional[str], speed: float, lang: str) -> float:
+        """Выученная скорость; без наблюдений — среднее по языку и скорости, иначе дефолт"""
+        state = self._load()
+        entry = state.get(_key(voice, speed, lang))
+        if entry:
+            return entry["wps"]
+        suffix = _key(None, speed, lang).split("|", 1)[1]
+        similar = [e["wps"] for k, e in state.items() if k.split("|", 1)[1] == suffix]
+        if similar:
+            return sum(similar) / len(similar)
+        return DEFAULT_WPS.get(_lang2(lang), 2.4) * float(speed)
+
+    def target_words(self, target_sec: float, voice: Optional[str], speed: float, lang: str) -> int:
+        """Сколько слов (с заголовком) нужно на target_sec секунд озвучки"""
+        return max(30, round(target_sec * self.words_per_second(voice, speed, lang)))
+
+    def max_words(self, target_words: int) -> int:
+        """Жёсткий предел слов перед TTS"""
+        return int(target_words * (1 + LENGTH_TOLERANCE))
+
+    def record(self, voice: Optional[str], speed: float, lang: str, words: int, seconds: float) -> None:
+        """Наблюдение после TTS: words слов прозвучали за seconds секунд"""
+        if words <= 0 or seconds <= 1.0:
+            return
+        wps = words / seconds
+        state = self._load()
+        key = _key(voice, speed, lang)
+        entry = state.get(key)
+        if entry:
+            entry["wps"] = round(entry["wps"] + LENGTH_EWMA_ALPHA * (wps - entry["wps"]), 4)
+            entry["n"] = entry.get("n", 0) + 1
+        else:
+            state[key] = {"wps": round(wps, 4), "n": 1}
+        self._save()
+
+
+_controller: Optional[LengthController] = None
+
+
+def get_length_controller() -> LengthController:
+    global _controller
+    if _controller is None:
+        _controller = LengthController()
+    return _controller
@@ -0,0 +1,337 @@
+# utils/llm.py
+"""
+Единый асинхронный слой для chat completions (Grok, OpenAI).
+
+Вместо выбора API при импорте — список провайдеров (порядок из LLM_PROVIDERS,
+по умолчанию grok, затем openai; без ключа провайдер пропускается):
+  - hedged-запросы: если основной провайдер не ответил за свой
+    LLM_HEDGE_PERCENTILE-перцентиль задержки, тот же запрос уходит следующему,
+    берётся первый ответ, проигравший запрос отменяется;
+  - ошибка провайдера — сразу переключаемся на следующий (failover);
+  - circuit breaker на провайдера: после LLM_BREAKER_FAILURES ошибок подряд
+    провайдер пропускается LLM_BREAKER_COOLDOWN секунд, затем пробный запрос.
+
+Все запросы идут через пуловые сессии utils.http.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+from utils.config import GROK_API_KEY, OPENAI_API_KEY
+from utils.http import get_session
+
+GROK_CHAT_URL = "https://api.x.ai/v1/chat/completions"
+OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
+
+GROK_MODEL = os.getenv("GROK_MODEL", "grok-3")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+# Порядок опроса провайдеров
+LLM_PROVIDERS = [p.strip() for p in os.getenv("LLM_PROVIDERS", "grok,openai").split(",") if p.strip()]
+
+# Hedging: дублируем запрос, если ответа нет дольше этого перцентиля задержки
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.9"))
+# Пока замеров меньше — ждём не меньше LLM_HEDGE_DEFAULT_SEC, а для длинных
+# ответов — время генерации max_tokens при LLM_HEDGE_TOKENS_PER_SEC с запасом
+LLM_HEDGE_MIN_SAMPLES = 10
+LLM_HEDGE_DEFAULT_SEC = float(os.getenv("LLM_HEDGE_DEFAULT_SEC", "30"))
+LLM_HEDGE_TOKENS_PER_SEC = 25
+# Сколько последних задержек помним на провайдера и «класс» запроса
+LLM_LATENCY_SAMPLES = 100
+# «Класс» запроса — max_tokens с шагом в полоктавы (max_tokens считается под
+# каждую историю, точное значение почти не повторяется); классов не больше
+LLM_LATENCY_BUCKETS = 16
+
+# Circuit breaker
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "60"))
+
+
+class LLMError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    """closed -> (N ошибок подряд) -> open -> (cooldown) -> half-open: один пробный запрос"""
+
+    def __init__(self, max_failures: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN):
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Можно ли отправить запрос (в half-open пропускается только один)"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.failures >= self.max_failures:
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Запрос отменён (проиграл hedge) — о здоровье провайдера он ничего не говорит"""
+        self._probing = False
+
+
+class LLMProvider:
+    """OpenAI-совместимый chat completions endpoint"""
+
+    def __init__(self, name: str, title: str, url: str, api_key: Optional[str], model: str):
+        self.name = name
+        self.title = title
+        self.url = url
+        self.api_key = api_key
+        self.model = model
+        self.breaker = CircuitBreaker()
+        # Задержки отдельно по классу max_tokens: короткие метаданные и пачка историй несравнимы
+        self._latencies: Dict[Any, Deque[float]] = {}
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
+    @staticmethod
+    def _bucket(payload: Dict[str, Any]) -> Any:
+        max_tokens = payload.get("max_tokens")
+        if not max_tokens:
+            return None
+        return round(2 * math.log2(max_tokens))
+
+    def hedge_after(self, payload: Dict[str, Any]) -> float:
+        """Через сколько секунд без ответа дублировать запрос другому провайдеру"""
+        samples = sorted(self._latencies.get(self._bucket(payload), ()))
+        if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            max_tokens = payload.get("max_tokens") or 0
+            return max(LLM_HEDGE_DEFAULT_SEC, 1.5 * max_tokens / LLM_HEDGE_TOKENS_PER_SEC)
+        idx = min(len(samples) - 1, int(len(samples) * LLM_HEDGE_PERCENTILE))
+        return samples[idx]
+
+    def _record_latency(self, payload: Dict[str, Any], seconds: float) -> None:
+        key = self._bucket(payload)
+        samples = self._latencies.pop(key, None)
+        if samples is None:
+            samples = deque(maxlen=LLM_LATENCY_SAMPLES)
+            if len(self._latencies) >= LLM_LATENCY_BUCKETS:
+                # вытесняем класс, по которому дольше всего не было запросов
+                del self._latencies[next(iter(self._latencies))]
+        samples.append(seconds)
+        self._latencies[key] = samples  # в конец словаря — «недавно использован»
+
+    async def complete(self, payload: Dict[str, Any], model: Optional[str] = None, timeout: float = 120) -> str:
+        """Один запрос без стрима -> content ответа"""
+        body = {**payload, "model": model or self.model}
+        started = time.monotonic()
+        try:
+            session = get_session(self.url)
+            async with session.post(self.url, json=body, headers=self._headers(), timeout=timeout) as resp:
+                data = await resp.json(content_type=None)
+                if resp.status != 200:
+                    raise LLMError(f"{self.title} error {resp.status}: {data}")
+                content = data["choices"][0]["message"]["content"]
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception:
+            self.breaker.failure()
+            raise
+        self.breaker.success()
+        self._record_latency(payload, time.monotonic() - started)
+        return content or ""
+
+    async def stream(self, payload: Dict[str, Any], model: Optional[str] = None,
+                     timeout: float = 120) -> AsyncIterator[str]:
+        """SSE-поток chat completions -> дельты content"""
+        body = {**payload, "model": model or self.model, "stream": True}
+        try:
+            session = get_session(self.url)
+            async with session.post(self.url, json=body, headers=self._headers(), timeout=timeout) as resp:
+                if resp.status != 200:
+                    raise LLMError(f"{self.title} error {resp.status}: {await resp.text()}")
+
+                async for raw in resp.content:
+                    line = raw.decode("utf-8", errors="replace").strip()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        delta = json.loads(data)["choices"][0].get("delta", {}).get("content") or ""
+                    except (ValueError, KeyError, IndexError):
+                        continue
+                    if delta:
+                        yield delta
+        except (asyncio.CancelledError, GeneratorExit):
+            self.breaker.release()
+            raise
+        except Exception:
+            self.breaker.failure()
+            raise
+        self.breaker.success()
+
+
+class LLMRouter:
+    """Hedged-запросы и failover поверх списка провайдеров"""
+
+    def __init__(self, providers: List[LLMProvider]):
+        self.providers = [p for p in providers if p.api_key]
+
+    def available(self) -> bool:
+        return bool(self.providers)
+
+    def _pick(self, tried: List[LLMProvider]) -> Optional[LLMProvider]:
+        """Следующий провайдер, которого ещё не пробовали и чей breaker пропускает запрос"""
+        for p in self.providers:
+            if p not in tried and p.breaker.allow():
+                tried.append(p)
+                return p
+        return None
+
+    async def chat(
+        self,
+        payload: Dict[str, Any],
+        timeout: float = 120,
+        models: Optional[Dict[str, str]] = None,
+        hedge: bool = True
+    ) -> str:
+        """
+        Chat completion с hedging и failover.
+
+        Args:
+            payload: тело запроса без "model" (messages, temperature, max_tokens, ...)
+            timeout: таймаут одного запроса к провайдеру
+            models: переопределение модели по имени провайдера, например {"openai": "gpt-4o"}
+            hedge: False — для фоновых и массовых запросов, где задержка не важна,
+                а дубль запроса удвоил бы стоимость (failover при ошибке остаётся)
+
+        Returns:
+            content первого успешного ответа
+        """
+        if not self.providers:
+            raise LLMError("No LLM API key configured (GROK_API_KEY / OPENAI_API_KEY)")
+        models = models or {}
+        tried: List[LLMProvider] = []
+        pending: Dict[asyncio.Task, LLMProvider] = {}
+        errors: List[str] = []
+
+        def launch() -> Optional[LLMProvider]:
+            p = self._pick(tried)
+            if p is not None:
+                task = asyncio.create_task(p.complete(payload, model=models.get(p.name), timeout=timeout))
+                pending[task] = p
+            return p
+
+        last = launch()
+        if last is None:
+            raise LLMError("All LLM providers are temporarily disabled (circuit open)")
+
+        try:
+            can_hedge = hedge
+            while pending:
+                wait_for = last.hedge_after(payload) if can_hedge else None
+                done, _ = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    backup = launch()
+                    if backup is None:
+                        can_hedge = False
+                    else:
+                        print(f"[LLM] {last.title} is slow (>{wait_for:.1f}s), hedging to {backup.title}")
+                        last = backup
+                    continue
+
+                for task in done:
+                    p = pending.pop(task)
+                    try:
+                        return task.result()
+                    except Exception as e:
+                        errors.append(str(e))
+                        print(f"[LLM] {p.title} failed: {e}")
+
+                if not pending:
+                    # все запущенные упали — сразу пробуем следующего
+                    nxt = launch()
+                    if nxt is not None:
+                        last = nxt
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise LLMError("; ".join(errors) or "All LLM providers failed")
+
+    async def stream(
+        self,
+        payload: Dict[str, Any],
+        timeout: float = 120,
+        models: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Потоковый chat completion. Поток не дублируется: провайдер меняется
+        только если он упал до первого фрагмента ответа.
+        """
+        if not self.providers:
+            raise LLMError("No LLM API key configured (GROK_API_KEY / OPENAI_API_KEY)")
+        models = models or {}
+        tried: List[LLMProvider] = []
+        errors: List[str] = []
+
+        while True:
+            p = self._pick(tried)
+            if p is None:
+                raise LLMError("; ".join(errors) or "All LLM providers are temporarily disabled (circuit open)")
+            started = False
+            try:
+                async for delta in p.stream(payload, model=models.get(p.name), timeout=timeout):
+                    started = True
+                    yield delta
+                return
+            except Exception as e:
+                if started:
+                    raise
+                errors.append(str(e))
+                print(f"[LLM] {p.title} stream failed, switching provider: {e}")
+
+
+_PROVIDER_DEFS = {
+    "grok": ("Grok", GROK_CHAT_URL, GROK_API_KEY, GROK_MODEL),
+    "openai": ("OpenAI", OPENAI_CHAT_URL, OPENAI_API_KEY, OPENAI_MODEL),
+}
+
+_router: Optional[LLMRouter] = None
+
+
+def get_llm() -> LLMRouter:
+    global _router
+    if _router is None:
+        _router = LLMRouter([
+            LLMProvider(name, *_PROVIDER_DEFS[name])
+            for name in LLM_PROVIDERS if name in _PROVIDER_DEFS
+        ])
+    return _router
@@ -0,0 +1,240 @@
+# utils/sampler.py
+"""
+Сэмплер футажа без повторов.
+
+Для каждого канала помним, какие отрезки (файл, [start, end]) уже были отданы,
+и следующий отрезок выбираем только из неиспользованного материала:
+  - файл — случайно, с весом пропорциональным его свободному хронометражу;
+  - старт — равномерно по допустимым позициям внутри свободных промежутков.
+Когда свободного материала под нужную длину не остаётся — начинается новый круг.
+
+Состояние хранится в JSON (CACHE_DIR/sampler.json) и переживает перезапуски.
+Запись отложенная (SAMPLER_SAVE_DELAY) и идёт в потоке: серия pick() даёт одну
+запись и не блокирует event loop. Раз в SAMPLER_PRUNE_INTERVAL из состояния
+убираются файлы, которых уже нет на диске, — иначе оно растёт бесконечно.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from utils.config import CACHE_DIR
+from utils.ffmpeg import probe_duration
+
+SAMPLER_STATE_PATH = os.path.join(CACHE_DIR, "sampler.json")
+
+# Через сколько секунд после изменения состояние пишется на диск
+SAMPLER_SAVE_DELAY = 2.0
+# Как часто чистить состояние от удалённых файлов, сек
+SAMPLER_PRUNE_INTERVAL = 3600.0
+
+# Минимальный вес свободного промежутка, чтобы отрезок ровно под длину тоже мог выпасть
+_EPS = 1e-3
+
+
+def _merge(intervals: List[List[float]]) -> List[List[float]]:
+    """Сливает пересекающиеся интервалы [start, end]"""
+    out: List[List[float]] = []
+    for s, e in sorted(intervals):
+        if out and s <= out[-1][1]:
+            out[-1][1] = max(out[-1][1], e)
+        else:
+            out.append([s, e])
+    return out
+
+
+def _free_gaps(used: List[List[float]], total: float) -> List[Tuple[float, float]]:
+    """Свободные промежутки [a, b] внутри [0, total]"""
+    gaps = []
+    cur = 0.0
+    for s, e in _merge(used):
+        if s > cur:
+            gaps.append((cur, min(s, total)))
+        cur = max(cur, e)
+    if cur < total:
+        gaps.append((cur, total))
+    return [(a, b) for a, b in gaps if b > a]
+
+
+class FootageSampler:
+    """Выбор (файл, старт) без повторов с персистентным состоянием по каналам"""
+
+    def __init__(self, state_path: str = SAMPLER_STATE_PATH):
+        self.state_path = state_path
+        self._state: Optional[Dict] = None
+        self._lock = asyncio.Lock()
+        self._dirty = False
+        self._save_task: Optional[asyncio.Task] = None
+        self._pruned_at: Optional[float] = None
+
+    # ---------- состояние ----------
+
+    def _load(self) -> Dict:
+        if self._state is None:
+            try:
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError):
+                self._state = {}
+            self._state.setdefault("durations", {})
+            self._state.setdefault("used", {})
+        return self._state
+
+    def _write(self, data: str) -> None:
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp = f"{self.state_path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, self.state_path)
+
+    def _save(self) -> None:
+        """Отложенная запись в потоке; вне event loop — сразу"""
+        self._dirty = True
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._dirty = False
+            self._write(json.dumps(self._state, ensure_ascii=False))
+            return
+        if self._save_task is None:
+            self._save_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        try:
+            while self._dirty:
+                await asyncio.sleep(SAMPLER_SAVE_DELAY)
+                self._dirty = False
+                data = json.dumps(self._state, ensure_ascii=False)
+                try:
+                    await asyncio.to_thread(self._write, data)
+                except OSError as e:
+                    print(f"[Sampler] Failed to save state: {e}")
+        finally:
+            self._save_task = None
+
+    def _prune(self, sources: List[str]) -> None:
+        """
+        Забывает файлы, которых нет среди текущих кандидатов и нет на диске.
+        Файлы вне кандидатов, но существующие, не трогаем: канал может брать
+        отрезки из нескольких коллекций.
+        """
+        now = time.monotonic()
+        if self._pruned_at is not None and now - self._pruned_at < SAMPLER_PRUNE_INTERVAL:
+            return
+        self._pruned_at = now
+
+        state = self._load()
+        current = set(sources)
+        known = set(state["durations"])
+        for used_by_src in state["used"].values():
+            known.update(used_by_src)
+        gone = {p for p in known if p not in current and not os.path.exists(p)}
+        if not gone:
+            return
+
+        for p in gone:
+            state["durations"].pop(p, None)
+        for channel in list(state["used"]):
+            used_by_src = state["used"][channel]
+            for p in gone.intersection(used_by_src):
+                del used_by_src[p]
+            if not used_by_src:
+                del state["used"][channel]
+        print(f"[Sampler] Pruned {len(gone)} missing files from state")
+
+    async def _duration(self, path: str) -> float:
+        """Длительность файла с кэшем по (size, mtime) — ffprobe только для новых/изменённых"""
+        cache = self._load()["durations"]
+        try:
+            st = os.stat(path)
+        except OSError:
+            return 0.0
+        entry = cache.get(path)
+        if entry and entry.get("size") == st.st_size and entry.get("mtime") == st.st_mtime:
+            return float(entry.get("duration") or 0.0)
+        dur = await probe_duration(path)
+        cache[path] = {"size": st.st_size, "mtime": st.st_mtime, "duration": dur}
+        return dur
+
+    # ---------- выбор ----------
+
+    @staticmethod
+    def _slots(used: List[List[float]], total: float, seg: float) -> List[Tuple[float, float]]:
+        """
+        Допустимые диапазоны старта [a, b - seg] для отрезка длиной seg.
+        Файл короче отрезка — это один слот «с начала», пока он не использован.
+        """
+        if total <= seg:
+            return [] if used else [(0.0, 0.0)]
+        return [(a, b - seg) for a, b in _free_gaps(used, total) if b - a >= seg]
+
+    def _plan(self, used_by_src: Dict[str, List[List[float]]], durations: Dict[str, float],
+              seg: float) -> Optional[Tuple[str, float]]:
+        weights: List[float] = []
+        options: List[Tuple[str, List[Tuple[float, float]]]] = []
+        for src, total in durations.items():
+            slots = self._slots(used_by_src.get(src, []), total, seg)
+            if not slots:
+                continue
+            # вес файла — свободный хронометраж, пригодный под отрезок
+            free = sum((b - a) + min(seg, total) for a, b in slots)
+            options.append((src, slots))
+            weights.append(free)
+        if not options:
+            return None
+
+        src, slots = random.choices(options, weights=weights, k=1)[0]
+        a, b = random.choices(slots, weights=[(b - a) + _EPS for a, b in slots], k=1)[0]
+        return src, random.uniform(a, b)
+
+    async def pick(self, channel: str, sources: List[str], seg_dur: float) -> Tuple[str, float]:
+        """
+        Выбирает источник и старт отрезка длиной seg_dur для канала channel
+        и сразу резервирует его. Возвращает (src, start).
+        """
+        if not sources:
+            raise ValueError("Нет источников для выбора")
+
+        async with self._lock:
+            state = self._load()
+            self._prune(sources)
+            durations = {src: await self._duration(src) for src in sources}
+            durations = {src: d for src, d in durations.items() if d > 0} or {src: 0.0 for src in sources}
+            seg = max(0.1, float(seg_dur))
+
+            used_by_src = state["used"].setdefault(str(channel), {})
+            picked = self._plan(used_by_src, durations, seg)
+            if picked is None:
+                # весь материал отдан — новый круг по этим источникам
+                for src in durations:
+                    used_by_src.pop(src, None)
+                picked = self._plan(used_by_src, durations, seg)
+
+            src, start = picked
+            end = min(start + seg, durations[src]) if durations[src] > 0 else start + seg
+            used_by_src[src] = _merge(used_by_src.get(src, []) + [[start, end]])
+            self._save()
+            return src, start
+
+    def reset(self, channel: str) -> None:
+        """Забывает историю канала"""
+        state = self._load()
+        if state["used"].pop(str(channel), None) is not None:
+            self._save()
+
+
+# Глобальный экземпляр сэмплера
+_sampler: Optional[FootageSampler] = None
+
+
+def get_sampler() -> FootageSampler:
+    """Получает глобальный экземпляр сэмплера"""
+    global _sampler
+    if _sampler is None:
+        _sampler = FootageSampler()
+    return _sampler
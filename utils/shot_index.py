@@ -0,0 +1,188 @@
+# utils/shot_index.py
+"""
+Индекс склеек (смен планов) и чёрных кадров для библиотеки нарезок.
+
+Строится офлайн один раз на файл фильтрами ffmpeg scene/blackdetect и хранится
+рядом с библиотекой: assets/.shots/<kind>/<collection>/<file>.json.
+При нарезке выбор границ фрагмента — это bisect по готовым спискам, без декодирования.
+
+Построить/обновить индекс для всей библиотеки:
+    python -m utils.shot_index
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import re
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from utils.config import FFMPEG_BIN
+from utils.ffmpeg import _run, probe_duration
+
+LIB_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "assets"))
+SHOTS_DIR = os.path.join(LIB_ROOT, ".shots")
+
+# Порог scene-score, выше которого кадр считается сменой плана
+SCENE_THRESHOLD = 0.35
+# Минимальная длительность чёрного участка, сек
+BLACK_MIN_SEC = 0.3
+
+_PTS_RE = re.compile(r"pts_time:([0-9.]+)")
+_BLACK_RE = re.compile(r"black_start:([0-9.]+)\s+black_end:([0-9.]+)")
+
+
+class ShotIndex:
+    """Отсортированные склейки и чёрные участки одного файла"""
+
+    def __init__(self, cuts: List[float], black: List[Tuple[float, float]], duration: float):
+        self.cuts = sorted(cuts)
+        self.black = sorted(black)
+        self._black_starts = [s for s, _ in self.black]
+        self.duration = duration
+
+    def _black_end_at(self, t: float) -> Optional[float]:
+        """Если t внутри чёрного участка — его конец, иначе None"""
+        i = bisect_right(self._black_starts, t) - 1
+        if i >= 0 and self.black[i][0] <= t < self.black[i][1]:
+            return self.black[i][1]
+        return None
+
+    def _first_clean_cut(self, lo: float, hi: float) -> Optional[float]:
+        """Первая склейка в [lo, hi], не попадающая в чёрный участок"""
+        i = bisect_left(self.cuts, lo)
+        while i < len(self.cuts) and self.cuts[i] <= hi:
+            t = self.cuts[i]
+            black_end = self._black_end_at(t)
+            if black_end is None:
+                return t
+            # склейка внутри затемнения — прыгаем за его конец
+            i = bisect_left(self.cuts, black_end, lo=i + 1)
+        return None
+
+    def _last_cut(self, lo: float, hi: float) -> Optional[float]:
+        """Последняя склейка в [lo, hi]"""
+        i = bisect_right(self.cuts, hi) - 1
+        if i >= 0 and self.cuts[i] >= lo:
+            return self.cuts[i]
+        return None
+
+    def snap(self, start: float, min_len: float, max_len: float) -> Tuple[float, float]:
+        """
+        Подгоняет фрагмент под планы внутри окна [start, start + max_len]:
+          - старт — на первую «чистую» склейку (не на чёрном кадре);
+          - конец — на последнюю склейку, при которой длина остаётся в [min_len, max_len].
+        Если подходящих склеек нет — соответствующая граница не меняется.
+        Возвращает (start, length).
+        """
+        window_end = min(start + max_len, self.duration or start + max_len)
+        ss = start
+        black_end = self._black_end_at(ss)
+        if black_end is not None and black_end + min_len <= window_end:
+            ss = black_end
+        cut = self._first_clean_cut(ss, window_end - min_len)
+        if cut is not None:
+            ss = cut
+
+        hi = min(window_end, ss + max_len)
+        end = self._last_cut(ss + min_len, hi)
+        length = (end - ss) if end is not None else (hi - ss)
+        return ss, max(min_len, min(max_len, length))
+
+    def to_dict(self) -> Dict:
+        return {"cuts": self.cuts, "black": [list(b) for b in self.black], "duration": self.duration}
+
+
+def _index_path(src: str) -> str:
+    rel = os.path.relpath(os.path.abspath(src), LIB_ROOT)
+    return os.path.join(SHOTS_DIR, rel + ".json")
+
+
+# Кэш в памяти: path -> (mtime файла индекса, ShotIndex)
+_loaded: Dict[str, Tuple[float, ShotIndex]] = {}
+
+
+def load_shot_index(src: str) -> Optional[ShotIndex]:
+    """Индекс файла, если он построен и не устарел (по size/mtime исходника)"""
+    path = _index_path(src)
+    try:
+        idx_mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _loaded.get(path)
+    if cached and cached[0] == idx_mtime:
+        return cached[1]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        st = os.stat(src)
+    except (OSError, ValueError):
+        return None
+    if data.get("size") != st.st_size or data.get("mtime") != st.st_mtime:
+        return None
+    index = ShotIndex(data.get("cuts") or [], [tuple(b) for b in data.get("black") or []],
+                      float(data.get("duration") or 0.0))
+    _loaded[path] = (idx_mtime, index)
+    return index
+
+
+async def build_shot_index(src: str, force: bool = False) -> ShotIndex:
+    """
+    Один проход ffmpeg по файлу: scene-детектор и blackdetect на уменьшенных кадрах.
+    Результат сохраняется рядом с библиотекой.
+    """
+    if not force:
+        existing = load_shot_index(src)
+        if existing is not None:
+            return existing
+
+    st = os.stat(src)
+    log = await _run(
+        FFMPEG_BIN, "-hide_banner", "-nostats",
+        "-i", src,
+        "-filter_complex",
+        (
+            "[0:v]scale=320:-2,split=2[sc][bl];"
+            f"[sc]select='gt(scene,{SCENE_THRESHOLD})',showinfo[o1];"
+            f"[bl]blackdetect=d={BLACK_MIN_SEC}:pix_th=0.10[o2]"
+        ),
+        "-map", "[o1]", "-f", "null", "-",
+        "-map", "[o2]", "-f", "null", "-",
+    )
+    cuts = [float(m.group(1)) for line in log.splitlines() if "showinfo" in line
+            for m in [_PTS_RE.search(line)] if m]
+    black = [(float(a), float(b)) for a, b in _BLACK_RE.findall(log)]
+    index = ShotIndex(cuts, black, await probe_duration(src))
+
+    path = _index_path(src)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"size": st.st_size, "mtime": st.st_mtime, **index.to_dict()}, f)
+    os.replace(tmp, path)
+    return index
+
+
+async def build_library_shot_index(force: bool = False) -> Dict[str, int]:
+    """Строит недостающие/устаревшие индексы для assets/cartoons и assets/films"""
+    from utils.cuts import list_collections, list_videos_in
+
+    stats = {"built": 0, "skipped": 0, "failed": 0}
+    for kind in ("cartoons", "films"):
+        for collection in list_collections(kind):
+            for src in list_videos_in(kind, collection):
+                if not force and load_shot_index(src) is not None:
+                    stats["skipped"] += 1
+                    continue
+                try:
+                    await build_shot_index(src, force=True)
+                    stats["built"] += 1
+                except Exception as e:
+                    print(f"[ShotIndex] Failed for {src}: {e}")
+                    stats["failed"] += 1
+    return stats
+
+
+if __name__ == "__main__":
+    print(asyncio.run(build_library_shot_index()))
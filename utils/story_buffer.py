@@ -0,0 +1,206 @@
+# utils/story_buffer.py
+"""
+Буфер заранее сгенерированных историй.
+
+Для каждой комбинации (prompt_preset, lang, story_type), которую реально
+запрашивают, держим несколько готовых историй — уже очищенных от Markdown
+и разбитых на title/body (результат generate_story_structured, вместе с
+французскими метаданными). Запрос забирает самую старую (FIFO), пока она
+не протухла, и LLM-этап для него ничего не стоит.
+
+Пополнение — в фоне, только пока очередь задач простаивает.
+Буфер и статистика спроса хранятся в CACHE_DIR/story_buffer.json.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.config import CACHE_DIR
+
+STORY_BUFFER_PATH = os.path.join(CACHE_DIR, "story_buffer.json")
+
+# Сколько готовых историй держим на комбинацию
+STORY_BUFFER_SIZE = int(os.getenv("STORY_BUFFER_SIZE", "3"))
+# Через сколько секунд история считается устаревшей
+STORY_BUFFER_TTL = int(os.getenv("STORY_BUFFER_TTL", str(24 * 3600)))
+# Комбинацию пополняем, только если её запрашивали за последние N секунд
+STORY_BUFFER_DEMAND_WINDOW = int(os.getenv("STORY_BUFFER_DEMAND_WINDOW", str(3 * 24 * 3600)))
+# Сколько самых популярных комбинаций обслуживаем
+STORY_BUFFER_MAX_KEYS = 8
+
+
+def _key(preset: str, lang: str, story_type: str) -> str:
+    return f"{preset}|{lang}|{story_type}"
+
+
+def _prompt_hash(prompt: Optional[str], target_sec: int) -> str:
+    return hashlib.sha1(f"{prompt or ''}|{target_sec}".encode("utf-8")).hexdigest()[:16]
+
+
+class StoryBuffer:
+    """FIFO-буферы готовых историй по (preset, lang, story_type)"""
+
+    def __init__(self, state_path: str = STORY_BUFFER_PATH):
+        self.state_path = state_path
+        self._state: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = asyncio.Lock()
+
+    # ---------- состояние ----------
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._state is None:
+            try:
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError):
+                self._state = {}
+            self._state.setdefault("stories", {})
+            self._state.setdefault("demand", {})
+        return self._state
+
+    def _save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+            tmp = self.state_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._state, f, ensure_ascii=False)
+            os.replace(tmp, self.state_path)
+        except OSError as e:
+            print(f"[StoryBuffer] Failed to save state: {e}")
+
+    def _fresh(self, key: str, phash: str) -> List[Dict[str, Any]]:
+        """Непротухшие истории ключа, сгенерированные тем же промптом"""
+        now = time.time()
+        stories = [
+            s for s in self._load()["stories"].get(key, [])
+            if now - s["created_at"] < STORY_BUFFER_TTL and s["prompt_hash"] == phash
+        ]
+        self._state["stories"][key] = stories
+        return stories
+
+    # ---------- публичный API ----------
+
+    def take(self, preset: str, lang: str, story_type: str,
+             prompt: Optional[str], target_sec: int,
+             target_words: Optional[int] = None,
+             record_demand: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Забирает самую старую готовую историю (или None) и отмечает спрос
+        на комбинацию — по нему фоновый цикл решает, что пополнять.
+        target_words запоминается, чтобы предгенерация писала истории нужной длины.
+        record_demand=False — повторный take в рамках того же запроса (спрос уже учтён).
+        """
+        key = _key(preset, lang, story_type)
+        phash = _prompt_hash(prompt, target_sec)
+        state = self._load()
+        if record_demand:
+            demand = state["demand"].setdefault(key, {"count": 0})
+            demand.update({
+                "preset": preset, "lang": lang, "story_type": story_type,
+                "prompt": prompt, "target_sec": target_sec, "target_words": target_words,
+                "count": demand["count"] + 1, "last": time.time(),
+            })
+        stories = self._fresh(key, phash)
+        story = stories.pop(0)["story"] if stories else None
+        self._save()
+        return story
+
+    def put(self, preset: str, lang: str, story_type: str,
+            prompt: Optional[str], target_sec: int, story: Dict[str, Any],
+            limit: int = STORY_BUFFER_SIZE) -> None:
+        self.put_many(preset, lang, story_type, prompt, target_sec, [story], limit)
+
+    def put_many(self, preset: str, lang: str, story_type: str,
+                 prompt: Optional[str], target_sec: int, stories_in: List[Dict[str, Any]],
+                 limit: int = STORY_BUFFER_SIZE) -> None:
+        """Добавляет истории в хвост очереди; хранится не больше limit последних"""
+        key = _key(preset, lang, story_type)
+        phash = _prompt_hash(prompt, target_sec)
+        stories = self._fresh(key, phash)
+        now = time.time()
+        stories.extend({"created_at": now, "prompt_hash": phash, "story": st} for st in stories_in)
+        del stories[:-max(1, limit)]
+        self._save()
+
+    async def fill_bulk(self, preset: str, lang: str, story_type: str,
+                        prompt: Optional[str], target_sec: int, count: int,
+                        target_words: Optional[int] = None) -> int:
+        """
+        Массовая предгенерация (например, 50 историй для канала): истории
+        запрашиваются пачками через generate_stories_bulk и кладутся в буфер
+        сверх обычного STORY_BUFFER_SIZE. Возвращает число добавленных.
+        """
+        from utils.story_gen import generate_stories_bulk
+
+        stories = await generate_stories_bulk(prompt, preset, lang, count, target_sec=target_sec,
+                                              target_words=target_words)
+        if stories:
+            current = len(self._fresh(_key(preset, lang, story_type), _prompt_hash(prompt, target_sec)))
+            self.put_many(preset, lang, story_type, prompt, target_sec, stories,
+                          limit=max(STORY_BUFFER_SIZE, current + len(stories)))
+        return len(stories)
+
+    def _wanted(self) -> List[Dict[str, Any]]:
+        """Популярные комбинации, которым не хватает историй"""
+        now = time.time()
+        demand = [
+            (key, d) for key, d in self._load()["demand"].items()
+            if now - d.get("last", 0) < STORY_BUFFER_DEMAND_WINDOW
+        ]
+        demand.sort(key=lambda kv: kv[1]["count"], reverse=True)
+        wanted = []
+        for key, d in demand[:STORY_BUFFER_MAX_KEYS]:
+            missing = STORY_BUFFER_SIZE - len(self._fresh(key, _prompt_hash(d["prompt"], d["target_sec"])))
+            if missing > 0:
+                wanted.append({**d, "missing": missing})
+        return wanted
+
+    async def refill_once(self, is_idle: Callable[[], bool] = lambda: True) -> int:
+        """Догенерирует недостающие истории; останавливается, если появилась работа"""
+        from utils.story_gen import generate_stories_bulk
+
+        added = 0
+        async with self._lock:
+            for d in self._wanted():
+                if not is_idle():
+                    break
+                try:
+                    # все недостающие истории комбинации — одним запросом
+                    stories = await generate_stories_bulk(
+                        d["prompt"], d["preset"], d["lang"], d["missing"], target_sec=d["target_sec"],
+                        target_words=d.get("target_words")
+                    )
+                except Exception as e:
+                    print(f"[StoryBuffer] Prefetch failed for {d['preset']}/{d['lang']}: {e}")
+                    continue
+                self.put_many(d["preset"], d["lang"], d["story_type"], d["prompt"], d["target_sec"], stories)
+                added += len(stories)
+        return added
+
+    async def run_idle_refill(self, is_idle: Callable[[], bool], interval: float = 30.0) -> None:
+        """Фоновый цикл: раз в interval секунд пополняет буферы, если бот простаивает"""
+        while True:
+            await asyncio.sleep(interval)
+            if not is_idle():
+                continue
+            try:
+                added = await self.refill_once(is_idle)
+                if added:
+                    print(f"[StoryBuffer] Prefetched {added} stories")
+            except Exception as e:
+                print(f"[StoryBuffer] Refill error: {e}")
+
+
+_buffer: Optional[StoryBuffer] = None
+
+
+def get_story_buffer() -> StoryBuffer:
+    global _buffer
+    if _buffer is None:
+        _buffer = StoryBuffer()
+    return _buffer
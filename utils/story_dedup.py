@@ -0,0 +1,195 @@
+# utils/story_dedup.py
+"""
+Локальный индекс похожести историй по каналам (SimHash по шинглам).
+
+Для каждой выпущенной истории храним два 64-битных отпечатка:
+  - h — по всему тексту (title + body);
+  - p — по первым STORY_DEDUP_PROBE_WORDS словам: по нему можно отсеять
+    повтор ещё в потоке, до того как текст уйдёт в TTS.
+Шинглы — тройки слов в нижнем регистре; истории считаются почти одинаковыми,
+если расстояние Хэмминга между отпечатками не больше STORY_DEDUP_MAX_DISTANCE.
+
+Индекс хранится в CACHE_DIR/story_dedup.json (последние
+STORY_DEDUP_MAX_PER_CHANNEL историй канала).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from utils.config import CACHE_DIR
+
+STORY_DEDUP_PATH = os.path.join(CACHE_DIR, "story_dedup.json")
+
+# Порог почти-дубликата (бит из 64): у несвязанных текстов расстояние ~32,
+# у текста с заменой ~5% слов — около 10
+STORY_DEDUP_MAX_DISTANCE = int(os.getenv("STORY_DEDUP_MAX_DISTANCE", "12"))
+# Сколько раз перегенерировать историю, оказавшуюся повтором
+STORY_DEDUP_RETRIES = int(os.getenv("STORY_DEDUP_RETRIES", "2"))
+# Сколько слов начала истории сравниваем в потоковом режиме
+STORY_DEDUP_PROBE_WORDS = 40
+STORY_DEDUP_MAX_PER_CHANNEL = 500
+SHINGLE_SIZE = 3
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class DuplicateStoryError(RuntimeError):
+    """История осталась почти-дубликатом и после всех перегенераций"""
+
+
+def _tokens(text: str) -> List[str]:
+    return _WORD_RE.findall((text or "").lower())
+
+
+def simhash(tokens: List[str], shingle: int = SHINGLE_SIZE) -> int:
+    """64-битный SimHash по шинглам из shingle слов"""
+    if len(tokens) < shingle:
+        grams = [" ".join(tokens)] if tokens else []
+    else:
+        grams = [" ".join(tokens[i:i + shingle]) for i in range(len(tokens) - shingle + 1)]
+
+    weights = [0] * 64
+    for gram in grams:
+        h = int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def fingerprint(text: str) -> Dict[str, str]:
+    """
+    Отпечатки истории для индекса: h — по всему тексту, p — по началу.
+    Считаются один раз по финальному (уже обрезанному) тексту — им же
+    история и проверяется, и записывается в индекс.
+    """
+    tokens = _tokens(text)
+    return {
+        "h": f"{simhash(tokens):016x}",
+        "p": f"{simhash(tokens[:STORY_DEDUP_PROBE_WORDS]):016x}",
+    }
+
+
+class StoryIndex:
+    """Отпечатки выпущенных историй по каналам"""
+
+    def __init__(self, state_path: str = STORY_DEDUP_PATH):
+        self.state_path = state_path
+        self._state: Optional[Dict[str, List[Dict[str, object]]]] = None
+
+    # ---------- состояние ----------
+
+    def _load(self) -> Dict[str, List[Dict[str, object]]]:
+        if self._state is None:
+            try:
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError):
+                self._state = {}
+        return self._state
+
+    def _save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+            tmp = self.state_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._state, f)
+            os.replace(tmp, self.state_path)
+        except OSError as e:
+            print(f"[StoryDedup] Failed to save index: {e}")
+
+    def _closest(self, channel: str, field: str, fingerprint: int) -> Optional[int]:
+        distances = [hamming(fingerprint, int(e[field], 16)) for e in self._load().get(channel, [])]
+        return min(distances) if distances else None
+
+    # ---------- публичный API ----------
+
+    def is_duplicate(self, channel: str, text: str) -> bool:
+        """Почти-дубликат уже выпущенной истории канала (по всему тексту)"""
+        return self.is_duplicate_fp(channel, fingerprint(text))
+
+    def is_duplicate_fp(self, channel: str, fp: Dict[str, str]) -> bool:
+        """То же по готовому fingerprint()"""
+        distance = self._closest(channel, "h", int(fp["h"], 16))
+        return distance is not None and distance <= STORY_DEDUP_MAX_DISTANCE
+
+    def is_duplicate_prefix(self, channel: str, text: str) -> bool:
+        """То же по началу истории — для проверки ещё в потоке"""
+        tokens = _tokens(text)[:STORY_DEDUP_PROBE_WORDS]
+        distance = self._closest(channel, "p", simhash(tokens))
+        return distance is not None and distance <= STORY_DEDUP_MAX_DISTANCE
+
+    def add(self, channel: str, text: str) -> None:
+        self.add_fp(channel, fingerprint(text))
+
+    def add_fp(self, channel: str, fp: Dict[str, str]) -> None:
+        entries = self._load().setdefault(channel, [])
+        entries.append({"h": fp["h"], "p": fp["p"], "ts": int(time.time())})
+        del entries[:-STORY_DEDUP_MAX_PER_CHANNEL]
+        self._save()
+
+
+async def dedup_stream(
+    channel: str,
+    make_stream: Callable[[], AsyncIterator[str]],
+    retries: int = STORY_DEDUP_RETRIES
+) -> AsyncIterator[str]:
+    """
+    Оборачивает поток фрагментов истории: первые STORY_DEDUP_PROBE_WORDS слов
+    придерживаются и сверяются с индексом канала. Повтор — поток обрывается
+    и генерация начинается заново (не больше retries раз), так что в TTS
+    попадает только новая история. Если повтор и после retries перегенераций —
+    DuplicateStoryError (до TTS не дошло ни слова).
+    """
+    index = get_story_index()
+    for attempt in range(retries + 1):
+        stream = make_stream()
+        held: Optional[List[str]] = []
+        duplicate = False
+        try:
+            async for fragment in stream:
+                if held is None:
+                    yield fragment
+                    continue
+                held.append(fragment)
+                if len(_tokens(" ".join(held))) < STORY_DEDUP_PROBE_WORDS:
+                    continue
+                if index.is_duplicate_prefix(channel, " ".join(held)):
+                    duplicate = True
+                    break
+                for f in held:
+                    yield f
+                held = None
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+        if held is not None and index.is_duplicate(channel, " ".join(held)):
+            duplicate = True  # короткая история целиком уместилась в пробу
+        if duplicate:
+            if attempt == retries:
+                raise DuplicateStoryError(f"Near-duplicate story for {channel} after {retries} retries")
+            print(f"[StoryDedup] Near-duplicate story for {channel}, regenerating ({attempt + 1}/{retries})")
+            continue
+        for f in held or []:
+            yield f
+        return
+
+
+_index: Optional[StoryIndex] = None
+
+
+def get_story_index() -> StoryIndex:
+    global _index
+    if _index is None:
+        _index = StoryIndex()
+    return _index
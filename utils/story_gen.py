@@ -1,23 +1,11 @@
 # utils/story_gen.py
-import os
+import asyncio
+import json
 import re
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from utils.config import OPENAI_API_KEY, GROK_API_KEY
-
-# Используем Grok API если есть ключ, иначе OpenAI
-USE_GROK = bool(GROK_API_KEY)
-GROK_CHAT_URL = "https://api.x.ai/v1/chat/completions"
-OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
-
-# Модели
-GROK_MODEL = "grok-3"
-OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-
-# Выбираем API
-API_URL = GROK_CHAT_URL if USE_GROK else OPENAI_CHAT_URL
-API_KEY = GROK_API_KEY if USE_GROK else OPENAI_API_KEY
-MODEL = GROK_MODEL if USE_GROK else OPENAI_MODEL
+from utils.length_control import LENGTH_TOLERANCE, max_tokens_for
+from utils.llm import get_llm
 
 def _trim(text: str) -> str:
     return re.sub(r"\n{3,}", "\n\n", (text or "").strip())
@@ -147,13 +135,22 @@ def _sys_prompt(lang: str) -> str:
         "Don't aim for template reactions — aim for the story to stick in their head."
     )
 
-def _user_prompt(theme_prompt: str, lang: str, target_sec: int) -> str:
-    # целим ~250–380 слов для 1-2 минут при TTS 1.3x
+def _user_prompt(theme_prompt: str, lang: str, target_sec: int, target_words: Optional[int] = None) -> str:
+    # без target_words целим ~250–380 слов для 1-2 минут при TTS 1.3x;
+    # с ним — диапазон вокруг числа слов, выученного по реальной скорости озвучки
+    # (utils.length_control): «не больше N» модели понимают как «заметно меньше N»
+    if target_words:
+        lo, hi = int(target_words * 0.9), int(target_words * (1 + LENGTH_TOLERANCE))
     if (lang or "").lower().startswith("ru"):
+        length = (
+            f"{lo}–{hi} слов вместе с заголовком (≈ {target_sec} сек при озвучке)"
+            if target_words else
+            f"250–380 слов (≈ {target_sec} сек при озвучке, идеально 1-2 минуты)"
+        )
         return (
             f"{theme_prompt}\n\n"
             f"КРИТИЧНО - ФОРМАТ ВЫВОДА:\n"
-            f"- Длина: 250–380 слов (≈ {target_sec} сек при озвучке, идеально 1-2 минуты)\n"
+            f"- Длина: {length}\n"
             f"- Первая строка — это заголовок (обычный текст)\n"
             f"- Далее — тело истории\n"
             f"- НИКАКОГО форматирования: без **, __, *, _, #, `, [], (), <>, и других спецсимволов!\n"
@@ -161,10 +158,15 @@ def _user_prompt(theme_prompt: str, lang: str, target_sec: int) -> str:
             f"- Запрещены символы Markdown: ** __ * _ # ` [ ] ( ) < >\n"
             f"- Пиши ЧИСТЫМ ТЕКСТОМ без какого-либо форматирования!"
         )
+    length = (
+        f"{lo}–{hi} words including the title (≈ {target_sec}s read)"
+        if target_words else
+        f"250–380 words (≈ {target_sec}s read, ideally 1-2 minutes)"
+    )
     return (
         f"{theme_prompt}\n\n"
         f"CRITICAL - OUTPUT FORMAT:\n"
-        f"- Length: 250–380 words (≈ {target_sec}s read, ideally 1-2 minutes)\n"
+        f"- Length: {length}\n"
         f"- First line is the title (plain text)\n"
         f"- Then the body\n"
         f"- NO formatting: no **, __, *, _, #, `, [], (), <>, or any special symbols!\n"
@@ -173,11 +175,8 @@ def _user_prompt(theme_prompt: str, lang: str, target_sec: int) -> str:
         f"- Write in PLAIN TEXT without any formatting!"
     )
 
-async def generate_story(theme_prompt: Optional[str], theme_name: Optional[str], lang: str, target_sec: int = 75) -> str:
-    """
-    Возвращает строку: первая строка — title, далее — body. Язык управляется lang ('ru'|'en').
-    theme_prompt имеет приоритет; если его нет — делаем пресет по имени темы.
-    """
+def _resolve_prompt(theme_prompt: Optional[str], theme_name: Optional[str], lang: str) -> str:
+    """theme_prompt имеет приоритет; если его нет — пресет по имени темы"""
     prompt = (theme_prompt or "").strip()
     if not prompt:
         # пресеты по имени темы
@@ -541,35 +540,49 @@ async def generate_story(theme_prompt: Optional[str], theme_name: Optional[str],
                 "Reader should think 'HOLY FUCKING SHIT!'"
             )
 
-    if not API_KEY:
-        # Фолбэк, чтобы ничего не падало — но лучше поставить ключ
-        return "Untitled Story\n\nI missed the bus to my exam, but a stranger offered me a ride. I made it just in time."
+    return prompt
+
 
-    import aiohttp
-    headers = {"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"}
+def _story_max_tokens(lang: str, target_words: Optional[int] = None) -> int:
+    # Больше места для деталей; при известной длине — потолок под неё
+    return max_tokens_for(target_words, lang) if target_words else 900
 
+
+def _story_payload(prompt: str, lang: str, target_sec: int, target_words: Optional[int] = None) -> dict:
     # Настройки для МАКСИМАЛЬНО свободной и острой генерации (особенно для Grok)
-    payload = {
-        "model": MODEL,
+    return {
         "messages": [
             {"role": "system", "content": _sys_prompt(lang)},
-            {"role": "user", "content": _user_prompt(prompt, lang, target_sec)}
+            {"role": "user", "content": _user_prompt(prompt, lang, target_sec, target_words)}
         ],
         "temperature": 1.3,  # МАКСИМАЛЬНАЯ креативность и остроту
-        "max_tokens": 900,   # Больше места для деталей
+        "max_tokens": _story_max_tokens(lang, target_words),
         "presence_penalty": 0.6,  # Сильно поощряем новые острые темы
         "frequency_penalty": 0.5,  # Избегаем повторяющихся фраз и клише
         "top_p": 0.95  # Широкий выбор токенов для более дерзкого контента
     }
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(API_URL, json=payload, headers=headers, timeout=120) as resp:
-            data = await resp.json()
-            if resp.status != 200:
-                api_name = "Grok" if USE_GROK else "OpenAI"
-                raise RuntimeError(f"{api_name} error {resp.status}: {data}")
-            text = data["choices"][0]["message"]["content"]
-            text = _trim(text)
+
+async def generate_story(
+    theme_prompt: Optional[str],
+    theme_name: Optional[str],
+    lang: str,
+    target_sec: int = 75,
+    target_words: Optional[int] = None
+) -> str:
+    """
+    Возвращает строку: первая строка — title, далее — body. Язык управляется lang ('ru'|'en').
+    theme_prompt имеет приоритет; если его нет — делаем пресет по имени темы.
+    """
+    prompt = _resolve_prompt(theme_prompt, theme_name, lang)
+
+    llm = get_llm()
+    if not llm.available():
+        # Фолбэк, чтобы ничего не падало — но лучше поставить ключ
+        return "Untitled Story\n\nI missed the bus to my exam, but a stranger offered me a ride. I made it just in time."
+
+    payload = _story_payload(prompt, lang, target_sec, target_words)
+    text = _trim(await llm.chat(payload, timeout=120))
 
     # Очищаем текст от Markdown символов
     text = _clean_markdown(text)
@@ -583,6 +596,288 @@ async def generate_story(theme_prompt: Optional[str], theme_name: Optional[str],
     return text
 
 
+# JSON-ответ при обрыве по max_tokens теряется целиком, поэтому запас больше,
+# чем у текста: экранирование \n и кавычек, ключи, французские описание и хештеги
+STRUCTURED_TOKENS_FACTOR = 1.5
+STRUCTURED_EXTRA_TOKENS = 400
+# Потолок max_tokens одного bulk-запроса
+BULK_MAX_TOKENS = 8000
+
+
+def _structured_max_tokens(story_max_tokens: int) -> int:
+    return int(story_max_tokens * STRUCTURED_TOKENS_FACTOR) + STRUCTURED_EXTRA_TOKENS
+
+
+_STRUCTURED_INSTRUCTIONS = (
+    "\n\nANSWER FORMAT: reply with ONE JSON object and nothing else:\n"
+    '{"title": "<story title>", "body": "<story paragraphs separated by \\n\\n>", '
+    '"fr_description": "<catchy French video description, max 100 characters>", '
+    '"fr_hashtags": ["#tag1", "#tag2", "#tag3", "#tag4"]}\n'
+    "title and body are in the story language; fr_description and the 4 hashtags are in French, "
+    "relevant to the story and made for TikTok/YouTube Shorts."
+)
+
+
+async def generate_story_structured(
+    theme_prompt: Optional[str],
+    theme_name: Optional[str],
+    lang: str,
+    target_sec: int = 75,
+    target_words: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    История и французские метаданные одним запросом (JSON-ответ).
+
+    Returns:
+        {"text": "title\\n\\nbody", "title": ..., "body": ...,
+         "french_meta": {"description": ..., "hashtags": [...]} или None}
+    Если модель не вернула валидный JSON — старый путь generate_story,
+    french_meta=None (метаданные тогда генерируются отдельным запросом).
+    """
+    from utils.french_metadata import normalize_french_metadata
+
+    prompt = _resolve_prompt(theme_prompt, theme_name, lang)
+
+    data = None
+    llm = get_llm()
+    if llm.available():
+        payload = _story_payload(prompt, lang, target_sec, target_words)
+        payload["messages"][0]["content"] += _STRUCTURED_INSTRUCTIONS
+        payload["response_format"] = {"type": "json_object"}
+        payload["max_tokens"] = _structured_max_tokens(payload["max_tokens"])
+
+        try:
+            content = await llm.chat(payload, timeout=120)
+            data = json.loads(content[content.find("{"):content.rfind("}") + 1])
+        except Exception as e:
+            print(f"[StoryGen] Structured story failed, falling back: {e}")
+            data = None
+
+    title = _clean_markdown(str((data or {}).get("title") or "")).strip()
+    body = _trim(_clean_markdown(str((data or {}).get("body") or "")))
+    if not title or not body:
+        text = await generate_story(theme_prompt, theme_name, lang, target_sec=target_sec, target_words=target_words)
+        parts = text.split("\n", 1)
+        return {
+            "text": text,
+            "title": parts[0].strip(),
+            "body": (parts[1] if len(parts) > 1 else "").strip(),
+            "french_meta": None,
+        }
+
+    return {
+        "text": f"{title}\n\n{body}",
+        "title": title,
+        "body": body,
+        "french_meta": normalize_french_metadata(data.get("fr_description") or "", data.get("fr_hashtags") or []),
+    }
+
+
+# Сколько историй просим в одном ответе (дальше растёт риск обрыва по max_tokens)
+BULK_STORIES_PER_REQUEST = 5
+
+
+def _bulk_instructions(n: int) -> str:
+    return (
+        f"\n\nANSWER FORMAT: write {n} DIFFERENT stories (different themes, openings and endings) "
+        "and reply with ONE JSON object and nothing else:\n"
+        '{"stories": [{"title": "<story title>", "body": "<story paragraphs separated by \\n\\n>", '
+        '"fr_description": "<catchy French video description, max 100 characters>", '
+        '"fr_hashtags": ["#tag1", "#tag2", "#tag3", "#tag4"]}, ...]}\n'
+        "title and body are in the story language; fr_description and the 4 hashtags are in French."
+    )
+
+
+async def _generate_stories_batch(
+    prompt: str, lang: str, target_sec: int, n: int, target_words: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Один запрос -> до n историй (системный промпт отправляется один раз на n историй)"""
+    from utils.french_metadata import normalize_french_metadata
+
+    payload = _story_payload(prompt, lang, target_sec, target_words)
+    payload["messages"][0]["content"] += _bulk_instructions(n)
+    payload["response_format"] = {"type": "json_object"}
+    payload["max_tokens"] = min(_structured_max_tokens(payload["max_tokens"]) * n, BULK_MAX_TOKENS)
+
+    # Массовая предгенерация не срочная — без hedging, чтобы не платить дважды
+    content = await get_llm().chat(payload, timeout=300, hedge=False)
+    data = json.loads(content[content.find("{"):content.rfind("}") + 1])
+
+    stories = []
+    for item in (data.get("stories") or [])[:n]:
+        if not isinstance(item, dict):
+            continue
+        title = _clean_markdown(str(item.get("title") or "")).strip()
+        body = _trim(_clean_markdown(str(item.get("body") or "")))
+        if not title or not body:
+            continue
+        stories.append({
+            "text": f"{title}\n\n{body}",
+            "title": title,
+            "body": body,
+            "french_meta": normalize_french_metadata(item.get("fr_description") or "", item.get("fr_hashtags") or []),
+        })
+    return stories
+
+
+async def generate_stories_bulk(
+    theme_prompt: Optional[str],
+    theme_name: Optional[str],
+    lang: str,
+    count: int,
+    target_sec: int = 75,
+    per_request: int = BULK_STORIES_PER_REQUEST,
+    target_words: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Массовая генерация: несколько историй в одном ответе (JSON-массив),
+    запросы по per_request историй идут параллельно по общему keep-alive соединению.
+    Формат элементов — как у generate_story_structured. Может вернуть меньше count,
+    если модель отдала часть историй невалидными.
+    """
+    if count <= 0:
+        return []
+    if not get_llm().available():
+        return [
+            await generate_story_structured(theme_prompt, theme_name, lang, target_sec, target_words)
+            for _ in range(count)
+        ]
+
+    prompt = _resolve_prompt(theme_prompt, theme_name, lang)
+    # Длинные истории — меньше историй на запрос, чтобы ответ влез в BULK_MAX_TOKENS
+    per_story = _structured_max_tokens(_story_max_tokens(lang, target_words))
+    per_request = max(1, min(per_request, BULK_MAX_TOKENS // per_story))
+    sizes = [min(per_request, count - i) for i in range(0, count, per_request)]
+    results = await asyncio.gather(
+        *(_generate_stories_batch(prompt, lang, target_sec, n, target_words) for n in sizes),
+        return_exceptions=True
+    )
+    stories: List[Dict[str, Any]] = []
+    for r in results:
+        if isinstance(r, Exception):
+            print(f"[StoryGen] Bulk batch failed: {r}")
+            continue
+        stories.extend(r)
+    return stories[:count]
+
+
+# Граница готового фрагмента в потоке: конец предложения или строки (заголовок)
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?…])(["»”)]?)\s+|\n+')
+
+# Французские метаданные в потоке — отдельной последней строкой после истории
+_STREAM_META_MARKER = "FR_META:"
+_STREAM_META_INSTRUCTIONS = (
+    f"\n\nAFTER the story, on a separate LAST line, write {_STREAM_META_MARKER} followed by ONE JSON object:\n"
+    '{"fr_description": "<catchy French video description, max 100 characters>", '
+    '"fr_hashtags": ["#tag1", "#tag2", "#tag3", "#tag4"]}\n'
+    "The description and the 4 hashtags are in French, relevant to the story and made for "
+    "TikTok/YouTube Shorts. This line is not part of the story."
+)
+
+
+def _split_sentences(buf: str) -> Tuple[List[str], str]:
+    """Законченные предложения из буфера и незавершённый хвост"""
+    sentences = []
+    pos = 0
+    for m in _SENTENCE_END_RE.finditer(buf):
+        sentence = _clean_markdown((buf[pos:m.start()] + (m.group(1) or "")).strip())
+        if sentence:
+            sentences.append(sentence)
+        pos = m.end()
+    return sentences, buf[pos:]
+
+
+async def generate_story_stream(
+    theme_prompt: Optional[str],
+    theme_name: Optional[str],
+    lang: str,
+    target_sec: int = 75,
+    target_words: Optional[int] = None,
+    meta_sink: Optional[Dict[str, Any]] = None
+) -> AsyncIterator[str]:
+    """
+    Потоковый вариант generate_story: читает SSE-поток chat completions и отдаёт
+    готовые предложения по мере генерации. Первым фрагментом идёт заголовок —
+    первая строка ответа целиком (как в generate_story, по переводу строки,
+    а не по точке); если ответ пришёл одной строкой — заголовок "Story",
+    а весь текст идёт в тело. Дальше — предложения тела.
+
+    meta_sink: если передан, модель дописывает французские метаданные последней
+    строкой ответа (в тот же запрос, без отдельного вызова); строка в поток не
+    попадает, а по окончании потока meta_sink["french_meta"] — нормализованные
+    метаданные или None, если модель их не дала.
+    """
+    prompt = _resolve_prompt(theme_prompt, theme_name, lang)
+
+    llm = get_llm()
+    if not llm.available():
+        yield "Untitled Story"
+        yield "I missed the bus to my exam, but a stranger offered me a ride."
+        yield "I made it just in time."
+        return
+
+    payload = _story_payload(prompt, lang, target_sec, target_words)
+    if meta_sink is not None:
+        meta_sink["french_meta"] = None
+        payload["messages"][0]["content"] += _STREAM_META_INSTRUCTIONS
+        payload["max_tokens"] += 150  # + строка метаданных
+
+    buf = ""
+    meta = None
+    title_sent = False
+    async for delta in llm.stream(payload, timeout=120):
+        if meta is not None:
+            meta += delta
+            continue
+        buf += delta
+        if meta_sink is not None and _STREAM_META_MARKER in buf:
+            # История закончилась — остаток ответа только копим для метаданных
+            buf, meta = buf.split(_STREAM_META_MARKER, 1)
+
+        if not title_sent:
+            # Тело не начинаем, пока не закончилась первая строка (заголовок)
+            buf = buf.lstrip()
+            nl = buf.find("\n")
+            if nl < 0:
+                continue
+            yield _clean_markdown(buf[:nl].strip()) or "Story"
+            title_sent = True
+            buf = buf[nl + 1:]
+
+        # Отдаём всё, что уже закончено; незавершённый хвост остаётся в буфере
+        sentences, buf = _split_sentences(buf)
+        for sentence in sentences:
+            yield sentence
+
+    if not title_sent:
+        # Ответ без отдельной строки заголовка — как generate_story
+        yield "Story"
+        sentences, buf = _split_sentences(buf)
+        for sentence in sentences:
+            yield sentence
+
+    tail = _clean_markdown(buf.strip())
+    if tail:
+        yield tail
+
+    if meta_sink is not None and meta is not None:
+        meta_sink["french_meta"] = _parse_stream_meta(meta)
+
+
+def _parse_stream_meta(raw: str) -> Optional[Dict[str, Any]]:
+    """Строка FR_META из потока -> нормализованные метаданные (None при мусоре)"""
+    from utils.french_metadata import normalize_french_metadata
+
+    try:
+        data = json.loads(raw[raw.find("{"):raw.rfind("}") + 1])
+    except ValueError:
+        print(f"[StoryGen] Bad FR_META line in stream: {raw[:100]!r}")
+        return None
+    if not isinstance(data, dict) or not data.get("fr_description"):
+        return None
+    return normalize_french_metadata(data.get("fr_description") or "", data.get("fr_hashtags") or [])
+
+
 def _clean_markdown(text: str) -> str:
     """Удаляет Markdown форматирование из текста"""
     # Удаляем жирный текст (**текст** или __текст__)
@@ -40,3 +40,31 @@ def build_srt_by_text_length(text: str, total_duration: float, out_path: str):
         lines.append(f"{i}\n{_fmt(start)} --> { _fmt(end)}\n{s}\n")
     with open(out_path, "w", encoding="utf-8") as f:
         f.write("\n".join(lines))
+
+def build_srt_from_timings(words, out_path: str, max_chars: int = 60):
+    """
+    Сабы по реальным таймингам слов [(word, start, end), ...]:
+    реплика заканчивается на конце предложения или при превышении max_chars.
+    """
+    cues = []
+    cur, cur_start, cur_end = [], 0.0, 0.0
+    for w, start, end in words:
+        if not cur:
+            cur_start = start
+        cur.append(w)
+        cur_end = end
+        text = " ".join(cur)
+        if re.search(r'[.!?]["»”)]?$', w) or len(text) >= max_chars:
+            cues.append((cur_start, cur_end, text))
+            cur = []
+    if cur:
+        cues.append((cur_start, cur_end, " ".join(cur)))
+
+    lines = []
+    for i, (start, end, s) in enumerate(cues, 1):
+        # реплика висит до начала следующей, чтобы сабы не мигали в паузах
+        if i < len(cues):
+            end = max(end, cues[i][0])
+        lines.append(f"{i}\n{_fmt(start)} --> {_fmt(end)}\n{s}\n")
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
@@ -112,6 +112,12 @@ class TaskQueue:
 
         return stats
 
+    def is_idle(self) -> bool:
+        """Нет ни ожидающих, ни выполняющихся задач"""
+        return self.queue.empty() and not any(
+            t.status == TaskStatus.RUNNING for t in self.tasks.values()
+        )
+
     async def start_worker(self, bot, generator_func):
         """Запускает фоновый worker для обработки задач"""
         if self._worker_running:
@@ -170,6 +176,9 @@ class TaskQueue:
                         caption = result.get("caption", f"✅ Видео готово!\nID: {task.task_id}")
 
                         if video_path:
+                            # Пакетные задачи: дополнительные ролики отправляем перед основным
+                            for extra_path in result.get("extra_video_paths") or []:
+                                await bot.send_video(task.user_id, FSInputFile(extra_path))
                             await bot.send_video(
                                 task.user_id,
                                 FSInputFile(video_path),
@@ -18,7 +18,9 @@ async def process_video_task(task) -> Dict[str, Any]:
         Dict с результатом генерации
     """
     task_type = task.task_type
-    config = task.config
+    # Ключ «канала» для задач из меню — пользователь (сэмплер футажа и т.п.)
+    config = dict(task.config)
+    config.setdefault("channel_key", f"user:{task.user_id}")
 
     print(f"[TaskWorker] Processing task {task.task_id}, type: {task_type}")
     print(f"[TaskWorker] Config: {config}")
@@ -50,8 +52,8 @@ async def process_video_task(task) -> Dict[str, Any]:
 
 
 async def _process_cuts_task(config: Dict[str, Any], workdir: str) -> Dict[str, Any]:
-    """Обработка задачи нарезки"""
-    from utils.cuts import make_cut_from_collection
+    """Обработка задачи нарезки (count > 1 — пакет роликов за один проход по исходникам)"""
+    from utils.cuts import make_cut_from_collection, make_cuts_batch_from_collection
     from utils.ffmpeg import ensure_telegram_size
 
     kind = config.get("kind")
@@ -59,35 +61,54 @@ async def _process_cuts_task(config: Dict[str, Any], workdir: str) -> Dict[str,
     min_sec = config.get("min_sec", 30)
     max_sec = config.get("max_sec", 60)
     banner_config = config.get("banner_config")
+    count = int(config.get("count") or 1)
 
     # Генерируем нарезку
-    final, picked, seg_dur = await make_cut_from_collection(
-        kind=kind,
-        collection=collection,
-        out_dir=workdir,
-        min_sec=min_sec,
-        max_sec=max_sec,
-        banner_config=banner_config
-    )
-
-    # Оптимизируем для Telegram
-    target_path = os.path.join(workdir, "final_tg.mp4")
-    safe_path = await ensure_telegram_size(final, target_path, target_mb=48)
-
-    # Копируем в постоянное место
+    if count > 1:
+        cuts = await make_cuts_batch_from_collection(
+            kind=kind,
+            collection=collection,
+            out_dir=workdir,
+            count=count,
+            min_sec=min_sec,
+            max_sec=max_sec,
+            banner_config=banner_config,
+            channel=config.get("channel_key")
+        )
+    else:
+        cuts = [await make_cut_from_collection(
+            kind=kind,
+            collection=collection,
+            out_dir=workdir,
+            min_sec=min_sec,
+            max_sec=max_sec,
+            banner_config=banner_config,
+            channel=config.get("channel_key")
+        )]
+
+    # Оптимизируем для Telegram и копируем в постоянное место
     final_dir = os.path.join("output", "cuts")
     os.makedirs(final_dir, exist_ok=True)
-    final_output = os.path.join(final_dir, os.path.basename(safe_path))
-    shutil.copy2(safe_path, final_output)
-
+    outputs = []
+    for i, (final, _picked, _seg_dur) in enumerate(cuts):
+        target_path = os.path.join(workdir, f"final_tg_{i + 1:02d}.mp4" if count > 1 else "final_tg.mp4")
+        safe_path = await ensure_telegram_size(final, target_path, target_mb=48)
+        final_output = os.path.join(final_dir, os.path.basename(safe_path))
+        shutil.copy2(safe_path, final_output)
+        outputs.append(final_output)
+
+    seg_dur = cuts[0][2]
     caption = (
         f"✂️ <b>Нарезка готова!</b>\n\n"
         f"Коллекция: {collection}\n"
         f"Длительность: {int(seg_dur)}с"
     )
+    if count > 1:
+        caption += f"\nРоликов: {len(outputs)}"
 
     return {
-        "video_path": final_output,
+        "video_path": outputs[0],
+        "extra_video_paths": outputs[1:],
         "caption": caption,
         "duration": seg_dur
     }
@@ -99,7 +120,10 @@ async def _process_story_task(task_type: str, config: Dict[str, Any], workdir: s
     from utils.ffmpeg import ensure_telegram_size
     from utils.french_metadata import generate_french_metadata
 
-    # Генерируем историю
+    # Генерируем историю (тип нужен для французских метаданных)
+    config.setdefault("story_type", task_type)
+    # Подпись задачи содержит французские метаданные — пусть генерация их вернёт
+    config["want_french_meta"] = True
     result = await _generate_reddit(config, workdir)
     final_path = result["video_path"]
 
@@ -113,9 +137,12 @@ async def _process_story_task(task_type: str, config: Dict[str, Any], workdir: s
     final_output = os.path.join(final_dir, os.path.basename(safe_path))
     shutil.copy2(safe_path, final_output)
 
-    # Французские метаданные
+    # Французские метаданные: обычно уже пришли вместе с историей (в JSON-ответе
+    # или последней строкой потока), отдельный запрос — только если модель их не дала
     story_text = result.get("text", "")
-    french_meta = await generate_french_metadata(story_text, story_type=task_type)
+    french_meta = result.get("french_meta")
+    if not french_meta:
+        french_meta = await generate_french_metadata(story_text, story_type=task_type)
 
     # Формируем подпись
     type_map = {
@@ -0,0 +1,184 @@
+# utils/timings.py
+"""
+Карта таймингов озвучки: (слово, start, end) для каждого слова текста.
+
+Источники по приоритету:
+  1. данные движка TTS (edge WordBoundary, alignment GenAIPro/ElevenLabs) —
+     движок кладёт их рядом с аудио в <audio>.timings.json (у склеенного
+     из кусков аудио — сшитые merge_timings, у попадания в кэш TTS — из кэша);
+  2. локальное выравнивание: silencedetect находит паузы, слова раскладываются
+     по участкам речи пропорционально длине (паузы больше не «съедают» тайминги).
+
+По карте строятся субтитры (build_srt_from_timings) и посимвольное появление
+текста на карточке (char_reveal_times).
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+from bisect import bisect_right
+from typing import List, Optional, Sequence, Tuple
+
+from utils.config import FFMPEG_BIN
+from utils.ffmpeg import _run, probe_duration
+
+WordTiming = Tuple[str, float, float]
+
+# Порог тишины и минимальная пауза для локального выравнивания
+SILENCE_NOISE_DB = -35
+SILENCE_MIN_SEC = 0.15
+
+_SIL_START_RE = re.compile(r"silence_start:\s*([0-9.]+)")
+_SIL_END_RE = re.compile(r"silence_end:\s*([0-9.]+)")
+
+
+def timings_path(audio_path: str) -> str:
+    return audio_path + ".timings.json"
+
+
+def save_timings(audio_path: str, words: Sequence[WordTiming]) -> None:
+    with open(timings_path(audio_path), "w", encoding="utf-8") as f:
+        json.dump([list(w) for w in words], f, ensure_ascii=False)
+
+
+def load_timings(audio_path: str) -> Optional[List[WordTiming]]:
+    """Тайминги от движка, если они есть и не старше самого аудио"""
+    path = timings_path(audio_path)
+    try:
+        if os.path.getmtime(path) < os.path.getmtime(audio_path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return [(str(w), float(s), float(e)) for w, s, e in json.load(f)]
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def words_from_char_alignment(
+    chars: Sequence[str], starts: Sequence[float], ends: Sequence[float]
+) -> List[WordTiming]:
+    """Посимвольный alignment (формат ElevenLabs) -> пословные тайминги"""
+    words: List[WordTiming] = []
+    cur, w_start, w_end = "", 0.0, 0.0
+    for ch, s, e in zip(chars, starts, ends):
+        if ch.isspace():
+            if cur:
+                words.append((cur, w_start, w_end))
+                cur = ""
+            continue
+        if not cur:
+            w_start = float(s)
+        cur += ch
+        w_end = float(e)
+    if cur:
+        words.append((cur, w_start, w_end))
+    return words
+
+
+def merge_timings(
+    parts: Sequence[Tuple[Sequence[WordTiming], float]], crossfade: float = 0.0
+) -> List[WordTiming]:
+    """
+    Тайминги кусков (words, длительность куска) -> тайминги склеенного аудио.
+    Кусок начинается с накопленной длительности предыдущих минус crossfade
+    на каждый стык (concat_audio_crossfade накладывает куски друг на друга).
+    """
+    merged: List[WordTiming] = []
+    offset = 0.0
+    for words, duration in parts:
+        merged.extend((w, s + offset, e + offset) for w, s, e in words)
+        offset += duration - crossfade
+    return merged
+
+
+async def _speech_intervals(audio_path: str) -> List[Tuple[float, float]]:
+    """Участки речи = всё, что не тишина по silencedetect"""
+    total = await probe_duration(audio_path)
+    log = await _run(
+        FFMPEG_BIN, "-hide_banner", "-nostats",
+        "-i", audio_path,
+        "-af", f"silencedetect=noise={SILENCE_NOISE_DB}dB:d={SILENCE_MIN_SEC}",
+        "-f", "null", "-",
+    )
+    starts = [float(x) for x in _SIL_START_RE.findall(log)]
+    ends = [float(x) for x in _SIL_END_RE.findall(log)]
+
+    speech = []
+    cur = 0.0
+    for i, s in enumerate(starts):
+        if s > cur:
+            speech.append((cur, s))
+        cur = ends[i] if i < len(ends) else total
+    if cur < total:
+        speech.append((cur, total))
+    return speech or [(0.0, total)]
+
+
+async def align_audio(audio_path: str, text: str) -> List[WordTiming]:
+    """
+    Локальное выравнивание без сети: слова раскладываются по участкам речи
+    пропорционально длине (с учётом пробела после слова).
+    """
+    words = text.split()
+    if not words:
+        return []
+    speech = await _speech_intervals(audio_path)
+    speech_total = sum(e - s for s, e in speech) or 1.0
+
+    # Накопленное «время речи» на начало каждого участка
+    acc = [0.0]
+    for s, e in speech:
+        acc.append(acc[-1] + (e - s))
+
+    def to_real(t: float) -> float:
+        i = min(max(bisect_right(acc, t) - 1, 0), len(speech) - 1)
+        s, e = speech[i]
+        return min(e, s + (t - acc[i]))
+
+    weights = [len(w) + 1 for w in words]
+    scale = speech_total / sum(weights)
+    out: List[WordTiming] = []
+    t = 0.0
+    for w, weight in zip(words, weights):
+        start = to_real(t)
+        t += weight * scale
+        out.append((w, start, to_real(t - scale)))  # без «пробела» в конце слова
+    return out
+
+
+async def get_word_timings(audio_path: str, text: str) -> List[WordTiming]:
+    """Тайминги от движка TTS, иначе — локальное выравнивание"""
+    words = load_timings(audio_path)
+    if words:
+        return words
+    return await align_audio(audio_path, text)
+
+
+def char_reveal_times(text: str, word_times: Sequence[Tuple[float, float]]) -> List[float]:
+    """
+    Момент появления каждого символа text: внутри слова — равномерно
+    между его start и end, пробелы — вместе с концом предыдущего слова.
+    Если число слов не совпало с картой, слова сопоставляются пропорционально.
+    """
+    matches = list(re.finditer(r"\S+", text))
+    times = [0.0] * len(text)
+    if not matches or not word_times:
+        return times
+
+    n, m = len(matches), len(word_times)
+    last = 0.0
+    prev_end = 0
+    for k, match in enumerate(matches):
+        start, end = word_times[min(m - 1, k * m // n)]
+        start = max(start, last)
+        end = max(end, start)
+        for j in range(prev_end, match.start()):
+            times[j] = start
+        length = match.end() - match.start()
+        for j in range(length):
+            times[match.start() + j] = start + (end - start) * (j + 1) / length
+        last = end
+        prev_end = match.end()
+    for j in range(prev_end, len(text)):
+        times[j] = last
+    return times
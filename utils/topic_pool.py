@@ -0,0 +1,136 @@
+# utils/topic_pool.py
+"""
+Пул заранее сгенерированных исторических тем для длинных видео.
+
+Темы хранятся в MongoDB (коллекция historical_topics, по языку). Экран выбора
+темы забирает готовые темы из пула одним запросом к базе — без похода в LLM.
+Пул пополняется в фоне, когда готовых тем меньше TOPIC_POOL_MIN_READY.
+Если пул не удалось пополнить (модель вернула одни повторы, ошибка),
+suggest_live добирает темы прямым запросом к модели мимо пула.
+
+Дедупликация:
+  - уникальный индекс (language, norm) — одна и та же тема не попадёт дважды,
+    в том числе уже показанная или взятая в производство (статус used);
+  - модели передаётся список последних известных тем, чтобы она их не повторяла.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Dict, List, Optional, Set
+
+from db.database import (
+    historical_topics_add,
+    historical_topics_count_ready,
+    historical_topics_mark_used,
+    historical_topics_recent,
+    historical_topics_take,
+)
+
+TOPIC_POOL_LANGUAGES = ("russian", "english", "ukrainian")
+# Ниже этого числа готовых тем пул пополняется
+TOPIC_POOL_MIN_READY = int(os.getenv("TOPIC_POOL_MIN_READY", "12"))
+# Сколько тем просим у модели за один запрос
+TOPIC_POOL_BATCH = int(os.getenv("TOPIC_POOL_BATCH", "20"))
+# Сколько последних тем показываем модели как «уже были»
+TOPIC_POOL_AVOID = 60
+
+
+class TopicPool:
+    """Готовые темы по языкам с фоновым пополнением"""
+
+    def __init__(self):
+        self._refilling: Set[str] = set()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _lock(self, language: str) -> asyncio.Lock:
+        if language not in self._locks:
+            self._locks[language] = asyncio.Lock()
+        return self._locks[language]
+
+    async def take(self, language: str, n: int = 4) -> List[str]:
+        """
+        До n готовых тем (может вернуть меньше, если пул пуст).
+        Если после выдачи тем осталось мало — пополнение уходит в фон.
+        """
+        topics = await historical_topics_take(language, n)
+        if await historical_topics_count_ready(language) < TOPIC_POOL_MIN_READY:
+            self.refill_background(language)
+        return topics
+
+    async def refill(self, language: str) -> int:
+        """Один запрос к модели; возвращает число новых тем после дедупликации"""
+        from utils.historical.story_generator import StoryGenerator
+
+        async with self._lock(language):
+            if await historical_topics_count_ready(language) >= TOPIC_POOL_MIN_READY:
+                return 0
+            avoid = await historical_topics_recent(language, TOPIC_POOL_AVOID)
+            topics = await StoryGenerator().generate_topic_suggestions(
+                num_suggestions=TOPIC_POOL_BATCH,
+                language=language,
+                avoid=avoid
+            )
+            added = await historical_topics_add(language, [t for t in topics if isinstance(t, str)])
+            print(f"[TopicPool] {language}: +{added} topics ({len(topics) - added} duplicates)")
+            return added
+
+    async def suggest_live(self, language: str, n: int, exclude: List[str]) -> List[str]:
+        """
+        До n тем прямо от модели, мимо пула — запасной путь, когда пул пуст
+        и не пополнился. exclude (уже показанные) и последние темы пула модель
+        не повторяет.
+        """
+        from utils.historical.story_generator import StoryGenerator
+
+        avoid = list(exclude) + await historical_topics_recent(language, TOPIC_POOL_AVOID)
+        topics = await StoryGenerator().generate_topic_suggestions(
+            num_suggestions=n,
+            language=language,
+            avoid=avoid
+        )
+        seen = {t.strip().lower() for t in exclude}
+        fresh = []
+        for t in topics:
+            if isinstance(t, str) and t.strip() and t.strip().lower() not in seen:
+                seen.add(t.strip().lower())
+                fresh.append(t.strip())
+        return fresh[:n]
+
+    def refill_background(self, language: str) -> None:
+        if language in self._refilling:
+            return
+        self._refilling.add(language)
+        asyncio.create_task(self._refill_background(language))
+
+    async def _refill_background(self, language: str) -> None:
+        try:
+            await self.refill(language)
+        except Exception as e:
+            print(f"[TopicPool] Refill failed for {language}: {e}")
+        finally:
+            self._refilling.discard(language)
+
+    async def mark_used(self, language: str, topic: str) -> None:
+        """Тема пошла в производство — больше её не предлагаем"""
+        await historical_topics_mark_used(language, topic)
+
+    async def run_refill(self, interval: float = 300.0) -> None:
+        """Фоновый цикл: раз в interval секунд доводит пулы всех языков до минимума"""
+        while True:
+            for language in TOPIC_POOL_LANGUAGES:
+                try:
+                    await self.refill(language)
+                except Exception as e:
+                    print(f"[TopicPool] Refill failed for {language}: {e}")
+            await asyncio.sleep(interval)
+
+
+_pool: Optional[TopicPool] = None
+
+
+def get_topic_pool() -> TopicPool:
+    global _pool
+    if _pool is None:
+        _pool = TopicPool()
+    return _pool
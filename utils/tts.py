@@ -1,10 +1,24 @@
 # utils/tts.py
 """
-Модуль TTS - только GenAIPro API (ElevenLabs voices через genaipro.vn)
+Модуль TTS: единая точка synthesize_tts поверх реестра движков.
+
+Движки:
+  - genaipro — GenAIPro API (ElevenLabs voices через genaipro.vn), основной;
+  - edge     — Microsoft Edge TTS (edge_tts, как в исторических видео);
+  - local    — офлайн (piper, если задан PIPER_MODEL, иначе espeak-ng)
+               в пуле процессов: превью, черновики, бенчмарки без сети.
+
+По умолчанию — TTS_ENGINE из env, иначе genaipro; edge/local — только явным выбором.
 """
 import os
+import asyncio
 import logging
-from typing import Optional
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
 
 # ---------- Конфиг / ключи ----------
 def _get_env(name: str, default: Optional[str] = None) -> Optional[str]:
@@ -23,6 +37,161 @@ GENAIPRO_API_TOKEN = _get_env("GENAIPRO_API_TOKEN")
 # Дефолтная скорость (1.1 = чуть быстрее нормального)
 DEFAULT_SPEED = 1.1
 
+# С какой длины текста включается параллельный синтез кусками
+CHUNKED_MIN_CHARS = int(_get_env("TTS_CHUNKED_MIN_CHARS", "900") or 900)
+
+# Движок по умолчанию (genaipro/edge/local)
+TTS_ENGINE = _get_env("TTS_ENGINE")
+
+# Локальный движок: модель piper (.onnx) и размер пула процессов
+PIPER_MODEL = _get_env("PIPER_MODEL")
+LOCAL_TTS_WORKERS = int(_get_env("LOCAL_TTS_WORKERS", "2") or 2)
+
+EDGE_VOICES = {
+    "ru": "ru-RU-DmitryNeural",
+    "en": "en-US-GuyNeural",
+    "uk": "uk-UA-OstapNeural",
+    "fr": "fr-FR-HenriNeural",
+}
+
+EngineFn = Callable[[str, str, Optional[str], str, float], Awaitable[str]]
+_ENGINES: Dict[str, EngineFn] = {}
+
+
+def register_engine(name: str):
+    """Декоратор регистрации движка: async fn(text, out_path, voice, lang, speed) -> out_path"""
+    def deco(fn: EngineFn) -> EngineFn:
+        _ENGINES[name] = fn
+        return fn
+    return deco
+
+
+def available_engines():
+    return sorted(_ENGINES)
+
+
+def default_engine() -> str:
+    """
+    TTS_ENGINE из env, иначе genaipro. Без токена genaipro падает с явной ошибкой —
+    edge/local включаются только явно (TTS_ENGINE или engine=).
+    """
+    if TTS_ENGINE in _ENGINES:
+        return TTS_ENGINE
+    return "genaipro"
+
+
+# ============================================================
+#                      ДВИЖКИ
+# ============================================================
+
+def _default_genaipro_voice(lang: str) -> str:
+    """Дефолтные голоса GenAIPro"""
+    if lang.lower().startswith("ru"):
+        return "Xb7hH8MSUJpSbSDYk0k2"  # Antoni - подходит для RU
+    return "uju3wxzG5OhpWcoi3SMy"  # Sarah - хороший EN голос
+
+
+@register_engine("genaipro")
+async def _genaipro_engine(text: str, out_path: str, voice: Optional[str], lang: str, speed: float) -> str:
+    if not GENAIPRO_API_TOKEN:
+        raise RuntimeError("GENAIPRO_API_TOKEN не задан в .env")
+
+    voice = voice or _default_genaipro_voice(lang)
+
+    # Ограничиваем скорость в допустимых пределах
+    speed = max(0.7, min(1.2, speed))
+
+    from utils.genaipro import synthesize_speech, synthesize_speech_chunked
+
+    # Длинные тексты озвучиваем параллельными кусками
+    synth = synthesize_speech_chunked if len(text) > CHUNKED_MIN_CHARS else synthesize_speech
+    await synth(
+        text=text,
+        voice_id=voice,
+        output_path=out_path,
+        model_id="eleven_multilingual_v2",
+        speed=speed,
+        stability=0.5,
+        similarity=0.75
+    )
+    return out_path
+
+
+@register_engine("edge")
+async def _edge_engine(text: str, out_path: str, voice: Optional[str], lang: str, speed: float) -> str:
+    import edge_tts
+
+    # voice_id от GenAIPro для edge не подходит — берём голос по языку
+    if not voice or "Neural" not in voice:
+        voice = EDGE_VOICES.get(lang.lower()[:2], EDGE_VOICES["en"])
+    rate = f"{round((speed - 1.0) * 100):+d}%"
+    try:
+        communicate = edge_tts.Communicate(text, voice, rate=rate, boundary="WordBoundary")
+    except TypeError:  # edge-tts < 7 отдаёт WordBoundary по умолчанию
+        communicate = edge_tts.Communicate(text, voice, rate=rate)
+
+    # Пишем аудио и попутно собираем тайминги слов (offset/duration в 100 нс)
+    words = []
+    with open(out_path, "wb") as f:
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                f.write(chunk["data"])
+            elif chunk["type"] == "WordBoundary":
+                start = chunk["offset"] / 1e7
+                words.append((chunk["text"], start, start + chunk["duration"] / 1e7))
+    if words:
+        from utils.timings import save_timings
+        save_timings(out_path, words)
+    return out_path
+
+
+def _local_synth_worker(text: str, wav_path: str, lang: str, speed: float) -> str:
+    """Выполняется в отдельном процессе: piper или espeak-ng -> WAV"""
+    if PIPER_MODEL and shutil.which("piper"):
+        subprocess.run(
+            ["piper", "--model", PIPER_MODEL, "--output_file", wav_path,
+             "--length_scale", f"{1.0 / max(speed, 0.1):.3f}"],
+            input=text.encode("utf-8"), check=True, capture_output=True,
+        )
+        return wav_path
+
+    espeak = shutil.which("espeak-ng") or shutil.which("espeak")
+    if not espeak:
+        raise RuntimeError("Локальный TTS недоступен: установите piper (PIPER_MODEL) или espeak-ng")
+    subprocess.run(
+        [espeak, "-v", lang.lower()[:2] or "en", "-s", str(int(175 * speed)), "-w", wav_path, text],
+        check=True, capture_output=True,
+    )
+    return wav_path
+
+
+_local_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_local_pool() -> ProcessPoolExecutor:
+    global _local_pool
+    if _local_pool is None:
+        _local_pool = ProcessPoolExecutor(max_workers=LOCAL_TTS_WORKERS)
+    return _local_pool
+
+
+@register_engine("local")
+async def _local_engine(text: str, out_path: str, voice: Optional[str], lang: str, speed: float) -> str:
+    from utils.ffmpeg import _run
+    from utils.config import FFMPEG_BIN
+
+    wav_path = os.path.splitext(out_path)[0] + ".local.wav"
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(_get_local_pool(), _local_synth_worker, text, wav_path, lang, speed)
+    try:
+        await _run(FFMPEG_BIN, "-y", "-i", wav_path, "-ar", "48000", "-ac", "2", out_path)
+    finally:
+        try:
+            os.remove(wav_path)
+        except OSError:
+            pass
+    return out_path
+
 
 # ============================================================
 #                      ЕДИНАЯ ФУНКЦИЯ ДЛЯ GENERATION
@@ -33,10 +202,11 @@ async def synthesize_tts(
     out_path: str,
     voice: Optional[str] = None,
     lang: str = "en",
-    speed: float = DEFAULT_SPEED
+    speed: float = DEFAULT_SPEED,
+    engine: Optional[str] = None
 ) -> str:
     """
-    Синтез речи через GenAIPro API (ElevenLabs voices).
+    Синтез речи выбранным движком.
 
     Args:
         text: Текст для озвучки
@@ -44,34 +214,55 @@ async def synthesize_tts(
         voice: voice_id (если None - используется дефолтный)
         lang: Язык (en/ru) - используется для выбора дефолтного голоса
         speed: Скорость речи (0.7 - 1.2, default 1.1)
+        engine: genaipro/edge/local (если None - default_engine())
 
     Returns:
         Путь к аудиофайлу
     """
-    if not GENAIPRO_API_TOKEN:
-        raise RuntimeError("GENAIPRO_API_TOKEN не задан в .env")
+    name = engine or default_engine()
+    fn = _ENGINES.get(name)
+    if fn is None:
+        raise ValueError(f"Unknown TTS engine: {name}. Available: {', '.join(available_engines())}")
 
     os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    return await fn(text, out_path, voice, lang, speed)
 
-    # Дефолтные голоса
-    if not voice:
-        if lang.lower().startswith("ru"):
-            voice = "Xb7hH8MSUJpSbSDYk0k2"  # Antoni - подходит для RU
-        else:
-            voice = "uju3wxzG5OhpWcoi3SMy"  # Sarah - хороший EN голос
 
-    # Ограничиваем скорость в допустимых пределах
-    speed = max(0.7, min(1.2, speed))
+async def synthesize_tts_stream(
+    sentences: AsyncIterator[str],
+    out_path: str,
+    voice: Optional[str] = None,
+    lang: str = "en",
+    speed: float = DEFAULT_SPEED,
+    engine: Optional[str] = None
+) -> str:
+    """
+    Синтез из потока предложений (например, generate_story_stream).
+    GenAIPro начинает озвучивать куски по мере поступления текста; остальные
+    движки дожидаются конца потока и озвучивают текст целиком.
 
-    from utils.genaipro import synthesize_speech
-    await synthesize_speech(
-        text=text,
+    Returns:
+        Полный озвученный текст
+    """
+    name = engine or default_engine()
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+
+    if name != "genaipro":
+        text = " ".join([s async for s in sentences])
+        await synthesize_tts(text, out_path, voice=voice, lang=lang, speed=speed, engine=name)
+        return text
+
+    if not GENAIPRO_API_TOKEN:
+        raise RuntimeError("GENAIPRO_API_TOKEN не задан в .env")
+    voice = voice or _default_genaipro_voice(lang)
+
+    from utils.genaipro import synthesize_speech_stream
+    return await synthesize_speech_stream(
+        sentences,
         voice_id=voice,
         output_path=out_path,
         model_id="eleven_multilingual_v2",
-        speed=speed,
+        speed=max(0.7, min(1.2, speed)),
         stability=0.5,
         similarity=0.75
     )
-
-    return out_path
@@ -0,0 +1,163 @@
+# utils/tts_cache.py
+"""
+Дисковый кэш озвучки по содержимому запроса.
+
+Ключ — sha256 от (text, voice_id, model_id, speed, stability, similarity, style,
+speaker_boost). Одинаковый запрос (превью голоса, повтор после упавшего рендера,
+перегенерация с другим фоном) отдаётся копией файла и не тратит кредиты GenAIPro.
+
+Файлы лежат в CACHE_DIR/tts/<ключ>.mp3, рядом — <ключ>.mp3.timings.json,
+если у записи были тайминги слов от движка (при попадании они восстанавливаются
+рядом с out_path). Размер ограничен TTS_CACHE_MAX_MB:
+при переполнении удаляются давно не использованные (LRU по mtime, который
+обновляется при каждом попадании). Копирование и вытеснение идут в потоке
+(asyncio.to_thread), чтобы многомегабайтные файлы не блокировали event loop;
+запись — через уникальный временный файл и os.replace, так что параллельные
+put одного ключа не мешают друг другу.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Dict, Optional
+
+from utils.config import CACHE_DIR
+from utils.timings import timings_path
+
+logger = logging.getLogger(__name__)
+
+TTS_CACHE_DIR = os.path.join(CACHE_DIR, "tts")
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "1024"))
+
+
+def tts_cache_key(
+    text: str,
+    voice_id: str,
+    model_id: str,
+    speed: float,
+    stability: float,
+    similarity: float,
+    style: float = 0.0,
+    use_speaker_boost: bool = True,
+) -> str:
+    """Ключ кэша: хэш всех параметров, влияющих на звук"""
+    payload = json.dumps(
+        [text, voice_id, model_id, round(float(speed), 3), round(float(stability), 3),
+         round(float(similarity), 3), round(float(style), 3), bool(use_speaker_boost)],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """Content-addressed кэш аудио с LRU-вытеснением по суммарному размеру"""
+
+    def __init__(self, root: str = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.mp3")
+
+    async def get(self, key: str, out_path: str) -> Optional[str]:
+        """Копирует закэшированное аудио в out_path; None — если записи нет"""
+        return await asyncio.to_thread(self._get, key, out_path)
+
+    async def put(self, key: str, src_path: str) -> None:
+        """
+        Кладёт готовый файл (и его тайминги, если есть) в кэш
+        и при необходимости вытесняет старые записи
+        """
+        await asyncio.to_thread(self._put, key, src_path)
+
+    def _get(self, key: str, out_path: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            if os.path.getsize(path) == 0:
+                raise FileNotFoundError(path)
+            os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+            shutil.copyfile(path, out_path)
+            # Тайминги копируются после аудио: load_timings не доверяет файлу старше аудио
+            if os.path.isfile(timings_path(path)):
+                shutil.copyfile(timings_path(path), timings_path(out_path))
+            os.utime(path, None)  # отметка «недавно использован» для LRU
+        except OSError:
+            # записи нет или её только что вытеснили
+            self.misses += 1
+            return None
+        self.hits += 1
+        logger.info("TTS cache hit %s (hit rate %.0f%%)", key[:12], self.hit_rate() * 100)
+        return out_path
+
+    def _put(self, key: str, src_path: str) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(key)
+        self._copy_atomic(src_path, path)
+        if os.path.isfile(timings_path(src_path)):
+            self._copy_atomic(timings_path(src_path), timings_path(path))
+        else:
+            self._remove(timings_path(path))
+        self._evict()
+
+    def _copy_atomic(self, src: str, dst: str) -> None:
+        """Копия через уникальный временный файл в каталоге кэша"""
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, dst)
+        except BaseException:
+            self._remove(tmp)
+            raise
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        for entry in os.scandir(self.root):
+            if not entry.is_file() or not entry.name.endswith(".mp3"):
+                continue
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._remove(timings_path(path))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate()}
+
+
+_cache: Optional[TTSCache] = None
+
+
+def get_tts_cache() -> TTSCache:
+    global _cache
+    if _cache is None:
+        _cache = TTSCache()
+    return _cache
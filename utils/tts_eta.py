@@ -0,0 +1,90 @@
+# utils/tts_eta.py
+"""
+Предсказание времени выполнения TTS-задачи GenAIPro по длине текста.
+
+Модель — прямая seconds = a + b * chars, подбирается методом наименьших квадратов
+по последним завершённым задачам. Выборка хранится в CACHE_DIR/tts_eta.json
+и переживает перезапуски.
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import List, Optional, Tuple
+
+from utils.config import CACHE_DIR
+
+TTS_ETA_STATE_PATH = os.path.join(CACHE_DIR, "tts_eta.json")
+
+# Сколько последних наблюдений держим (старые вытесняются — API со временем меняется)
+MAX_SAMPLES = 200
+# Меньше наблюдений — предсказание не делаем
+MIN_SAMPLES = 5
+
+
+class CompletionPredictor:
+    """chars -> ожидаемые секунды до статуса completed"""
+
+    def __init__(self, state_path: str = TTS_ETA_STATE_PATH):
+        self.state_path = state_path
+        self._samples: Optional[List[Tuple[int, float]]] = None
+        self._fit: Optional[Tuple[float, float]] = None
+
+    def _load(self) -> List[Tuple[int, float]]:
+        if self._samples is None:
+            try:
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    self._samples = [(int(c), float(s)) for c, s in json.load(f).get("samples", [])]
+            except (OSError, ValueError, TypeError):
+                self._samples = []
+        return self._samples
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"samples": self._samples}, f)
+        os.replace(tmp, self.state_path)
+
+    def _refit(self) -> None:
+        samples = self._load()
+        if len(samples) < MIN_SAMPLES:
+            self._fit = None
+            return
+        n = len(samples)
+        mx = sum(c for c, _ in samples) / n
+        my = sum(s for _, s in samples) / n
+        var = sum((c - mx) ** 2 for c, _ in samples)
+        b = sum((c - mx) * (s - my) for c, s in samples) / var if var else 0.0
+        b = max(0.0, b)
+        self._fit = (my - b * mx, b)
+
+    def predict(self, chars: int) -> Optional[float]:
+        """Ожидаемое время выполнения, сек; None — пока мало данных"""
+        if self._fit is None:
+            self._refit()
+        if self._fit is None:
+            return None
+        a, b = self._fit
+        return max(0.0, a + b * chars)
+
+    def record(self, chars: int, seconds: float) -> None:
+        """Добавляет наблюдение о завершённой задаче"""
+        samples = self._load()
+        samples.append((int(chars), round(float(seconds), 3)))
+        del samples[:-MAX_SAMPLES]
+        self._refit()
+        try:
+            self._save()
+        except OSError:
+            pass
+
+
+_predictor: Optional[CompletionPredictor] = None
+
+
+def get_completion_predictor() -> CompletionPredictor:
+    global _predictor
+    if _predictor is None:
+        _predictor = CompletionPredictor()
+    return _predictor
@@ -0,0 +1,164 @@
+# utils/voice_catalog.py
+"""
+Кэш каталога голосов GenAIPro.
+
+Списки голосов кэшируются по ключу (language, gender, page), ссылки на превью —
+по voice_id. Политика stale-while-revalidate:
+  - свежая запись (моложе VOICE_CATALOG_TTL) отдаётся сразу;
+  - устаревшая тоже отдаётся сразу, а обновление уходит в фон;
+  - если API недоступен — продолжаем отдавать последнюю известную версию.
+
+Каталог сохраняется в CACHE_DIR/voice_catalog.json, MP3 превью —
+в CACHE_DIR/voice_previews/<voice_id>.mp3.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from utils.config import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+VOICE_CATALOG_PATH = os.path.join(CACHE_DIR, "voice_catalog.json")
+VOICE_PREVIEWS_DIR = os.path.join(CACHE_DIR, "voice_previews")
+VOICE_CATALOG_TTL = int(os.getenv("VOICE_CATALOG_TTL", "21600"))  # 6 часов
+
+
+def _voices_key(language: Optional[str], gender: Optional[str], page: int) -> str:
+    return f"{language or '*'}|{gender or '*'}|{page}"
+
+
+class VoiceCatalog:
+    """Списки голосов и ссылки на превью с TTL и фоновым обновлением"""
+
+    def __init__(self, state_path: str = VOICE_CATALOG_PATH, ttl: int = VOICE_CATALOG_TTL):
+        self.state_path = state_path
+        self.ttl = ttl
+        self._state: Optional[Dict[str, Dict[str, Any]]] = None
+        self._refreshing: Set[str] = set()
+
+    # ---------- состояние ----------
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._state is None:
+            try:
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError):
+                self._state = {}
+            self._state.setdefault("voices", {})
+            self._state.setdefault("previews", {})
+        return self._state
+
+    def _save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+            tmp = self.state_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._state, f, ensure_ascii=False)
+            os.replace(tmp, self.state_path)
+        except OSError as e:
+            logger.warning("Failed to save voice catalog: %s", e)
+
+    # ---------- stale-while-revalidate ----------
+
+    async def _refresh(self, section: str, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        data = await fetch()
+        self._load()[section][key] = {"ts": time.time(), "data": data}
+        self._save()
+        return data
+
+    async def _refresh_background(self, section: str, key: str, fetch: Callable[[], Awaitable[Any]]) -> None:
+        token = f"{section}:{key}"
+        try:
+            await self._refresh(section, key, fetch)
+        except Exception as e:
+            logger.warning("Voice catalog refresh failed for %s: %s", token, e)
+        finally:
+            self._refreshing.discard(token)
+
+    async def _get(self, section: str, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._load()[section].get(key)
+        if entry is None:
+            return await self._refresh(section, key, fetch)
+
+        if time.time() - entry["ts"] > self.ttl:
+            token = f"{section}:{key}"
+            if token not in self._refreshing:
+                self._refreshing.add(token)
+                asyncio.create_task(self._refresh_background(section, key, fetch))
+        return entry["data"]
+
+    # ---------- публичный API ----------
+
+    async def voices(
+        self,
+        language: Optional[str] = None,
+        gender: Optional[str] = None,
+        page: int = 0,
+        page_size: int = 50
+    ) -> List[Dict[str, Any]]:
+        """Страница каталога голосов (как genaipro.list_voices)"""
+        from utils.genaipro import list_voices
+
+        async def fetch():
+            voices = await list_voices(page=page, page_size=page_size, language=language, gender=gender)
+            # Попутно запоминаем ссылки на превью — отдельный запрос на голос не понадобится
+            previews = self._load()["previews"]
+            now = time.time()
+            for v in voices:
+                if isinstance(v, dict) and v.get("voice_id") and v.get("preview_url"):
+                    previews[v["voice_id"]] = {"ts": now, "data": v["preview_url"]}
+            return voices
+
+        return await self._get("voices", _voices_key(language, gender, page), fetch)
+
+    async def preview_url(self, voice_id: str) -> Optional[str]:
+        """Ссылка на готовое превью голоса"""
+        from utils.genaipro import fetch_voice_preview_url
+
+        async def fetch():
+            url = await fetch_voice_preview_url(voice_id)
+            if not url:
+                # ошибка API или превью нет — пустой ответ не кэшируем
+                raise RuntimeError(f"No preview URL for voice {voice_id}")
+            return url
+
+        try:
+            return await self._get("previews", voice_id, fetch)
+        except RuntimeError:
+            return None
+
+    async def preview_file(self, voice_id: str, synthesize: bool = True) -> Optional[str]:
+        """
+        Локальный MP3 превью (скачивается один раз). Если у голоса нет готового
+        превью — озвучивается тестовая фраза (synthesize=True), она тоже
+        сохраняется и больше не тратит кредиты.
+        """
+        path = os.path.join(VOICE_PREVIEWS_DIR, f"{voice_id}.mp3")
+        if os.path.isfile(path) and os.path.getsize(path) > 0:
+            return path
+        url = await self.preview_url(voice_id)
+        if url:
+            from utils.http import download_to_file
+            await download_to_file(url, path, timeout=60)
+            return path
+        if not synthesize:
+            return None
+        from utils.genaipro import synthesize_preview
+        return await synthesize_preview(voice_id, None, path)
+
+
+_catalog: Optional[VoiceCatalog] = None
+
+
+def get_voice_catalog() -> VoiceCatalog:
+    global _catalog
+    if _catalog is None:
+        _catalog = VoiceCatalog()
+    return _catalog